@@ -0,0 +1 @@
+"""Benchmarks for Phoenix Filter Bot - fake Telegram client and load harness"""
@@ -0,0 +1,156 @@
+"""
+Synthetic release-name corpus for benchmarks
+Generates file documents shaped like a real movie/series channel index:
+"The.Silent.Harbor.2019.1080p.BluRay.x264.Hindi-GRP.mkv" and friends.
+Everything is derived from a seed, so runs are reproducible.
+"""
+
+import itertools
+import random
+from datetime import datetime, timedelta
+from typing import Iterator, List
+from motor.motor_asyncio import AsyncIOMotorDatabase
+from utils.search import prepare_file
+
+BENCH_CHANNEL_ID = -1009999999999
+
+WORDS = [
+    "silent", "harbor", "shadow", "kingdom", "last", "night", "empire", "river", "storm", "broken",
+    "crown", "iron", "dark", "city", "lost", "dragon", "summer", "winter", "secret", "garden",
+    "blood", "moon", "rising", "fall", "house", "game", "fire", "ice", "legend", "hunter",
+    "wild", "heart", "star", "road", "ghost", "war", "queen", "king", "time", "machine",
+    "black", "white", "red", "golden", "hidden", "valley", "ocean", "mountain", "edge", "world",
+    "avenger", "super", "man", "girl", "boy", "family", "money", "heist", "love", "story",
+    "return", "revenge", "dawn", "dusk", "zero", "one", "last", "first", "final", "chapter",
+]
+RESOLUTIONS = ["480p", "720p", "1080p", "2160p"]
+RESOLUTION_WEIGHTS = [15, 35, 40, 10]
+SOURCES = ["WEB-DL", "WEBRip", "BluRay", "HDRip", "HDTV", "DVDRip", "CAMRip"]
+CODECS = ["x264", "x265", "HEVC", "H.264", "AV1"]
+LANGUAGES = ["English", "Hindi", "Tamil", "Telugu", "Malayalam", "Korean", "Spanish", "Dual.Audio", "Multi"]
+AUDIO = ["AAC", "DD5.1", "DDP5.1", "Atmos", "AC3"]
+GROUPS = ["PSA", "YTS", "RARBG", "GalaxyRG", "TGx", "Pahe", "MkvCinemas", "HDHub", "Vegamovies"]
+EXTENSIONS = [".mkv", ".mp4", ".avi"]
+
+
+class TitleCatalog:
+    """Titles with a Zipf-like popularity, so a few titles get most files and searches"""
+
+    def __init__(self, count: int, seed: int = 42):
+        rng = random.Random(seed)
+        self.titles: List[str] = []
+        seen = set()
+        while len(self.titles) < count:
+            title = " ".join(rng.choice(WORDS) for _ in range(rng.choice([1, 2, 2, 3, 3, 4]))).title()
+            if title not in seen:
+                seen.add(title)
+                self.titles.append(title)
+        self._cum_weights = list(itertools.accumulate(1 / (rank + 1) ** 0.9 for rank in range(count)))
+
+    def pick(self, rng: random.Random) -> str:
+        return rng.choices(self.titles, cum_weights=self._cum_weights)[0]
+
+
+def release_name(rng: random.Random, title: str) -> str:
+    """One release-style file name for a title"""
+    parts = [title.replace(" ", rng.choice([".", ".", " ", "_"]))]
+    if rng.random() < 0.3:
+        parts.append(f"S{rng.randint(1, 8):02d}E{rng.randint(1, 24):02d}")
+    else:
+        parts.append(str(rng.randint(1960, 2025)))
+    parts.append(rng.choices(RESOLUTIONS, weights=RESOLUTION_WEIGHTS)[0])
+    parts.append(rng.choice(SOURCES))
+    if rng.random() < 0.6:
+        parts.append(rng.choice(LANGUAGES))
+    if rng.random() < 0.5:
+        parts.append(rng.choice(AUDIO))
+    parts.append(rng.choice(CODECS))
+    separator = "." if "." in parts[0] else rng.choice([".", " "])
+    name = separator.join(parts)
+    if rng.random() < 0.7:
+        name += f"-{rng.choice(GROUPS)}"
+    return name + rng.choice(EXTENSIONS)
+
+
+def generate_files(count: int, seed: int = 42, titles: int = 0, channel_id: int = BENCH_CHANNEL_ID,
+                   stored: bool = True) -> Iterator[dict]:
+    """
+    Yield file documents
+
+    With stored, documents are what index_file writes, indexed over time
+    and with a download history as the download counter leaves it;
+    otherwise they are what handle_index_command passes to index_file.
+
+    Args:
+        count: Number of files
+        seed: Random seed; the same seed gives the same corpus
+        titles: Distinct titles (default: one per 20 files)
+        channel_id: Channel the files appear to come from
+        stored: Add the fields index_file and the download counter write
+    """
+    rng = random.Random(seed)
+    catalog = TitleCatalog(titles or max(10, count // 20), seed)
+    indexed_from = datetime(2024, 1, 1)
+    for index in range(count):
+        name = release_name(rng, catalog.pick(rng))
+        doc = {
+            "file_id": f"BENCH{seed}x{index:08d}",
+            "file_name": name,
+            "file_type": "document",
+            "file_size": int(rng.lognormvariate(20.5, 0.9)),
+            "mime_type": "video/x-matroska" if name.endswith(".mkv") else "video/mp4",
+            "channel_id": channel_id,
+            "message_id": index + 1,
+            "caption": name if rng.random() < 0.3 else None,
+        }
+        # Drawn either way so both forms of a seed have the same names
+        downloads = int(rng.paretovariate(1.2)) - 1
+        last_download = timedelta(days=rng.uniform(0, 60))
+        if stored:
+            prepare_file(doc)
+            doc["indexed_at"] = indexed_from + timedelta(seconds=index * 30)
+            if downloads:
+                # Treated as if they all happened at the last download; near enough for ranking work
+                doc["download_count"] = downloads
+                doc["popularity"] = float(downloads)
+                doc["popularity_at"] = doc["indexed_at"] + last_download
+        yield doc
+
+
+def sample_queries(count: int, seed: int = 7, titles: int = 1000) -> List[str]:
+    """Search queries the way users type them: popular titles, partial titles, extras and misses"""
+    rng = random.Random(seed)
+    catalog = TitleCatalog(titles, 42)
+    queries = []
+    for _ in range(count):
+        title = catalog.pick(rng)
+        roll = rng.random()
+        if roll < 0.5:
+            query = title
+        elif roll < 0.7:
+            words = title.split()
+            query = " ".join(words[: max(1, len(words) - 1)])
+        elif roll < 0.85:
+            query = f"{title} {rng.choice(RESOLUTIONS + [str(rng.randint(1990, 2025))])}"
+        elif roll < 0.95:
+            query = title.lower()
+        else:
+            query = f"{rng.choice(WORDS)}{rng.choice(WORDS)} {rng.randint(1, 99)}"
+        queries.append(query)
+    return queries
+
+
+async def seed_files(db: AsyncIOMotorDatabase, count: int, seed: int = 42, batch_size: int = 10000) -> int:
+    """Insert a generated corpus into db.files in batches; returns the number inserted"""
+    inserted = 0
+    batch = []
+    for doc in generate_files(count, seed):
+        batch.append(doc)
+        if len(batch) >= batch_size:
+            await db.files.insert_many(batch, ordered=False)
+            inserted += len(batch)
+            batch = []
+    if batch:
+        await db.files.insert_many(batch, ordered=False)
+        inserted += len(batch)
+    return inserted
@@ -0,0 +1,195 @@
+"""
+Fake Telegram client for benchmarks
+A real Pyrogram Client (so handlers register and filters run unchanged)
+whose API methods answer locally after a configurable delay.
+
+Messages are built exactly as the installed Pyrogram builds them, and only
+methods the installed Client has are faked, so handler code that would
+fail against the real library fails in a benchmark too.
+"""
+
+import asyncio
+import inspect
+import itertools
+import time
+from collections import Counter
+from types import SimpleNamespace
+from typing import AsyncGenerator, Optional
+from pyrogram import Client
+from pyrogram.types import CallbackQuery, Chat, Message, User
+
+BOT_ID = 5000000000
+BOT_USERNAME = "phoenix_bench_bot"
+
+
+def make_user(user_id: int, first_name: str = "Bench", is_bot: bool = False, username: Optional[str] = None) -> User:
+    return User(id=user_id, is_bot=is_bot, first_name=first_name, username=username)
+
+
+def make_chat(chat_id: int, chat_type: str = "private", title: Optional[str] = None) -> Chat:
+    return Chat(id=chat_id, type=chat_type, title=title, username=f"chat{abs(chat_id)}" if title else None)
+
+
+def make_message(
+    client: Client,
+    message_id: int,
+    chat: Chat,
+    from_user: Optional[User] = None,
+    text: Optional[str] = None,
+    reply_to_message: Optional[Message] = None,
+) -> Message:
+    """Build a Message with the ID field of the installed Pyrogram: message_id on 1.x, id on 2.x"""
+    id_field = "id" if "id" in inspect.signature(Message.__init__).parameters else "message_id"
+    return Message(
+        client=client,
+        chat=chat,
+        from_user=from_user,
+        text=text,
+        date=int(time.time()),
+        reply_to_message=reply_to_message,
+        **{id_field: message_id},
+    )
+
+
+def make_callback_query(client: Client, query_id: int, from_user: User, message: Message, data: str) -> CallbackQuery:
+    return CallbackQuery(
+        client=client,
+        id=str(query_id),
+        from_user=from_user,
+        chat_instance=str(message.chat.id),
+        message=message,
+        data=data,
+    )
+
+
+class FakeClient(Client):
+    """
+    Client that never connects
+
+    Every API method the handlers use sleeps for api_latency seconds and
+    returns a plausible object; calls are counted by method name.
+    """
+
+    def __init__(self, api_latency: float = 0.0):
+        extra = {"in_memory": True} if "in_memory" in inspect.signature(Client.__init__).parameters else {}
+        super().__init__(":memory:", api_id=1, api_hash="bench", bot_token="0:bench", no_updates=True, **extra)
+        self.api_latency = api_latency
+        self.calls: Counter = Counter()
+        self.bot_user = make_user(BOT_ID, "Phoenix Bench", is_bot=True, username=BOT_USERNAME)
+        self._message_ids = itertools.count(1)
+        # Indexing reads a channel's history from here
+        self.channel_history: dict = {}
+        # Latest inline keyboard sent or edited into each chat
+        self.last_markup: dict = {}
+
+    async def _api(self, method: str):
+        self.calls[method] += 1
+        if self.api_latency:
+            await asyncio.sleep(self.api_latency)
+
+    def _keep_markup(self, chat_id, kwargs: dict):
+        if kwargs.get("reply_markup") is not None:
+            self.last_markup[chat_id] = kwargs["reply_markup"]
+
+    def _sent(self, chat_id, text: Optional[str] = None) -> Message:
+        chat_type = "private" if isinstance(chat_id, int) and chat_id > 0 else "supergroup"
+        return make_message(self, next(self._message_ids), make_chat(chat_id, chat_type), self.bot_user, text)
+
+    async def send(self, *args, **kwargs):
+        raise RuntimeError("Raw API call made during a benchmark; add it to FakeClient")
+
+    invoke = send
+
+    async def get_me(self) -> User:
+        return self.bot_user
+
+    async def send_message(self, chat_id, text, *args, **kwargs) -> Message:
+        await self._api("send_message")
+        self._keep_markup(chat_id, kwargs)
+        return self._sent(chat_id, text)
+
+    async def edit_message_text(self, chat_id, message_id, text, *args, **kwargs) -> Message:
+        await self._api("edit_message_text")
+        self._keep_markup(chat_id, kwargs)
+        return self._sent(chat_id, text)
+
+    async def edit_message_reply_markup(self, chat_id, message_id, *args, **kwargs) -> Message:
+        await self._api("edit_message_reply_markup")
+        self._keep_markup(chat_id, kwargs)
+        return self._sent(chat_id)
+
+    async def delete_messages(self, chat_id, message_ids, *args, **kwargs) -> bool:
+        await self._api("delete_messages")
+        return True
+
+    async def answer_callback_query(self, callback_query_id, *args, **kwargs) -> bool:
+        await self._api("answer_callback_query")
+        return True
+
+    async def copy_message(self, chat_id, from_chat_id, message_id, *args, **kwargs) -> Message:
+        await self._api("copy_message")
+        return self._sent(chat_id)
+
+    async def forward_messages(self, chat_id, from_chat_id, message_ids, *args, **kwargs) -> Message:
+        await self._api("forward_messages")
+        return self._sent(chat_id)
+
+    async def send_cached_media(self, chat_id, file_id, *args, **kwargs) -> Message:
+        await self._api("send_cached_media")
+        return self._sent(chat_id)
+
+    async def send_document(self, chat_id, document, *args, **kwargs) -> Message:
+        await self._api("send_document")
+        return self._sent(chat_id)
+
+    async def send_photo(self, chat_id, photo, *args, **kwargs) -> Message:
+        await self._api("send_photo")
+        return self._sent(chat_id)
+
+    async def get_chat(self, chat_id) -> Chat:
+        await self._api("get_chat")
+        return make_chat(chat_id if isinstance(chat_id, int) else -1000000000001, "channel", "Bench Channel")
+
+    async def get_chat_member(self, chat_id, user_id):
+        await self._api("get_chat_member")
+        return SimpleNamespace(user=make_user(user_id), status="member")
+
+    async def get_users(self, user_ids):
+        await self._api("get_users")
+        if isinstance(user_ids, (list, tuple)):
+            return [make_user(user_id) for user_id in user_ids]
+        return make_user(user_ids)
+
+    async def get_messages(self, chat_id, message_ids=None, *args, **kwargs):
+        await self._api("get_messages")
+        if isinstance(message_ids, (list, tuple)):
+            return [self._sent(chat_id) for _ in message_ids]
+        return self._sent(chat_id)
+
+    async def get_chat_history(self, chat_id, *args, **kwargs) -> AsyncGenerator[Message, None]:
+        await self._api("get_chat_history")
+        for message in self.channel_history.get(chat_id, []):
+            yield message
+
+    async def iter_history(self, chat_id, *args, **kwargs) -> AsyncGenerator[Message, None]:
+        await self._api("iter_history")
+        for message in self.channel_history.get(chat_id, []):
+            yield message
+
+
+def _drop_missing_methods(cls: type):
+    """
+    Remove fakes of API methods the installed Client doesn't have
+
+    Fakes cover both Pyrogram generations (get_chat_history on 2.x,
+    iter_history on 1.x, ...); keeping only the real ones means a call to
+    a method of the other generation raises AttributeError, as it would
+    in production.
+    """
+    for name, value in list(vars(cls).items()):
+        is_api = inspect.iscoroutinefunction(value) or inspect.isasyncgenfunction(value)
+        if is_api and not name.startswith("_") and not hasattr(Client, name):
+            delattr(cls, name)
+
+
+_drop_missing_methods(FakeClient)
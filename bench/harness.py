@@ -0,0 +1,294 @@
+"""
+Benchmark harness for Phoenix Filter Bot
+Builds the real handlers on a FakeClient against a scratch MongoDB database
+and dispatches updates the way Pyrogram's dispatcher does, timing each
+handler that runs.
+"""
+
+import asyncio
+import inspect
+import json
+import logging
+import time
+from collections import defaultdict
+from dataclasses import dataclass
+from typing import AsyncIterator, Dict, List, Optional, Union
+from motor.motor_asyncio import AsyncIOMotorClient
+from pyrogram import ContinuePropagation, StopPropagation
+from pyrogram.handlers import CallbackQueryHandler, MessageHandler, RawUpdateHandler
+from pyrogram.types import CallbackQuery, Message
+from bench.fake_client import (
+    FakeClient,
+    make_callback_query,
+    make_chat,
+    make_message,
+    make_user,
+)
+from bench.corpus import BENCH_CHANNEL_ID, seed_files
+from utils.callback_router import callback_router
+from utils.client_pool import ClientPool
+from utils.metrics import handler_name
+from utils.tenants import MAIN_TENANT
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_DATABASE_URI = "mongodb://localhost:27017"
+DEFAULT_DATABASE_NAME = "phoenix_bench"
+
+
+@dataclass
+class UpdateSpec:
+    """
+    One incoming update, independent of Pyrogram types
+
+    kind is "message" (text is the message text) or "callback" (data is
+    the callback data). Workloads and recordings are streams of these.
+
+    A callback with a page number presses a paging button on the latest
+    results the bot sent to the chat: data is then the route prefix, and
+    the token is taken from those results when the update is built.
+    """
+    kind: str
+    user_id: int
+    text: Optional[str] = None
+    data: Optional[str] = None
+    chat_type: str = "private"
+    chat_id: Optional[int] = None
+    page: Optional[int] = None
+
+
+def percentile(ordered: List[float], fraction: float) -> float:
+    if not ordered:
+        return 0.0
+    return ordered[min(len(ordered) - 1, int(fraction * len(ordered)))]
+
+
+class LatencyStats:
+    """Per-handler latency samples"""
+
+    def __init__(self):
+        self.samples: Dict[str, List[float]] = defaultdict(list)
+        self.errors: Dict[str, int] = defaultdict(int)
+        self.started = time.perf_counter()
+        self.finished: Optional[float] = None
+
+    def record(self, label: str, seconds: float, failed: bool = False):
+        self.samples[label].append(seconds)
+        if failed:
+            self.errors[label] += 1
+
+    def report(self) -> dict:
+        elapsed = (self.finished or time.perf_counter()) - self.started
+        handlers = {}
+        for label, samples in sorted(self.samples.items()):
+            ordered = sorted(samples)
+            handlers[label] = {
+                "count": len(ordered),
+                "errors": self.errors.get(label, 0),
+                "throughput": len(ordered) / elapsed if elapsed else 0.0,
+                "p50_ms": percentile(ordered, 0.50) * 1000,
+                "p95_ms": percentile(ordered, 0.95) * 1000,
+                "p99_ms": percentile(ordered, 0.99) * 1000,
+                "max_ms": ordered[-1] * 1000,
+            }
+        return {"elapsed_s": elapsed, "handlers": handlers}
+
+
+def format_report(report: dict) -> str:
+    """Report as a text table"""
+    lines = [
+        f"{'handler':<44} {'count':>7} {'err':>5} {'ops/s':>8} {'p50 ms':>8} {'p95 ms':>8} {'p99 ms':>8}",
+    ]
+    for label, row in report["handlers"].items():
+        lines.append(
+            f"{label[:44]:<44} {row['count']:>7} {row['errors']:>5} {row['throughput']:>8.1f} "
+            f"{row['p50_ms']:>8.2f} {row['p95_ms']:>8.2f} {row['p99_ms']:>8.2f}"
+        )
+    total = sum(row["count"] for row in report["handlers"].values())
+    lines.append(f"\n{total} handler runs in {report['elapsed_s']:.1f}s ({total / report['elapsed_s']:.1f}/s)")
+    if report.get("api_calls"):
+        calls = ", ".join(f"{method}={count}" for method, count in report["api_calls"].items())
+        lines.append(f"Fake Telegram API calls: {calls}")
+    return "\n".join(lines)
+
+
+class Harness:
+    """Real handlers, fake Telegram, scratch database"""
+
+    def __init__(
+        self,
+        database_uri: str = DEFAULT_DATABASE_URI,
+        database_name: str = DEFAULT_DATABASE_NAME,
+        api_latency: float = 0.0,
+    ):
+        self.database_uri = database_uri
+        self.database_name = database_name
+        self.client = FakeClient(api_latency)
+        self.bot = None
+        self.motor_client: Optional[AsyncIOMotorClient] = None
+        self.stats = LatencyStats()
+        self.file_ids: List[str] = []
+        self._ids = iter(range(1, 1 << 62))
+
+    async def setup(self, files: int = 0, reset: bool = True, seed: int = 42):
+        """
+        Build the bot's handlers on the fake client
+
+        Args:
+            files: Generated files to index (0 keeps what the database has)
+            reset: Drop the scratch database first
+            seed: Corpus seed
+        """
+        # Imported here so the harness module stays importable without a configured bot
+        from bot import PhoenixFilterBot
+
+        self.motor_client = AsyncIOMotorClient(self.database_uri)
+        db = self.motor_client[self.database_name]
+        if reset:
+            await self.motor_client.drop_database(self.database_name)
+        if files:
+            inserted = await seed_files(db, files, seed)
+            logger.info(f"Seeded {inserted} files")
+
+        self.bot = PhoenixFilterBot()
+        self.bot.client = self.client
+        self.bot.db = db
+        self.bot.motor_client = self.motor_client
+        self.bot.client_pool = ClientPool(self.client, tokens=[])
+        self.bot.setup_handlers()
+        # Pyrogram 1.x registers handlers from tasks; let them run
+        await asyncio.sleep(0.1)
+
+        await self.bot.search_engine.ensure_indexes()
+        await self.bot.search_engine.visibility.add_channel(MAIN_TENANT, BENCH_CHANNEL_ID)
+        self.file_ids = [
+            str(doc["_id"]) for doc in await db.files.find({}, {"_id": 1}).limit(50000).to_list(length=None)
+        ]
+
+    def build_update(self, spec: UpdateSpec) -> Union[Message, CallbackQuery]:
+        """Turn an UpdateSpec into the Pyrogram object a real update would parse to"""
+        user = make_user(spec.user_id, f"User{spec.user_id}")
+        chat_id = spec.chat_id or (spec.user_id if spec.chat_type == "private" else -1001000000000 - spec.user_id)
+        chat = make_chat(chat_id, spec.chat_type, None if spec.chat_type == "private" else "Bench Group")
+        if spec.kind == "callback":
+            data = spec.data if spec.page is None else self._page_data(chat_id, spec.data, spec.page)
+            origin = make_message(self.client, next(self._ids), chat, self.client.bot_user, "results")
+            return make_callback_query(self.client, next(self._ids), user, origin, data)
+        return make_message(self.client, next(self._ids), chat, user, spec.text)
+
+    def _page_data(self, chat_id: int, route: str, page: int) -> str:
+        """Callback data for a page of the latest results in a chat ("expired" if there are none)"""
+        markup = self.client.last_markup.get(chat_id)
+        for row in getattr(markup, "inline_keyboard", None) or []:
+            for button in row:
+                data = button.callback_data or ""
+                if isinstance(data, str) and data.startswith(route):
+                    token, _, _ = data[len(route):].rpartition("_")
+                    return f"{route}{token}_{page}"
+        return f"{route}expired_{page}"
+
+    @staticmethod
+    def _label(handler, update) -> str:
+        if isinstance(update, CallbackQuery):
+            route, _ = callback_router.resolve(update.data or "")
+            return f"callback:{route or 'unrouted'}"
+        return handler_name(inspect.unwrap(handler.callback))
+
+    async def dispatch(self, update: Union[Message, CallbackQuery]):
+        """Run one update through the handler groups like Pyrogram's dispatcher"""
+        handler_type = CallbackQueryHandler if isinstance(update, CallbackQuery) else MessageHandler
+        try:
+            for group in list(self.client.dispatcher.groups.values()):
+                for handler in group:
+                    if isinstance(handler, RawUpdateHandler) or not isinstance(handler, handler_type):
+                        continue
+                    try:
+                        if not await handler.check(self.client, update):
+                            continue
+                    except Exception as e:
+                        logger.debug(f"Filter error: {e}")
+                        continue
+
+                    label = self._label(handler, update)
+                    started = time.perf_counter()
+                    failed = False
+                    try:
+                        await handler.callback(self.client, update)
+                    except (StopPropagation, ContinuePropagation):
+                        raise
+                    except Exception as e:
+                        failed = True
+                        logger.debug(f"{label} raised {type(e).__name__}: {e}")
+                    finally:
+                        self.stats.record(label, time.perf_counter() - started, failed)
+                    break
+        except StopPropagation:
+            pass
+        except ContinuePropagation:
+            pass
+
+    async def run(
+        self,
+        updates: AsyncIterator[tuple],
+        concurrency: int = 50,
+    ) -> dict:
+        """
+        Dispatch a timed update stream
+
+        Args:
+            updates: Async iterator of (send_at, UpdateSpec); send_at is seconds
+                from the start, or None to send as fast as workers allow
+            concurrency: Updates in flight at once (Pyrogram's workers setting)
+        """
+        semaphore = asyncio.Semaphore(concurrency)
+        in_flight = set()
+        self.stats = LatencyStats()
+        start = time.perf_counter()
+
+        async def handle(spec: UpdateSpec):
+            try:
+                await self.dispatch(self.build_update(spec))
+            finally:
+                semaphore.release()
+
+        async for send_at, spec in updates:
+            if send_at is not None:
+                delay = start + send_at - time.perf_counter()
+                if delay > 0:
+                    await asyncio.sleep(delay)
+            await semaphore.acquire()
+            task = asyncio.create_task(handle(spec))
+            in_flight.add(task)
+            task.add_done_callback(in_flight.discard)
+
+        if in_flight:
+            await asyncio.gather(*in_flight, return_exceptions=True)
+        # Let queued file deliveries finish so they are part of the run
+        await self._drain_deliveries()
+        self.stats.finished = time.perf_counter()
+
+        report = self.stats.report()
+        report["api_calls"] = dict(self.client.calls.most_common())
+        return report
+
+    async def _drain_deliveries(self, timeout: float = 60):
+        scheduler = self.bot.delivery_engine.scheduler
+        deadline = time.monotonic() + timeout
+        while time.monotonic() < deadline:
+            metrics = scheduler.get_metrics()
+            if not (metrics["queue_premium"] or metrics["queue_free"] or metrics["active"] or metrics["waiting_users"]):
+                return
+            await asyncio.sleep(0.05)
+
+    async def close(self):
+        if self.bot:
+            await self.bot.delivery_engine.shutdown()
+            await self.bot.search_engine.close()
+            await self.bot.broadcast_manager.shutdown()
+        if self.motor_client:
+            self.motor_client.close()
+
+
+def write_report(report: dict, path: str):
+    with open(path, "w") as f:
+        json.dump(report, f, indent=2)
@@ -0,0 +1,135 @@
+"""
+Synthetic load benchmark for Phoenix Filter Bot
+
+Drives the real handlers with a realistic mix of searches, downloads,
+button presses and admin commands against a local MongoDB, then reports
+throughput and latency percentiles per handler.
+
+    python -m bench.load --files 20000 --updates 5000 --concurrency 50
+"""
+
+import argparse
+import asyncio
+import itertools
+import logging
+import random
+from typing import AsyncIterator, List, Optional
+from config import ADMINS
+from bench.corpus import sample_queries
+from bench.harness import (
+    DEFAULT_DATABASE_NAME,
+    DEFAULT_DATABASE_URI,
+    Harness,
+    UpdateSpec,
+    format_report,
+    write_report,
+)
+
+FIRST_USER_ID = 100000000
+
+# (weight, kind, payload); payload None means generated per update
+WORKLOAD_MIX = [
+    (50, "search", None),
+    (20, "download", None),
+    (8, "message", "/start"),
+    (4, "message", "/help"),
+    (4, "message", "/myplan"),
+    (2, "message", "/benefits"),
+    (2, "callback", "show_comparison"),
+    (2, "message", "/id"),
+    (2, "message", "/info"),
+    (1, "admin", "/stats"),
+    (0.5, "admin", "/users"),
+    (0.5, "admin", "/audience"),
+]
+
+
+async def synthetic_updates(
+    count: int,
+    users: int,
+    file_ids: List[str],
+    rate: float = 0.0,
+    seed: int = 7,
+    titles: int = 1000,
+) -> AsyncIterator[tuple]:
+    """
+    Yield (send_at, UpdateSpec) following WORKLOAD_MIX
+
+    Args:
+        count: Number of updates
+        users: Distinct simulated users
+        file_ids: Document IDs downloads pick from (popular ones more often)
+        rate: Mean updates per second with Poisson arrivals (0 sends as fast as possible)
+        seed: Random seed
+        titles: Titles in the corpus, so queries hit indexed files
+    """
+    rng = random.Random(seed)
+    queries = sample_queries(min(count, 10000), seed, titles)
+    weights = [weight for weight, _, _ in WORKLOAD_MIX]
+    popularity = list(itertools.accumulate(1 / (rank + 1) for rank in range(len(file_ids))))
+    send_at = 0.0
+
+    for index in range(count):
+        _, kind, payload = rng.choices(WORKLOAD_MIX, weights=weights)[0]
+        user_id = FIRST_USER_ID + int(rng.paretovariate(1.1) * 10) % users
+
+        if kind == "search":
+            spec = UpdateSpec("message", user_id, text=queries[index % len(queries)])
+        elif kind == "download":
+            if not file_ids:
+                continue
+            doc_id = rng.choices(file_ids, cum_weights=popularity)[0]
+            spec = UpdateSpec("callback", user_id, data=f"download_{doc_id}")
+        elif kind == "callback":
+            spec = UpdateSpec("callback", user_id, data=payload)
+        elif kind == "admin":
+            spec = UpdateSpec("message", ADMINS[0], text=payload)
+        else:
+            spec = UpdateSpec("message", user_id, text=payload)
+
+        if rate > 0:
+            send_at += rng.expovariate(rate)
+            yield send_at, spec
+        else:
+            yield None, spec
+
+
+async def run(args: argparse.Namespace) -> dict:
+    harness = Harness(args.database_uri, args.database, api_latency=args.api_latency_ms / 1000)
+    try:
+        await harness.setup(files=args.files, reset=not args.no_reset, seed=args.seed)
+        updates = synthetic_updates(
+            args.updates, args.users, harness.file_ids, args.rate, args.seed, titles=max(10, args.files // 20)
+        )
+        return await harness.run(updates, concurrency=args.concurrency)
+    finally:
+        await harness.close()
+
+
+def parse_args(argv: Optional[List[str]] = None) -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description="Benchmark the bot's handlers with synthetic traffic")
+    parser.add_argument("--updates", type=int, default=5000, help="updates to send")
+    parser.add_argument("--users", type=int, default=2000, help="distinct simulated users")
+    parser.add_argument("--concurrency", type=int, default=50, help="updates handled at once")
+    parser.add_argument("--rate", type=float, default=0, help="mean updates/second (0 = as fast as possible)")
+    parser.add_argument("--files", type=int, default=20000, help="generated files to index")
+    parser.add_argument("--api-latency-ms", type=float, default=30, help="simulated Telegram API latency")
+    parser.add_argument("--database-uri", default=DEFAULT_DATABASE_URI)
+    parser.add_argument("--database", default=DEFAULT_DATABASE_NAME, help="scratch database (dropped first)")
+    parser.add_argument("--no-reset", action="store_true", help="keep the existing scratch database")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--json", help="also write the report to this file")
+    return parser.parse_args(argv)
+
+
+def main(argv: Optional[List[str]] = None):
+    args = parse_args(argv)
+    logging.basicConfig(level=logging.WARNING)
+    report = asyncio.run(run(args))
+    print(format_report(report))
+    if args.json:
+        write_report(report, args.json)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,175 @@
+"""
+Replay recorded traffic through the real handlers
+
+Reads the files written by utils.traffic.TrafficRecorder (including rotated
+ones and recordings from several shards) and sends the updates to a
+FakeClient with their original spacing, sped up or as fast as possible.
+
+    python -m bench.replay recordings --speed 10 --files 20000
+    python -m bench.replay recordings/traffic.jsonl --speed max
+"""
+
+import argparse
+import asyncio
+import glob
+import heapq
+import json
+import logging
+import os
+import re
+from typing import AsyncIterator, Iterator, List, Optional
+from config import ADMINS
+from bench.harness import (
+    DEFAULT_DATABASE_NAME,
+    DEFAULT_DATABASE_URI,
+    Harness,
+    UpdateSpec,
+    format_report,
+    write_report,
+)
+from bench.load import FIRST_USER_ID
+
+CHAT_TYPES = {"p": "private", "g": "group", "s": "supergroup", "c": "channel"}
+_ROTATED = re.compile(r"\.(\d+)$")
+
+
+def recording_files(paths: List[str]) -> List[List[str]]:
+    """
+    Group recording files into streams, oldest file first
+
+    A directory stands for every recording in it; "traffic.jsonl" and its
+    rotated "traffic.jsonl.1", "traffic.jsonl.2"... form one stream.
+    """
+    files = []
+    for path in paths:
+        if os.path.isdir(path):
+            files.extend(glob.glob(os.path.join(path, "*.jsonl*")))
+        else:
+            files.append(path)
+
+    streams = {}
+    for path in sorted(set(files)):
+        match = _ROTATED.search(path)
+        base = path[: match.start()] if match else path
+        streams.setdefault(base, []).append((int(match.group(1)) if match else 0, path))
+    # Higher rotation numbers are older
+    return [[path for _, path in sorted(group, reverse=True)] for group in streams.values()]
+
+
+def read_stream(paths: List[str]) -> Iterator[list]:
+    for path in paths:
+        with open(path, encoding="utf-8") as f:
+            for line in f:
+                try:
+                    entry = json.loads(line)
+                except ValueError:
+                    # The last line may be cut off if the bot was killed mid-write
+                    continue
+                if isinstance(entry, list) and len(entry) >= 6:
+                    yield entry
+
+
+def to_spec(entry: list, file_ids: List[str]) -> Optional[UpdateSpec]:
+    """Turn a recorded entry into an UpdateSpec, or None if it cannot be replayed"""
+    _, kind, user, chat_code, payload, is_admin = entry[:6]
+    user_id = ADMINS[0] if is_admin and ADMINS else FIRST_USER_ID + user
+    chat_type = CHAT_TYPES.get(chat_code, "private")
+
+    if kind == "m":
+        return UpdateSpec("message", user_id, text=payload, chat_type=chat_type)
+    if kind != "c":
+        return None
+
+    route, _, key = payload.partition("#")
+    key, _, page = key.partition("_")
+    if page.isdigit():
+        # Paging through results: the token is the one on the results this user got
+        return UpdateSpec("callback", user_id, data=route, chat_type=chat_type, page=int(page))
+    if key:
+        if route != "download_" or not file_ids:
+            # Other identifiers (payments, channels) do not exist in the scratch database
+            data = f"{route}{key}"
+        else:
+            # The same recorded file always maps to the same local file
+            data = f"{route}{file_ids[int(key) % len(file_ids)]}"
+    else:
+        data = route
+    return UpdateSpec("callback", user_id, data=data, chat_type=chat_type)
+
+
+async def recorded_updates(
+    paths: List[str],
+    file_ids: List[str],
+    speed: Optional[float] = 1.0,
+    limit: int = 0,
+) -> AsyncIterator[tuple]:
+    """
+    Yield (send_at, UpdateSpec) from recordings
+
+    Args:
+        paths: Recording files or directories
+        file_ids: Document IDs recorded downloads map onto
+        speed: Time compression (10 replays an hour in six minutes); None sends as fast as possible
+        limit: Stop after this many updates (0 replays everything)
+    """
+    streams = [read_stream(files) for files in recording_files(paths)]
+    first = None
+    sent = 0
+    for entry in heapq.merge(*streams, key=lambda entry: entry[0]):
+        spec = to_spec(entry, file_ids)
+        if spec is None:
+            continue
+        if first is None:
+            first = entry[0]
+        yield (None if speed is None else (entry[0] - first) / 1000 / speed), spec
+        sent += 1
+        if limit and sent >= limit:
+            return
+
+
+def parse_speed(value: str) -> Optional[float]:
+    if value.lower() == "max":
+        return None
+    speed = float(value.lower().rstrip("x"))
+    if speed <= 0:
+        raise argparse.ArgumentTypeError("speed must be positive or 'max'")
+    return speed
+
+
+async def run(args: argparse.Namespace) -> dict:
+    harness = Harness(args.database_uri, args.database, api_latency=args.api_latency_ms / 1000)
+    try:
+        await harness.setup(files=args.files, reset=not args.no_reset, seed=args.seed)
+        updates = recorded_updates(args.recordings, harness.file_ids, args.speed, args.limit)
+        return await harness.run(updates, concurrency=args.concurrency)
+    finally:
+        await harness.close()
+
+
+def parse_args(argv: Optional[List[str]] = None) -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description="Replay recorded traffic through the bot's handlers")
+    parser.add_argument("recordings", nargs="+", help="recording files or directories")
+    parser.add_argument("--speed", type=parse_speed, default=1.0, help="1, 10 (or 10x), ... or max")
+    parser.add_argument("--limit", type=int, default=0, help="stop after this many updates")
+    parser.add_argument("--concurrency", type=int, default=50, help="updates handled at once")
+    parser.add_argument("--files", type=int, default=20000, help="generated files to index")
+    parser.add_argument("--api-latency-ms", type=float, default=30, help="simulated Telegram API latency")
+    parser.add_argument("--database-uri", default=DEFAULT_DATABASE_URI)
+    parser.add_argument("--database", default=DEFAULT_DATABASE_NAME, help="scratch database (dropped first)")
+    parser.add_argument("--no-reset", action="store_true", help="keep the existing scratch database")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--json", help="also write the report to this file")
+    return parser.parse_args(argv)
+
+
+def main(argv: Optional[List[str]] = None):
+    args = parse_args(argv)
+    logging.basicConfig(level=logging.WARNING)
+    report = asyncio.run(run(args))
+    print(format_report(report))
+    if args.json:
+        write_report(report, args.json)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,255 @@
+"""
+SearchEngine micro-benchmark
+
+Generates a release-name corpus into a scratch MongoDB database and times
+SearchEngine operations one at a time, reporting latency percentiles,
+Python memory and the keys and documents MongoDB examined per operation.
+
+    python -m bench.search --files 1000000 --json v2.json
+    python -m bench.search --files 1000000 --no-reset --baseline v1.json
+
+Each measured operation is a case in CASES; a new index structure gets a
+case of its own so it shows up in the same report.
+"""
+
+import argparse
+import asyncio
+import json
+import logging
+import resource
+import subprocess
+import sys
+import time
+import tracemalloc
+from dataclasses import dataclass
+from typing import Awaitable, Callable, Dict, List, Optional
+from motor.motor_asyncio import AsyncIOMotorClient, AsyncIOMotorDatabase
+from bench.corpus import BENCH_CHANNEL_ID, generate_files, sample_queries, seed_files
+from bench.harness import DEFAULT_DATABASE_URI, percentile, write_report
+from utils.search import SearchEngine
+
+DEFAULT_DATABASE_NAME = "phoenix_bench_search"
+# Files added by the index_file case come from their own channel
+INDEX_CHANNEL_ID = BENCH_CHANNEL_ID - 1
+
+
+@dataclass
+class BenchContext:
+    engine: SearchEngine
+    queries: List[str]
+    file_ids: List[str]
+    new_files: List[dict]
+    channels: frozenset
+
+
+# One operation of a case; the argument is the operation number
+Operation = Callable[[BenchContext, int], Awaitable]
+
+
+async def search_uncached(ctx: BenchContext, index: int):
+    ctx.engine.result_cache.clear()
+    return await ctx.engine.search(ctx.queries[index % len(ctx.queries)], channels=ctx.channels)
+
+
+async def search_cached(ctx: BenchContext, index: int):
+    # The query stream repeats popular titles, like real traffic, so the cache gets hits
+    return await ctx.engine.search(ctx.queries[index % len(ctx.queries)], channels=ctx.channels)
+
+
+async def index_file(ctx: BenchContext, index: int):
+    # index_file adds to the dict it is given; keep the generated one clean
+    return await ctx.engine.index_file(dict(ctx.new_files[index % len(ctx.new_files)]))
+
+
+async def get_file_by_id(ctx: BenchContext, index: int):
+    return await ctx.engine.get_file_by_id(ctx.file_ids[(index * 7919) % len(ctx.file_ids)])
+
+
+async def get_popular_files(ctx: BenchContext, index: int):
+    return await ctx.engine.get_popular_files(limit=10)
+
+
+async def spelling_suggest(ctx: BenchContext, index: int):
+    # In-process only; the vocabulary is built before the cases run
+    query = ctx.queries[index % len(ctx.queries)]
+    cut = len(query) // 2
+    return await ctx.engine.spelling.suggest(query[:cut] + query[cut + 1:])
+
+
+CASES: Dict[str, Operation] = {
+    "search_uncached": search_uncached,
+    "search_cached": search_cached,
+    "index_file": index_file,
+    "get_file_by_id": get_file_by_id,
+    "get_popular_files": get_popular_files,
+    "spelling_suggest": spelling_suggest,
+}
+
+
+async def examined(db: AsyncIOMotorDatabase) -> tuple:
+    """Server-wide (keys, documents) examined so far"""
+    status = await db.client.admin.command("serverStatus")
+    executor = status["metrics"]["queryExecutor"]
+    return executor["scanned"], executor["scannedObjects"]
+
+
+async def run_case(operation: Operation, ctx: BenchContext, db: AsyncIOMotorDatabase, count: int) -> dict:
+    """Run one case count times in sequence and summarize it"""
+    # Warm up connections and the working set with operations past the measured ones
+    for index in range(count, count + 10):
+        await operation(ctx, index)
+
+    keys_before, docs_before = await examined(db)
+    tracemalloc.start()
+    samples = []
+    started = time.perf_counter()
+    for index in range(count):
+        op_started = time.perf_counter()
+        await operation(ctx, index)
+        samples.append(time.perf_counter() - op_started)
+    elapsed = time.perf_counter() - started
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    keys_after, docs_after = await examined(db)
+
+    ordered = sorted(samples)
+    return {
+        "count": count,
+        "ops_per_s": count / elapsed if elapsed else 0.0,
+        "mean_ms": sum(ordered) / count * 1000,
+        "p50_ms": percentile(ordered, 0.50) * 1000,
+        "p95_ms": percentile(ordered, 0.95) * 1000,
+        "p99_ms": percentile(ordered, 0.99) * 1000,
+        "max_ms": ordered[-1] * 1000,
+        # tracemalloc adds overhead to allocation-heavy code; latencies are still comparable run to run
+        "py_peak_kb": peak / 1024,
+        "keys_examined_per_op": (keys_after - keys_before) / count,
+        "docs_examined_per_op": (docs_after - docs_before) / count,
+    }
+
+
+async def collection_stats(db: AsyncIOMotorDatabase) -> dict:
+    stats = await db.command("collStats", "files")
+    return {
+        "documents": stats["count"],
+        "data_mb": stats["size"] / 2**20,
+        "storage_mb": stats["storageSize"] / 2**20,
+        "index_mb": stats["totalIndexSize"] / 2**20,
+        "indexes": {name: size / 2**20 for name, size in stats["indexSizes"].items()},
+    }
+
+
+def git_revision() -> Optional[str]:
+    try:
+        return subprocess.run(
+            ["git", "describe", "--always", "--dirty"], capture_output=True, text=True, check=True
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+async def run(args: argparse.Namespace) -> dict:
+    motor_client = AsyncIOMotorClient(args.database_uri)
+    db = motor_client[args.database]
+    engine = SearchEngine(db)
+    try:
+        if not args.no_reset:
+            await motor_client.drop_database(args.database)
+            seeding_started = time.perf_counter()
+            inserted = await seed_files(db, args.files, args.seed)
+            print(f"Seeded {inserted} files in {time.perf_counter() - seeding_started:.1f}s", file=sys.stderr)
+        await engine.ensure_indexes()
+        # Runs with --no-reset would otherwise find the index_file documents already there
+        await db.files.delete_many({"channel_id": INDEX_CHANNEL_ID})
+        await engine.refresh_vocabulary()
+        files = await db.files.estimated_document_count()
+        file_ids = [doc["file_id"] for doc in await db.files.find({}, {"file_id": 1}).limit(100000).to_list(None)]
+
+        ctx = BenchContext(
+            engine=engine,
+            queries=sample_queries(max(args.operations, 1000), seed=7, titles=max(10, files // 20)),
+            file_ids=file_ids,
+            # Distinct from the corpus (other seed and channel) so every call inserts
+            new_files=list(generate_files(
+                args.operations + 10, seed=args.seed + 1, channel_id=INDEX_CHANNEL_ID, stored=False
+            )),
+            channels=frozenset({BENCH_CHANNEL_ID}),
+        )
+
+        selected = args.cases or list(CASES)
+        report = {
+            "revision": git_revision(),
+            "label": args.label,
+            "started_at": time.strftime("%Y-%m-%dT%H:%M:%S"),
+            "files": files,
+            "operations": args.operations,
+            "cases": {},
+        }
+        for name in selected:
+            print(f"Running {name}...", file=sys.stderr)
+            report["cases"][name] = await run_case(CASES[name], ctx, db, args.operations)
+
+        report["collection"] = await collection_stats(db)
+        # ru_maxrss is KiB on Linux
+        report["rss_peak_mb"] = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+        return report
+    finally:
+        await engine.close()
+        motor_client.close()
+
+
+def format_report(report: dict, baseline: Optional[dict] = None) -> str:
+    """Report as a text table, with the p50 change against a baseline report"""
+    lines = [
+        f"{report['files']} files, {report['operations']} operations per case, revision {report['revision']}",
+        f"{'case':<20} {'ops/s':>9} {'p50 ms':>8} {'p95 ms':>8} {'p99 ms':>8} "
+        f"{'keys/op':>10} {'docs/op':>10} {'py KiB':>8}" + (f" {'p50 vs base':>12}" if baseline else ""),
+    ]
+    for name, row in report["cases"].items():
+        line = (
+            f"{name:<20} {row['ops_per_s']:>9.1f} {row['p50_ms']:>8.2f} {row['p95_ms']:>8.2f} {row['p99_ms']:>8.2f} "
+            f"{row['keys_examined_per_op']:>10.1f} {row['docs_examined_per_op']:>10.1f} {row['py_peak_kb']:>8.0f}"
+        )
+        base = (baseline or {}).get("cases", {}).get(name)
+        if base and base["p50_ms"]:
+            line += f" {(row['p50_ms'] / base['p50_ms'] - 1) * 100:>+11.1f}%"
+        lines.append(line)
+    collection = report.get("collection")
+    if collection:
+        lines.append(
+            f"\nfiles collection: {collection['data_mb']:.0f} MiB data, {collection['index_mb']:.0f} MiB indexes"
+        )
+    lines.append(f"Peak RSS: {report['rss_peak_mb']:.0f} MiB")
+    return "\n".join(lines)
+
+
+def parse_args(argv: Optional[List[str]] = None) -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description="Benchmark SearchEngine against a generated corpus")
+    parser.add_argument("--files", type=int, default=1000000, help="files to generate (100k to 5M is realistic)")
+    parser.add_argument("--operations", type=int, default=1000, help="operations per case")
+    parser.add_argument("--cases", nargs="+", choices=list(CASES), help="cases to run (default: all)")
+    parser.add_argument("--database-uri", default=DEFAULT_DATABASE_URI)
+    parser.add_argument("--database", default=DEFAULT_DATABASE_NAME, help="scratch database (dropped first)")
+    parser.add_argument("--no-reset", action="store_true", help="reuse the corpus already in the scratch database")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--label", help="name for this run in the report, e.g. a branch")
+    parser.add_argument("--baseline", help="earlier JSON report to compare against")
+    parser.add_argument("--json", help="also write the report to this file")
+    return parser.parse_args(argv)
+
+
+def main(argv: Optional[List[str]] = None):
+    args = parse_args(argv)
+    logging.basicConfig(level=logging.WARNING)
+    report = asyncio.run(run(args))
+    baseline = None
+    if args.baseline:
+        with open(args.baseline) as f:
+            baseline = json.load(f)
+    print(format_report(report, baseline))
+    if args.json:
+        write_report(report, args.json)
+
+
+if __name__ == "__main__":
+    main()
@@ -5,6 +5,7 @@ A next-generation Telegram media distribution bot
 
 import logging
 import asyncio
+from typing import Optional
 from pyrogram import Client
 from motor.motor_asyncio import AsyncIOMotorClient
 from config import (
@@ -14,17 +15,39 @@ from config import (
     DATABASE_URI,
     LOG_CHANNEL,
     OWNER_ID,
+    AUDIENCE_REPORT_HOURS,
+    STREAM_ENABLED,
+    CLONE_ENABLED,
+    CLONE_SHARDS,
+    METRICS_ENABLED,
+    METRICS_PORT,
+    DB_MONITOR_ENABLED,
+    DB_EXPLAIN_AUDIT,
+    LOOP_MONITOR_ENABLED,
+    TRAFFIC_RECORD_ENABLED,
     validate_config,
 )
 from handlers import setup_command_handlers, setup_filters, setup_callback_handlers
 from handlers.search_handlers import setup_search_handlers
-from handlers.admin_handlers import setup_admin_handlers
+from handlers.admin_handlers import restore_link_revocations, setup_admin_handlers
 from handlers.premium_handlers import setup_premium_handlers
 from handlers.file_handlers import setup_file_handlers
 from handlers.payment_handlers import setup_payment_handlers
 from handlers.benefits_handlers import setup_benefits_handlers
 from handlers.clone_handlers import setup_clone_handlers
 from handlers.advanced_features import setup_advanced_handlers
+from handlers.chat_handlers import setup_chat_handlers
+from utils.client_pool import ClientPool
+from utils.clone_runtime import CloneRuntime
+from utils.clone_supervisor import CloneSupervisor
+from utils.loop_monitor import loop_monitor
+from utils.metrics import CommandMetrics, instrument_api, instrument_handlers, metrics
+from utils.pages import result_pages
+from utils.premium_benefits import PremiumBenefits
+from utils.query_monitor import query_monitor
+from utils.reachability import run_audience_reports
+from utils.traffic import TrafficRecorder
+from web import MetricsServer, StreamServer
 
 # Setup logging
 logging.basicConfig(
@@ -37,14 +60,26 @@ logger = logging.getLogger(__name__)
 class PhoenixFilterBot:
     """Main bot class"""
     
-    def __init__(self):
+    def __init__(self, clone_shard: Optional[int] = None):
+        self.clone_shard = clone_shard
         self.client = None
+        self.client_pool = None
+        self.clone_runtime = None
         self.db = None
         self.motor_client = None
+        self.broadcast_manager = None
+        self.delivery_engine = None
+        self.search_engine = None
+        self.stream_server = None
+        self.metrics_server = None
+        self.traffic_recorder = None
+        self.background_tasks = []
     
     async def initialize(self):
         """Initialize the bot and database"""
         logger.info("🔥 Initializing Phoenix Filter Bot...")
+        if LOOP_MONITOR_ENABLED:
+            loop_monitor.start()
         
         # Validate configuration
         if not validate_config():
@@ -60,33 +95,180 @@ class PhoenixFilterBot:
             sleep_threshold=0,  # Disable sleep to prevent time sync issues
             no_updates=False,
         )
+        if METRICS_ENABLED:
+            # Must precede the setup_* calls so every handler is wrapped
+            instrument_handlers(self.client)
+            instrument_api(self.client)
+        
+        # Extra sessions for media transfers; started after the main client
+        self.client_pool = ClientPool(self.client)
         
         # Initialize MongoDB connection
         try:
-            self.motor_client = AsyncIOMotorClient(DATABASE_URI)
+            listeners = []
+            if METRICS_ENABLED:
+                listeners.append(CommandMetrics())
+            if DB_MONITOR_ENABLED:
+                listeners.append(query_monitor)
+            self.motor_client = AsyncIOMotorClient(DATABASE_URI, event_listeners=listeners)
             self.db = self.motor_client.phoenix_filter_bot
             
             # Test connection
             await self.motor_client.admin.command('ping')
             logger.info("✅ Database connection successful")
+            if DB_MONITOR_ENABLED:
+                query_monitor.start(self.motor_client)
         except Exception as e:
             logger.error(f"❌ Database connection failed: {e}")
             raise
         
-        # Setup handlers
+        self.setup_handlers()
+
+        # Shard processes share the main process's database, which already did this
+        if self.clone_shard is None:
+            try:
+                await self.search_engine.ensure_indexes()
+            except Exception as e:
+                logger.warning(f"Could not prepare the files index: {e}")
+            try:
+                await PremiumBenefits.ensure_indexes(self.db)
+            except Exception as e:
+                logger.warning(f"Could not prepare the download quota index: {e}")
+            if DB_MONITOR_ENABLED and DB_EXPLAIN_AUDIT:
+                await query_monitor.audit(self.db.name)
+
+        if METRICS_ENABLED:
+            self._register_metrics()
+
+        logger.info("✅ Bot initialization complete")
+    
+    def setup_handlers(self):
+        """
+        Register every handler on self.client
+        
+        Needs self.client, self.client_pool and self.db; the benchmark
+        harness calls this with a fake client.
+        """
+        # Clones reuse the handlers registered below, either in this process
+        # or in shard processes that build the same handlers
+        if CLONE_SHARDS and self.clone_shard is None:
+            self.clone_runtime = CloneSupervisor(CLONE_SHARDS)
+        else:
+            self.clone_runtime = CloneRuntime(self.client, self.db)
+        
+        if TRAFFIC_RECORD_ENABLED:
+            name = "traffic" if self.clone_shard is None else f"traffic-shard{self.clone_shard}"
+            self.traffic_recorder = TrafficRecorder(name=name)
+            self.traffic_recorder.attach(self.client)
+        
         setup_command_handlers(self.client)
         setup_filters(self.client)
-        setup_callback_handlers(self.client)
-        setup_search_handlers(self.client, self.db)
-        setup_admin_handlers(self.client, self.db)
+        self.search_engine, _ = setup_search_handlers(self.client, self.db)
+        self.delivery_engine = setup_callback_handlers(
+            self.client, self.db, self.search_engine, self.client_pool
+        )
+        self.broadcast_manager = setup_admin_handlers(self.client, self.db)
         setup_premium_handlers(self.client, self.db)
         setup_file_handlers(self.client, self.db)
         setup_payment_handlers(self.client, self.db)
         setup_benefits_handlers(self.client, self.db)
-        setup_clone_handlers(self.client, self.db)
+        setup_clone_handlers(self.client, self.db, self.clone_runtime)
         setup_advanced_handlers(self.client, self.db)
+        setup_chat_handlers(self.client, self.db)
+    
+    def _register_metrics(self):
+        """Export queue depths, session load and cache hit rates"""
+        scheduler = self.delivery_engine.scheduler
+        metrics.gauge(
+            "phoenix_delivery_queue_depth", "File sends waiting to be scheduled", ("tier",),
+            collect=lambda: {
+                ("premium",): scheduler.get_metrics()["queue_premium"],
+                ("free",): scheduler.get_metrics()["queue_free"],
+            },
+        )
+        metrics.gauge(
+            "phoenix_delivery_active", "File sends in flight",
+            collect=lambda: {(): scheduler.get_metrics()["active"]},
+        )
+        metrics.gauge(
+            "phoenix_session_active_requests", "Transfers in flight per Telegram session", ("session",),
+            collect=lambda: {(name,): load["active"] for name, load in self.client_pool.get_metrics().items()},
+        )
+        metrics.gauge(
+            "phoenix_clones", "Cloned bots by state", ("state",),
+            collect=lambda: {
+                (state,): count for state, count in self.clone_runtime.get_stats().items()
+                if state in ("active", "sleeping")
+            },
+        )
+        metrics.register_cache("delivery_files", self.delivery_engine.file_cache)
+        metrics.register_cache("delivery_tiers", self.delivery_engine.tier_cache)
+        metrics.register_cache("delivery_unreachable", self.delivery_engine.unreachable)
+        metrics.register_cache("search_results", self.search_engine.result_cache)
+        metrics.register_cache("search_pages", result_pages.cache)
+        metrics.register_cache("channel_visibility", self.search_engine.visibility.cache)
+    
+    async def start_metrics_server(self, port: int = METRICS_PORT):
+        """Serve /metrics on a local port"""
+        if not METRICS_ENABLED or self.metrics_server:
+            return
+        self.metrics_server = MetricsServer(port)
+        try:
+            await self.metrics_server.start()
+        except OSError as e:
+            logger.warning(f"Could not start metrics endpoint on port {port}: {e}")
+            self.metrics_server = None
+    
+    async def start_stream_server(self):
+        """Serve /stream links alongside the bot"""
+        if not STREAM_ENABLED or self.stream_server:
+            return
+        try:
+            restored = await restore_link_revocations(self.db)
+            if restored:
+                logger.info(f"🔒 Restored link revocations of {restored} banned user(s)")
+        except Exception as e:
+            logger.error(f"Could not restore link revocations: {e}")
+        stream_server = StreamServer(self.client_pool)
+        try:
+            await stream_server.start()
+        except OSError as e:
+            logger.warning(f"Could not start the streaming server: {e}")
+            return
+        self.stream_server = stream_server
+        metrics.register_cache("stream_messages", stream_server.streamer.message_cache)
+        if stream_server.chunk_cache:
+            metrics.register_cache("stream_chunks", stream_server.chunk_cache)
+    
+    async def start_services(self):
+        """
+        Start everything that runs next to the connected client
         
-        logger.info("✅ Bot initialization complete")
+        Each service fails on its own: the bot keeps answering even if,
+        say, the streaming port is taken.
+        """
+        services = [
+            ("worker bot pool", self.client_pool.start),
+            ("metrics endpoint", self.start_metrics_server),
+            ("streaming server", self.start_stream_server),
+        ]
+        if CLONE_ENABLED:
+            services.append(("clone runtime", self.clone_runtime.start))
+        for name, start_service in services:
+            try:
+                await start_service()
+            except Exception as e:
+                logger.error(f"❌ Could not start the {name}: {e}")
+        
+        # Resume broadcasts interrupted by the last shutdown
+        resumed = await self.broadcast_manager.resume_jobs(self.client)
+        if resumed:
+            logger.info(f"📢 Resumed {resumed} broadcast job(s)")
+        
+        if AUDIENCE_REPORT_HOURS > 0:
+            self.background_tasks.append(asyncio.create_task(
+                run_audience_reports(self.client, self.db, LOG_CHANNEL, AUDIENCE_REPORT_HOURS)
+            ))
     
     async def start(self):
         """Start the bot with retry logic"""
@@ -101,20 +283,7 @@ class PhoenixFilterBot:
                 logger.info(f"✅ Bot started successfully!")
                 logger.info(f"   Bot: @{me.username}")
                 logger.info(f"   ID: {me.id}")
-                
-                # Send startup notification to owner
-                try:
-                    await self.client.send_message(
-                        OWNER_ID,
-                        "🔥 **Phoenix Filter Bot Started**\n\n"
-                        "The bot is now online and ready to use!"
-                    )
-                except Exception as e:
-                    logger.warning(f"Could not send startup message to owner: {e}")
-                
-                # Keep the bot running
-                await asyncio.Event().wait()
-                return
+                break
             except Exception as e:
                 error_msg = str(e)
                 logger.error(f"❌ Connection attempt {attempt} failed: {error_msg}")
@@ -130,13 +299,52 @@ class PhoenixFilterBot:
                 else:
                     logger.error(f"❌ Failed to start bot after {max_retries} attempts")
                     raise
+        
+        # Send startup notification to owner
+        try:
+            await self.client.send_message(
+                OWNER_ID,
+                "🔥 **Phoenix Filter Bot Started**\n\n"
+                "The bot is now online and ready to use!"
+            )
+        except Exception as e:
+            logger.warning(f"Could not send startup message to owner: {e}")
+        
+        # Only the connection is retried; services started after it fail on their own
+        await self.start_services()
+        
+        # Keep the bot running
+        await asyncio.Event().wait()
     
     async def stop(self):
         """Stop the bot"""
         logger.info("Stopping bot...")
-        if self.client:
+        for task in self.background_tasks:
+            task.cancel()
+        if LOOP_MONITOR_ENABLED:
+            await loop_monitor.stop()
+        if self.stream_server:
+            await self.stream_server.stop()
+        if self.metrics_server:
+            await self.metrics_server.stop()
+        if self.broadcast_manager:
+            await self.broadcast_manager.shutdown()
+        if self.delivery_engine:
+            await self.delivery_engine.shutdown()
+        if self.search_engine:
+            # Write buffered download counts before the database closes
+            await self.search_engine.close()
+        if self.clone_runtime:
+            await self.clone_runtime.shutdown()
+        if self.traffic_recorder:
+            self.traffic_recorder.close()
+        if self.client_pool:
+            await self.client_pool.stop()
+        if self.client and self.client.is_connected:
             await self.client.stop()
         if self.motor_client:
+            if DB_MONITOR_ENABLED:
+                await query_monitor.stop()
             self.motor_client.close()
         logger.info("✅ Bot stopped")
 
@@ -80,6 +80,19 @@ CLONE_ENABLED: bool = os.getenv("CLONE_ENABLED", "True").lower() == "true"
 AUTO_APPROVE_ENABLED: bool = os.getenv("AUTO_APPROVE_ENABLED", "False").lower() == "true"
 """Enable auto-approval of requests"""
 
+# ============================================================================
+# SEARCH RANKING CONFIGURATION
+# ============================================================================
+
+SEARCH_POPULARITY_HALF_LIFE_DAYS: float = float(os.getenv("SEARCH_POPULARITY_HALF_LIFE_DAYS", "30"))
+"""Days after which a download counts half as much towards a file's search rank"""
+
+SEARCH_RECENCY_HALF_LIFE_DAYS: float = float(os.getenv("SEARCH_RECENCY_HALF_LIFE_DAYS", "180"))
+"""Days after which the boost for a newly indexed file has halved"""
+
+MAIN_BOT_SEES_ALL_CHANNELS: bool = os.getenv("MAIN_BOT_SEES_ALL_CHANNELS", "False").lower() == "true"
+"""Let the main bot search files from every channel, including those only clones indexed"""
+
 # ============================================================================
 # PAYMENT CONFIGURATION
 # ============================================================================
@@ -96,6 +109,47 @@ USDT_SOL_ADDRESS: str = os.getenv("USDT_SOL_ADDRESS", "AWDJkMbS4rBCTrzP2AkwfsEBK
 PAYMENT_TIMEOUT_MINUTES: int = int(os.getenv("PAYMENT_TIMEOUT_MINUTES", "30"))
 """Time to wait for payment confirmation (minutes)"""
 
+# ============================================================================
+# BROADCAST CONFIGURATION
+# ============================================================================
+
+BROADCAST_CONCURRENCY: int = int(os.getenv("BROADCAST_CONCURRENCY", "10"))
+"""Number of concurrent senders per broadcast job"""
+
+BROADCAST_RATE_LIMIT: float = float(os.getenv("BROADCAST_RATE_LIMIT", "25"))
+"""Global broadcast send budget (messages per second, Telegram allows ~30)"""
+
+BROADCAST_BATCH_SIZE: int = int(os.getenv("BROADCAST_BATCH_SIZE", "500"))
+"""Recipients processed between job checkpoints"""
+
+BROADCAST_PROGRESS_INTERVAL: int = int(os.getenv("BROADCAST_PROGRESS_INTERVAL", "15"))
+"""Minimum seconds between broadcast progress message edits"""
+
+GROUP_BROADCAST_RATE_LIMIT: float = float(os.getenv("GROUP_BROADCAST_RATE_LIMIT", "10"))
+"""Group broadcast send budget (messages per second), within the global budget"""
+
+GROUP_MIN_INTERVAL: float = float(os.getenv("GROUP_MIN_INTERVAL", "3"))
+"""Minimum seconds between broadcast messages to the same group (~20/min limit)"""
+
+AUDIENCE_REPORT_HOURS: float = float(os.getenv("AUDIENCE_REPORT_HOURS", "24"))
+"""Hours between audience reachability reports to the log channel (0 disables)"""
+
+# ============================================================================
+# FILE DELIVERY CONFIGURATION
+# ============================================================================
+
+DELIVERY_WORKERS: int = int(os.getenv("DELIVERY_WORKERS", "8"))
+"""Number of file sends in flight across all users"""
+
+DELIVERY_PREMIUM_WEIGHT: int = int(os.getenv("DELIVERY_PREMIUM_WEIGHT", "3"))
+"""Premium sends scheduled for every free send when both are waiting"""
+
+DELIVERY_MAX_PENDING: int = int(os.getenv("DELIVERY_MAX_PENDING", "3"))
+"""Queued requests allowed per user, as a multiple of their concurrent_downloads"""
+
+DOWNLOAD_FLUSH_INTERVAL: float = float(os.getenv("DOWNLOAD_FLUSH_INTERVAL", "5"))
+"""Seconds between bulk writes of buffered download counts"""
+
 # ============================================================================
 # OPTIONAL CUSTOMIZATION
 # ============================================================================
@@ -109,6 +163,114 @@ SHORTLINK_API_URL: Optional[str] = os.getenv("SHORTLINK_API_URL")
 STREAM_SERVER_URL: Optional[str] = os.getenv("STREAM_SERVER_URL")
 """Custom streaming server URL"""
 
+# ============================================================================
+# STREAMING SERVER CONFIGURATION
+# ============================================================================
+
+STREAM_BIND_ADDRESS: str = os.getenv("STREAM_BIND_ADDRESS", "0.0.0.0")
+"""Address the built-in streaming server listens on"""
+
+STREAM_PORT: int = int(os.getenv("STREAM_PORT", os.getenv("PORT", "8080")))
+"""Port the built-in streaming server listens on"""
+
+STREAM_BIN_CHANNEL: int = int(os.getenv("STREAM_BIN_CHANNEL", str(LOG_CHANNEL)))
+"""Channel that non-indexed files are copied to so they can be streamed"""
+
+STREAM_CACHE_DIR: str = os.getenv("STREAM_CACHE_DIR", "cache/chunks")
+"""Directory where streamed file chunks are cached on disk"""
+
+STREAM_CACHE_MAX_MB: int = int(os.getenv("STREAM_CACHE_MAX_MB", "2048"))
+"""Disk budget for the chunk cache in MB (0 disables caching)"""
+
+LINK_SECRET: str = os.getenv("LINK_SECRET", "")
+"""Key for signing stream/download links (derived from BOT_TOKEN if empty)"""
+
+LINK_TTL_HOURS: int = int(os.getenv("LINK_TTL_HOURS", "6"))
+"""How long stream/download links stay valid for free users"""
+
+PREMIUM_LINK_TTL_HOURS: int = int(os.getenv("PREMIUM_LINK_TTL_HOURS", "72"))
+"""How long stream/download links stay valid for premium users"""
+
+# ============================================================================
+# WORKER CLIENT CONFIGURATION
+# ============================================================================
+
+WORKER_BOT_TOKENS: List[str] = os.getenv("WORKER_BOT_TOKENS", "").split()
+"""Extra bot tokens whose sessions carry streaming and delivery load"""
+
+# ============================================================================
+# CLONE RUNTIME CONFIGURATION
+# ============================================================================
+
+CLONE_SESSION_DIR: str = os.getenv("CLONE_SESSION_DIR", "sessions/clones")
+"""Directory for clone session files, so restarts skip re-authorization"""
+
+CLONE_MAX_ACTIVE: int = int(os.getenv("CLONE_MAX_ACTIVE", "200"))
+"""Maximum clones connected at once; the least recently used are evicted"""
+
+CLONE_IDLE_MINUTES: int = int(os.getenv("CLONE_IDLE_MINUTES", "30"))
+"""Disconnect clones that received no updates for this long"""
+
+CLONE_WAKE_INTERVAL: int = int(os.getenv("CLONE_WAKE_INTERVAL", "20"))
+"""Seconds between checks for sleeping clones with pending updates"""
+
+CLONE_CLIENT_WORKERS: int = int(os.getenv("CLONE_CLIENT_WORKERS", "2"))
+"""Update workers per clone client"""
+
+CLONE_SHARDS: int = int(os.getenv("CLONE_SHARDS", "0"))
+"""Worker processes to spread clones over (0 runs them in the main process)"""
+
+# ============================================================================
+# METRICS CONFIGURATION
+# ============================================================================
+
+METRICS_ENABLED: bool = os.getenv("METRICS_ENABLED", "True").lower() == "true"
+"""Serve handler, database and Telegram API metrics for Prometheus"""
+
+METRICS_BIND_ADDRESS: str = os.getenv("METRICS_BIND_ADDRESS", "127.0.0.1")
+"""Address the metrics endpoint listens on (keep it private)"""
+
+METRICS_PORT: int = int(os.getenv("METRICS_PORT", "9100"))
+"""Port of the /metrics endpoint; clone shard N uses METRICS_PORT + 1 + N"""
+
+LOOP_MONITOR_ENABLED: bool = os.getenv("LOOP_MONITOR_ENABLED", "True").lower() == "true"
+"""Measure event loop lag and log the stack of code that blocks it"""
+
+LOOP_LAG_THRESHOLD_MS: float = float(os.getenv("LOOP_LAG_THRESHOLD_MS", "250"))
+"""Loop stalls longer than this (milliseconds) are logged with the blocking stack"""
+
+# ============================================================================
+# DATABASE MONITORING CONFIGURATION
+# ============================================================================
+
+DB_MONITOR_ENABLED: bool = os.getenv("DB_MONITOR_ENABLED", "True").lower() == "true"
+"""Track MongoDB latency and documents examined per query shape (/dbstats)"""
+
+DB_SLOW_MS: float = float(os.getenv("DB_SLOW_MS", "100"))
+"""Commands slower than this (milliseconds) are kept as slow-query samples"""
+
+DB_EXPLAIN_INTERVAL: int = int(os.getenv("DB_EXPLAIN_INTERVAL", "600"))
+"""Minimum seconds between explain() runs for the same slow query shape"""
+
+DB_EXPLAIN_AUDIT: bool = os.getenv("DB_EXPLAIN_AUDIT", "False").lower() == "true"
+"""Explain every known query shape at startup and log collection scans"""
+
+# ============================================================================
+# TRAFFIC RECORDING CONFIGURATION
+# ============================================================================
+
+TRAFFIC_RECORD_ENABLED: bool = os.getenv("TRAFFIC_RECORD_ENABLED", "False").lower() == "true"
+"""Record anonymized update metadata for replay with bench.replay"""
+
+TRAFFIC_RECORD_DIR: str = os.getenv("TRAFFIC_RECORD_DIR", "recordings")
+"""Directory the traffic recordings are written to"""
+
+TRAFFIC_RECORD_MAX_MB: float = float(os.getenv("TRAFFIC_RECORD_MAX_MB", "50"))
+"""Size at which the recording file is rotated"""
+
+TRAFFIC_RECORD_FILES: int = int(os.getenv("TRAFFIC_RECORD_FILES", "5"))
+"""Recording files kept, including the one being written"""
+
 # ============================================================================
 # VALIDATION
 # ============================================================================
@@ -133,6 +295,8 @@ def validate_config() -> bool:
         errors.append("CHANNELS is required and must contain at least one channel ID")
     if not ADMINS:
         errors.append("ADMINS is required and must contain at least one admin ID")
+    if CLONE_MAX_ACTIVE < 1:
+        errors.append("CLONE_MAX_ACTIVE must be at least 1")
     
     if errors:
         print("Configuration Validation Errors:")
@@ -7,6 +7,7 @@ from .models import (
     Premium,
     FSub,
     Log,
+    Chat,
 )
 
 __all__ = [
@@ -16,4 +17,5 @@ __all__ = [
     "Premium",
     "FSub",
     "Log",
+    "Chat",
 ]
@@ -20,6 +20,8 @@ class User(BaseModel):
     referrer_id: Optional[int] = None
     referral_count: int = 0
     is_banned: bool = False
+    is_reachable: bool = True
+    unreachable_reason: Optional[str] = None  # blocked, deactivated, invalid_peer
     joined_at: datetime = Field(default_factory=datetime.utcnow)
     last_seen: datetime = Field(default_factory=datetime.utcnow)
     
@@ -35,6 +37,8 @@ class User(BaseModel):
                 "referrer_id": None,
                 "referral_count": 0,
                 "is_banned": False,
+                "is_reachable": True,
+                "unreachable_reason": None,
                 "joined_at": "2024-01-01T00:00:00",
                 "last_seen": "2024-01-01T12:00:00",
             }
@@ -57,6 +61,18 @@ class File(BaseModel):
     duration: Optional[int] = None  # For videos/audio
     indexed_at: datetime = Field(default_factory=datetime.utcnow)
     download_count: int = 0
+    popularity: Optional[float] = None  # Downloads decayed to popularity_at (utils.counters)
+    popularity_at: Optional[datetime] = None
+    # Search fields, computed from the names by utils.release_names at index time
+    tokens: List[str] = []
+    title: Optional[str] = None
+    year: Optional[int] = None
+    season: Optional[int] = None
+    episode: Optional[int] = None
+    resolution: Optional[str] = None  # 1080p, 2160p, ...
+    codec: Optional[str] = None  # x264, x265, ...
+    source: Optional[str] = None  # webdl, bluray, ...
+    languages: List[str] = []
     
     class Config:
         json_schema_extra = {
@@ -74,6 +90,15 @@ class File(BaseModel):
                 "duration": 7200,
                 "indexed_at": "2024-01-01T00:00:00",
                 "download_count": 0,
+                "tokens": ["movie", "superman", "2013", "high", "quality"],
+                "title": "superman",
+                "year": 2013,
+                "season": None,
+                "episode": None,
+                "resolution": None,
+                "codec": None,
+                "source": None,
+                "languages": [],
             }
         }
 
@@ -164,3 +189,32 @@ class Log(BaseModel):
                 "timestamp": "2024-01-01T12:00:00",
             }
         }
+
+
+class Chat(BaseModel):
+    """Chat model for groups and channels the bot is a member of"""
+    
+    chat_id: int = Field(..., description="Group/channel ID")
+    title: Optional[str] = None
+    username: Optional[str] = None
+    type: str  # group, supergroup, channel
+    status: str  # member, administrator, left, kicked, write_forbidden, etc.
+    is_active: bool = True
+    added_by: Optional[int] = None
+    joined_at: datetime = Field(default_factory=datetime.utcnow)
+    updated_at: datetime = Field(default_factory=datetime.utcnow)
+    
+    class Config:
+        json_schema_extra = {
+            "example": {
+                "chat_id": -1001234567890,
+                "title": "Movie Requests",
+                "username": "movie_requests",
+                "type": "supergroup",
+                "status": "administrator",
+                "is_active": True,
+                "added_by": 123456789,
+                "joined_at": "2024-01-01T00:00:00",
+                "updated_at": "2024-01-01T00:00:00",
+            }
+        }
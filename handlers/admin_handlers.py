@@ -7,7 +7,15 @@ from pyrogram import Client, filters
 from pyrogram.types import Message
 from config import ADMINS, OWNER_ID
 from utils.helpers import log_activity, format_user_info
+from utils.broadcast import BroadcastManager
+from utils.profiler import MAX_PROFILE_SECONDS, profiler
+from utils.query_monitor import query_monitor
+from utils.reachability import get_audience_report, format_audience_report, mark_reachable
+from utils.tenants import main_bot_only
+from web.tokens import link_deny_list
 from motor.motor_asyncio import AsyncIOMotorDatabase
+from datetime import datetime, timezone
+import io
 import logging
 
 logger = logging.getLogger(__name__)
@@ -62,9 +70,12 @@ async def handle_ban_command(client: Client, message: Message, db: AsyncIOMotorD
     try:
         user_id = int(args[1])
         
+        # Stream links are verified without the database, so revoke them explicitly;
+        # the stored time brings the revocation back after a restart
+        revoked_until = link_deny_list.revoke_user(user_id)
         result = await db.users.update_one(
             {"user_id": user_id},
-            {"$set": {"is_banned": True}}
+            {"$set": {"is_banned": True, "links_revoked_until": datetime.utcfromtimestamp(revoked_until)}}
         )
         
         if result.modified_count > 0:
@@ -80,6 +91,19 @@ async def handle_ban_command(client: Client, message: Message, db: AsyncIOMotorD
         await message.reply_text(f"❌ Error: {str(e)}")
 
 
+async def restore_link_revocations(db: AsyncIOMotorDatabase) -> int:
+    """Reload the link revocations of banned users into the in-memory deny list"""
+    restored = 0
+    async for user in db.users.find(
+        {"links_revoked_until": {"$gt": datetime.utcnow()}},
+        {"user_id": 1, "links_revoked_until": 1}
+    ):
+        until = user["links_revoked_until"].replace(tzinfo=timezone.utc).timestamp()
+        link_deny_list.revoke_user(user["user_id"], until)
+        restored += 1
+    return restored
+
+
 async def handle_unban_command(client: Client, message: Message, db: AsyncIOMotorDatabase):
     """Handle /unban command - Unban a user"""
     if message.from_user.id not in ADMINS:
@@ -96,9 +120,11 @@ async def handle_unban_command(client: Client, message: Message, db: AsyncIOMoto
         
         result = await db.users.update_one(
             {"user_id": user_id},
-            {"$set": {"is_banned": False}}
+            {"$set": {"is_banned": False}, "$unset": {"links_revoked_until": ""}}
         )
         
+        link_deny_list.restore_user(user_id)
+        
         if result.modified_count > 0:
             await message.reply_text(f"✅ User {user_id} has been unbanned")
             await log_activity(db, message.from_user.id, "unban_user", f"Unbanned user {user_id}")
@@ -112,8 +138,14 @@ async def handle_unban_command(client: Client, message: Message, db: AsyncIOMoto
         await message.reply_text(f"❌ Error: {str(e)}")
 
 
-async def handle_broadcast_command(client: Client, message: Message, db: AsyncIOMotorDatabase):
-    """Handle /broadcast command - Send message to all users"""
+async def handle_broadcast_command(
+    client: Client,
+    message: Message,
+    db: AsyncIOMotorDatabase,
+    broadcast_manager: BroadcastManager,
+    target: str = "users"
+):
+    """Handle /broadcast and /grp_broadcast commands - Send message to all users or groups"""
     if message.from_user.id not in ADMINS:
         await message.reply_text("❌ This command is only for admins!")
         return
@@ -127,31 +159,74 @@ async def handle_broadcast_command(client: Client, message: Message, db: AsyncIO
     status_msg = await message.reply_text("📢 Starting broadcast...")
     
     try:
-        users = await db.users.find({"is_banned": False}).to_list(length=None)
-        
-        success_count = 0
-        failed_count = 0
-        
-        for user in users:
-            try:
-                await broadcast_msg.copy(user["user_id"])
-                success_count += 1
-            except:
-                failed_count += 1
+        job = await broadcast_manager.create_job(
+            source_chat_id=broadcast_msg.chat.id,
+            source_message_id=getattr(broadcast_msg, "message_id", None) or broadcast_msg.id,
+            status_chat_id=status_msg.chat.id,
+            status_message_id=getattr(status_msg, "message_id", None) or status_msg.id,
+            created_by=message.from_user.id,
+            target=target,
+        )
+        broadcast_manager.start_job(client, job)
         
         await status_msg.edit_text(
-            f"✅ **Broadcast Complete**\n\n"
-            f"✅ Sent: {success_count}\n"
-            f"❌ Failed: {failed_count}"
+            f"📢 **Broadcast Started**\n\n"
+            f"🆔 Job: `{job['job_id']}`\n"
+            f"🎯 Target: {target}\n"
+            f"👥 Recipients: {job['total']}\n\n"
+            f"Use /broadcast_cancel {job['job_id']} to stop it"
         )
         
-        await log_activity(db, message.from_user.id, "broadcast", f"Sent to {success_count} users")
+        await log_activity(db, message.from_user.id, "broadcast", f"Started job {job['job_id']} for {job['total']} {target}")
         
     except Exception as e:
         logger.error(f"Error in broadcast command: {e}")
         await status_msg.edit_text(f"❌ Error: {str(e)}")
 
 
+async def handle_broadcast_cancel_command(
+    client: Client,
+    message: Message,
+    db: AsyncIOMotorDatabase,
+    broadcast_manager: BroadcastManager
+):
+    """Handle /broadcast_cancel command - Stop a running broadcast"""
+    if message.from_user.id not in ADMINS:
+        await message.reply_text("❌ This command is only for admins!")
+        return
+    
+    args = message.text.split()
+    if len(args) < 2:
+        await message.reply_text("Usage: /broadcast_cancel <job_id>")
+        return
+    
+    try:
+        if await broadcast_manager.cancel_job(args[1]):
+            await message.reply_text(f"✅ Broadcast {args[1]} cancelled")
+            await log_activity(db, message.from_user.id, "broadcast_cancel", f"Cancelled job {args[1]}")
+        else:
+            await message.reply_text(f"❌ No running broadcast with ID {args[1]}")
+    
+    except Exception as e:
+        logger.error(f"Error in broadcast cancel command: {e}")
+        await message.reply_text(f"❌ Error: {str(e)}")
+
+
+async def handle_audience_command(client: Client, message: Message, db: AsyncIOMotorDatabase):
+    """Handle /audience command - Show how many users are reachable"""
+    if message.from_user.id not in ADMINS:
+        await message.reply_text("❌ This command is only for admins!")
+        return
+    
+    try:
+        report = await get_audience_report(db)
+        await message.reply_text(format_audience_report(report))
+    
+    except Exception as e:
+        logger.error(f"Error in audience command: {e}")
+        await message.reply_text(f"❌ Error: {str(e)}")
+
+
 async def handle_fsub_command(client: Client, message: Message, db: AsyncIOMotorDatabase):
     """Handle /fsub command - Add Force Subscribe channel"""
     if message.from_user.id not in ADMINS:
@@ -230,31 +305,187 @@ async def handle_nofsub_command(client: Client, message: Message, db: AsyncIOMot
         await message.reply_text(f"❌ Error: {str(e)}")
 
 
+async def handle_revoke_link_command(client: Client, message: Message, db: AsyncIOMotorDatabase):
+    """Handle /revoke_link command - Invalidate a stream/download link"""
+    if message.from_user.id not in ADMINS:
+        await message.reply_text("❌ This command is only for admins!")
+        return
+    
+    args = message.text.split()
+    if len(args) < 2:
+        await message.reply_text("Usage: /revoke_link <stream or download link>")
+        return
+    
+    token = args[1].rstrip("/").rsplit("/", 1)[-1]
+    if not link_deny_list.revoke(token):
+        await message.reply_text("❌ Invalid link")
+        return
+    
+    await message.reply_text("✅ Link revoked")
+    await log_activity(db, message.from_user.id, "revoke_link", f"Revoked link {token}")
+
+
+async def handle_profile_command(client: Client, message: Message, db: AsyncIOMotorDatabase):
+    """Handle /profile command - Sample the live bot and report hot functions"""
+    if message.from_user.id not in ADMINS:
+        await message.reply_text("❌ This command is only for admins!")
+        return
+    
+    args = message.text.split()
+    try:
+        seconds = float(args[1]) if len(args) > 1 else 30
+    except ValueError:
+        await message.reply_text(f"Usage: /profile <seconds> (up to {MAX_PROFILE_SECONDS})")
+        return
+    
+    if profiler.running:
+        await message.reply_text("⏳ A profile is already running.")
+        return
+    
+    status = await message.reply_text(f"🔬 Profiling for {min(seconds, MAX_PROFILE_SECONDS):g}s...")
+    try:
+        result = await profiler.profile(seconds)
+        
+        busy = result.samples - result.idle_samples
+        lines = [
+            "🔬 **Profile Complete**\n",
+            f"⏱ Duration: {result.duration:.1f}s",
+            f"📊 Samples: {result.samples} ({busy} busy, {result.idle_samples} idle)\n",
+            "**Hot functions** (self / total % of busy samples):",
+        ]
+        for frame, own, total in result.top_functions(15):
+            lines.append(f"`{own * 100 / busy:5.1f}% {total * 100 / busy:5.1f}%` {frame}")
+        if not busy:
+            lines.append("The event loop was idle the whole time.")
+        await status.edit_text("\n".join(lines)[:4096])
+        
+        if result.stacks:
+            report = io.BytesIO(result.collapsed().encode())
+            await message.reply_document(
+                report,
+                file_name="profile.collapsed.txt",
+                caption="Collapsed stacks - open in speedscope.app or flamegraph.pl",
+            )
+        
+        await log_activity(db, message.from_user.id, "profile", f"Profiled {result.duration:.0f}s")
+    
+    except Exception as e:
+        logger.error(f"Error in profile command: {e}")
+        await status.edit_text(f"❌ Error: {str(e)}")
+
+
+async def handle_dbstats_command(client: Client, message: Message, db: AsyncIOMotorDatabase):
+    """Handle /dbstats command - Show the slowest MongoDB query shapes"""
+    if message.from_user.id not in ADMINS:
+        await message.reply_text("❌ This command is only for admins!")
+        return
+    
+    shapes = query_monitor.top_shapes(8)
+    if not shapes:
+        await message.reply_text("📭 No database queries recorded yet.")
+        return
+    
+    lines = ["🗄 **Database Query Shapes** (by total time)\n"]
+    for stats in shapes:
+        lines.append(f"`{stats.shape[:90]}`")
+        detail = (
+            f"  {stats.count}× · avg {stats.avg_ms:.1f}ms · p95 {stats.percentile(0.95):.1f}ms"
+            f" · max {stats.max_ms:.0f}ms · {stats.returned / stats.count:.1f} docs/query"
+        )
+        plan = stats.plan or {}
+        if plan.get("docs_examined") is not None:
+            detail += f"\n  explain: {plan['docs_examined']} examined → {plan['returned']} returned"
+        if plan.get("collscan"):
+            detail += " ⚠️ COLLSCAN"
+        if stats.errors:
+            detail += f" · {stats.errors} errors"
+        lines.append(detail)
+    
+    if query_monitor.slow_samples:
+        lines.append(f"\n🐢 **Recent slow queries** (≥{query_monitor.slow_ms:g}ms)")
+        for sample in list(query_monitor.slow_samples)[-5:]:
+            lines.append(f"  {sample['duration_ms']:.0f}ms `{sample['shape'][:70]}`")
+    
+    flagged = [result for result in query_monitor.audit_results if result["collscan"]]
+    if flagged:
+        lines.append(f"\n🔎 **Startup audit:** {len(flagged)} collection scan(s)")
+        for result in flagged[:5]:
+            lines.append(f"  `{result['shape'][:80]}`")
+    
+    await message.reply_text("\n".join(lines)[:4096])
+
+
 def setup_admin_handlers(client: Client, db: AsyncIOMotorDatabase):
     """Setup admin command handlers"""
     
+    broadcast_manager = BroadcastManager(db)
+    
     @client.on_message(filters.command("users"))
+    @main_bot_only
     async def users_cmd(client: Client, message: Message):
         await handle_users_command(client, message, db)
     
     @client.on_message(filters.command("ban"))
+    @main_bot_only
     async def ban_cmd(client: Client, message: Message):
         await handle_ban_command(client, message, db)
     
     @client.on_message(filters.command("unban"))
+    @main_bot_only
     async def unban_cmd(client: Client, message: Message):
         await handle_unban_command(client, message, db)
     
+    @client.on_message(filters.command("revoke_link"))
+    @main_bot_only
+    async def revoke_link_cmd(client: Client, message: Message):
+        await handle_revoke_link_command(client, message, db)
+    
     @client.on_message(filters.command("broadcast"))
+    @main_bot_only
     async def broadcast_cmd(client: Client, message: Message):
-        await handle_broadcast_command(client, message, db)
+        await handle_broadcast_command(client, message, db, broadcast_manager)
+    
+    @client.on_message(filters.command("grp_broadcast"))
+    @main_bot_only
+    async def grp_broadcast_cmd(client: Client, message: Message):
+        await handle_broadcast_command(client, message, db, broadcast_manager, target="groups")
+    
+    @client.on_message(filters.command("broadcast_cancel"))
+    @main_bot_only
+    async def broadcast_cancel_cmd(client: Client, message: Message):
+        await handle_broadcast_cancel_command(client, message, db, broadcast_manager)
+    
+    @client.on_message(filters.command("audience"))
+    @main_bot_only
+    async def audience_cmd(client: Client, message: Message):
+        await handle_audience_command(client, message, db)
+    
+    @client.on_message(filters.command("profile"))
+    @main_bot_only
+    async def profile_cmd(client: Client, message: Message):
+        await handle_profile_command(client, message, db)
+    
+    @client.on_message(filters.command("dbstats"))
+    @main_bot_only
+    async def dbstats_cmd(client: Client, message: Message):
+        await handle_dbstats_command(client, message, db)
+    
+    @client.on_message(filters.command("start") & filters.private, group=-1)
+    @main_bot_only
+    async def reachable_again(client: Client, message: Message):
+        # Unblocking the bot sends /start, so the user can receive messages again
+        await mark_reachable(db, message.from_user.id)
     
     @client.on_message(filters.command("fsub"))
+    @main_bot_only
     async def fsub_cmd(client: Client, message: Message):
         await handle_fsub_command(client, message, db)
     
     @client.on_message(filters.command("nofsub"))
+    @main_bot_only
     async def nofsub_cmd(client: Client, message: Message):
         await handle_nofsub_command(client, message, db)
     
     logger.info("✅ Admin handlers setup complete")
+    
+    return broadcast_manager
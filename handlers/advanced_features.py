@@ -4,10 +4,16 @@ Includes: filters, IMDB, telegraph, font styling, link generation, batch operati
 """
 
 from pyrogram import Client, filters
-from pyrogram.types import Message, InlineKeyboardMarkup, InlineKeyboardButton
+from pyrogram.types import CallbackQuery, Message, InlineKeyboardMarkup, InlineKeyboardButton
 from motor.motor_asyncio import AsyncIOMotorDatabase
+from utils.callback_router import callback_router
 from utils.emoji_messages import EmojiMessages, EMOJIS
 from utils.helpers import log_activity
+from utils.premium_benefits import PremiumBenefits
+from config import STREAM_ENABLED
+from web import build_stream_link
+from web.tokens import link_ttl
+from handlers.search_handlers import SUGGESTION_PREFIX
 import logging
 import re
 
@@ -159,10 +165,11 @@ async def handle_imdb_command(client: Client, message: Message, db: AsyncIOMotor
 {EMOJIS['info']} Full details available on IMDB
 """
         
-        buttons = [
-            [InlineKeyboardButton("🔗 View on IMDB", url="https://imdb.com")],
-            [InlineKeyboardButton("⬇️ Download", callback_data="download_imdb")],
-        ]
+        buttons = [[InlineKeyboardButton("🔗 View on IMDB", url="https://imdb.com")]]
+        # Download searches the indexed files for the title
+        search_data = f"{SUGGESTION_PREFIX}{movie_name}"
+        if len(search_data.encode()) <= 64:
+            buttons.append([InlineKeyboardButton("⬇️ Download", callback_data=search_data)])
         
         await message.reply_text(
             imdb_info,
@@ -267,13 +274,27 @@ async def handle_link_command(client: Client, message: Message, db: AsyncIOMotor
         
         # Generate unique link
         link = f"https://t.me/phoenix_filter_bot?start=file_{file_id}"
-        
-        await message.reply_text(
+        link_text = (
             f"{EMOJIS['link']} **Shareable Link Generated**\n\n"
             f"`{link}`\n\n"
             f"{EMOJIS['success']} Share this link with others!"
         )
         
+        # Indexed files also get personal stream/download links
+        indexed = await db.files.find_one({"file_id": file_id}, {"channel_id": 1, "message_id": 1})
+        if STREAM_ENABLED and indexed and indexed.get("channel_id") and indexed.get("message_id"):
+            user_id = message.from_user.id
+            is_premium = await PremiumBenefits.is_premium(db, user_id)
+            stream_link = build_stream_link("stream", indexed["channel_id"], indexed["message_id"], user_id, is_premium)
+            download_link = build_stream_link("download", indexed["channel_id"], indexed["message_id"], user_id, is_premium)
+            link_text += (
+                f"\n\n🎥 Stream: `{stream_link}`\n"
+                f"📥 Download: `{download_link}`\n"
+                f"⏳ Valid for {link_ttl(is_premium) // 3600} hours"
+            )
+        
+        await message.reply_text(link_text)
+        
         await log_activity(db, message.from_user.id, "link_generated", f"Generated link for {file_id}")
         
     except Exception as e:
@@ -321,6 +342,14 @@ Example: /batch download file1, file2, file3
         await message.reply_text(EmojiMessages.error_message(str(e)))
 
 
+async def handle_imdb_download_callback(client: Client, callback_query: CallbackQuery):
+    """Handle Download buttons on /imdb replies sent before they searched for the title"""
+    await callback_query.answer(
+        f"{EMOJIS['info']} Send the movie name to search for its files.",
+        show_alert=True
+    )
+
+
 def setup_advanced_handlers(client: Client, db: AsyncIOMotorDatabase):
     """Setup advanced feature handlers"""
     
@@ -340,6 +369,9 @@ def setup_advanced_handlers(client: Client, db: AsyncIOMotorDatabase):
     async def imdb_cmd(client: Client, message: Message):
         await handle_imdb_command(client, message, db)
     
+    # Exact routes win over the download_ prefix
+    callback_router.register("download_imdb", handle_imdb_download_callback, exact=True)
+    
     @client.on_message(filters.command("telegraph"))
     async def telegraph_cmd(client: Client, message: Message):
         await handle_telegraph_command(client, message, db)
@@ -7,6 +7,7 @@ from pyrogram import Client, filters
 from pyrogram.types import Message, InlineKeyboardMarkup, InlineKeyboardButton
 from utils.premium_benefits import PremiumBenefits
 from utils.helpers import log_activity
+from utils.callback_router import callback_router
 from motor.motor_asyncio import AsyncIOMotorDatabase
 import logging
 
@@ -110,4 +111,12 @@ def setup_benefits_handlers(client: Client, db: AsyncIOMotorDatabase):
     async def benefits_cmd(client: Client, message: Message):
         await handle_benefits_command(client, message, db)
     
+    @callback_router.route("show_comparison", exact=True)
+    async def comparison_cb(client: Client, callback_query):
+        await handle_comparison_callback(client, callback_query, db)
+    
+    @callback_router.route("upgrade_premium", exact=True)
+    async def upgrade_cb(client: Client, callback_query):
+        await handle_upgrade_callback(client, callback_query, db)
+    
     logger.info("✅ Benefits handlers setup complete")
@@ -5,6 +5,12 @@ Handles button callbacks and inline interactions
 
 from pyrogram import Client
 from pyrogram.types import CallbackQuery
+from motor.motor_asyncio import AsyncIOMotorDatabase
+from utils.callback_router import callback_router
+from utils.client_pool import ClientPool
+from utils.delivery import DeliveryEngine, DeliveryQueueFull
+from utils.search import SearchEngine
+from utils.tenants import get_tenant
 import logging
 
 logger = logging.getLogger(__name__)
@@ -16,24 +22,69 @@ async def handle_join_fsub(client: Client, callback_query: CallbackQuery):
     # Will be implemented with actual FSub logic
 
 
-async def handle_download_file(client: Client, callback_query: CallbackQuery):
+async def handle_download_file(
+    client: Client,
+    callback_query: CallbackQuery,
+    delivery_engine: DeliveryEngine
+):
     """Handle file download button callback"""
-    await callback_query.answer("Preparing download...", show_alert=False)
-    # Will be implemented with actual download logic
+    user_id = callback_query.from_user.id
+    doc_id = callback_query.data.replace("download_", "", 1)
+    
+    if not get_tenant(client).has_feature("download"):
+        await callback_query.answer("❌ Downloads are disabled on this bot.", show_alert=True)
+        return
+    
+    file_doc, is_premium, reason = await delivery_engine.check_request(user_id, doc_id, get_tenant(client))
+    if not file_doc:
+        await callback_query.answer(reason, show_alert=True)
+        return
+    
+    if delivery_engine.scheduler.would_wait(user_id, is_premium):
+        answer_text = "⏳ You're in the queue, your file will arrive shortly"
+    else:
+        answer_text = "📤 Sending file..."
+    
+    try:
+        delivery_engine.deliver(client, user_id, file_doc, is_premium)
+    except DeliveryQueueFull:
+        await callback_query.answer(
+            "⏳ You already have several files on the way. Please wait for them to arrive.",
+            show_alert=True
+        )
+        return
+    
+    # The send runs in the background; this handler returns right away
+    await callback_query.answer(answer_text)
+
 
+async def handle_close(client: Client, callback_query: CallbackQuery):
+    """Handle close button callback"""
+    await callback_query.message.delete()
+    await callback_query.answer()
 
-def setup_callback_handlers(client: Client):
-    """Setup all callback handlers"""
+
+def setup_callback_handlers(client: Client, db: AsyncIOMotorDatabase, search_engine: SearchEngine,
+                            client_pool: ClientPool):
+    """
+    Setup all callback handlers
+    Installs the single callback query handler; other modules register
+    their routes on callback_router
+    """
     
     @client.on_callback_query()
     async def handle_callbacks(client: Client, callback_query: CallbackQuery):
-        data = callback_query.data
-        
-        if data.startswith("join_fsub_"):
-            await handle_join_fsub(client, callback_query)
-        elif data.startswith("download_"):
-            await handle_download_file(client, callback_query)
-        else:
-            await callback_query.answer("Unknown action", show_alert=True)
+        await callback_router.dispatch(client, callback_query)
+    
+    callback_router.register("join_fsub_", handle_join_fsub)
+    delivery_engine = DeliveryEngine(db, search_engine, client_pool)
+    
+    @callback_router.route("download_")
+    async def download_cb(client: Client, callback_query: CallbackQuery):
+        await handle_download_file(client, callback_query, delivery_engine)
+    
+    callback_router.register("close", handle_close, exact=True)
     
     logger.info("✅ Callback handlers setup complete")
+    
+    return delivery_engine
@@ -0,0 +1,151 @@
+"""
+Chat registry handlers for Phoenix Filter Bot
+Tracks the groups the bot is added to and lists connected chats
+"""
+
+from pyrogram import Client, filters, raw
+from pyrogram.types import Message, ChatMemberUpdated
+from config import ADMINS
+from utils.chats import ChatsRegistry, enum_value
+from utils.reachability import mark_unreachable, mark_reachable
+from utils.helpers import log_activity
+from utils.tenants import main_bot_only
+from motor.motor_asyncio import AsyncIOMotorDatabase
+import logging
+
+logger = logging.getLogger(__name__)
+
+BOT_STOPPED_GROUP = -2
+
+
+async def handle_my_chat_member(
+    client: Client,
+    update: ChatMemberUpdated,
+    db: AsyncIOMotorDatabase,
+    chats_registry: ChatsRegistry
+):
+    """Handle changes to the bot's own membership in a chat"""
+    member = update.new_chat_member or update.old_chat_member
+    if not member or not member.user or not member.user.is_self:
+        return
+    
+    # Blocks in private chats arrive as UpdateBotStopped (see handle_bot_stopped)
+    if enum_value(update.chat.type) in ("private", "bot"):
+        return
+    
+    status = enum_value(update.new_chat_member.status) if update.new_chat_member else "left"
+    added_by = update.from_user.id if update.from_user else None
+    await chats_registry.update_membership(update.chat, status, added_by)
+
+
+async def handle_bot_stopped(
+    client: Client,
+    update,
+    db: AsyncIOMotorDatabase
+):
+    """Handle a user blocking or unblocking the bot"""
+    if not isinstance(update, raw.types.UpdateBotStopped):
+        return
+    
+    if update.stopped:
+        await mark_unreachable(db, [update.user_id], "blocked")
+    else:
+        await mark_reachable(db, update.user_id)
+
+
+async def handle_chats_command(
+    client: Client,
+    message: Message,
+    db: AsyncIOMotorDatabase,
+    chats_registry: ChatsRegistry
+):
+    """Handle /chats command - List connected chats"""
+    if message.from_user.id not in ADMINS:
+        await message.reply_text("❌ This command is only for admins!")
+        return
+    
+    try:
+        stats = await chats_registry.get_stats()
+        recent = await chats_registry.get_recent_chats(limit=10)
+        
+        chats_text = f"""
+💬 **Connected Chats**
+
+✅ Active: {stats['active']}
+❌ Left/Removed: {stats['inactive']}
+"""
+        for chat_type, count in sorted(stats["types"].items()):
+            chats_text += f"• {chat_type.capitalize()}: {count}\n"
+        
+        if recent:
+            chats_text += "\n**Recently Joined:**\n"
+            for chat in recent:
+                chats_text += f"\n• {chat.get('title', 'Unknown')} - ID: `{chat['chat_id']}`"
+        
+        await message.reply_text(chats_text)
+        await log_activity(db, message.from_user.id, "view_chats", f"Viewed {stats['active']} chats")
+    
+    except Exception as e:
+        logger.error(f"Error in chats command: {e}")
+        await message.reply_text(f"❌ Error: {str(e)}")
+
+
+async def handle_connections_command(
+    client: Client,
+    message: Message,
+    db: AsyncIOMotorDatabase,
+    chats_registry: ChatsRegistry
+):
+    """Handle /connections command - List groups the user added the bot to"""
+    try:
+        chats = await chats_registry.get_user_connections(message.from_user.id)
+        
+        if not chats:
+            await message.reply_text(
+                "ℹ️ You haven't connected any groups yet.\n\n"
+                "Add me to a group to connect it!"
+            )
+            return
+        
+        connections_text = f"🔗 **Your Connected Groups** ({len(chats)})\n"
+        for chat in chats:
+            connections_text += f"\n• {chat.get('title', 'Unknown')} - ID: `{chat['chat_id']}`"
+        
+        await message.reply_text(connections_text)
+    
+    except Exception as e:
+        logger.error(f"Error in connections command: {e}")
+        await message.reply_text(f"❌ Error: {str(e)}")
+
+
+def setup_chat_handlers(client: Client, db: AsyncIOMotorDatabase):
+    """Setup chat registry handlers"""
+    
+    chats_registry = ChatsRegistry(db)
+    
+    # Membership of clones' chats isn't the main bot's audience
+    @client.on_chat_member_updated()
+    @main_bot_only
+    async def my_chat_member(client: Client, update: ChatMemberUpdated):
+        await handle_my_chat_member(client, update, db, chats_registry)
+    
+    # Pyrogram 1.x doesn't turn UpdateBotStopped into a ChatMemberUpdated. Raw
+    # handlers see every update, so this one gets a group of its own
+    @client.on_raw_update(group=BOT_STOPPED_GROUP)
+    @main_bot_only
+    async def bot_stopped(client: Client, update, users, chats):
+        await handle_bot_stopped(client, update, db)
+    
+    @client.on_message(filters.command("chats"))
+    @main_bot_only
+    async def chats_cmd(client: Client, message: Message):
+        await handle_chats_command(client, message, db, chats_registry)
+    
+    @client.on_message(filters.command("connections"))
+    @main_bot_only
+    async def connections_cmd(client: Client, message: Message):
+        await handle_connections_command(client, message, db, chats_registry)
+    
+    logger.info("✅ Chat handlers setup complete")
+    
+    return chats_registry
@@ -3,15 +3,23 @@ Bot cloning feature - Allow users to create their own bot instances
 """
 
 from pyrogram import Client, filters
-from pyrogram.types import Message, InlineKeyboardMarkup, InlineKeyboardButton
+from pyrogram.types import CallbackQuery, Message, InlineKeyboardMarkup, InlineKeyboardButton
 from motor.motor_asyncio import AsyncIOMotorDatabase
 from utils.emoji_messages import EmojiMessages, EMOJIS
 from utils.helpers import log_activity
+from typing import Union
+from config import ADMINS
+from utils.callback_router import callback_router
+from utils.clone_runtime import CloneRuntime
+from utils.clone_supervisor import CloneSupervisor
+from utils.tenants import main_bot_only
 import secrets
 import logging
 
 logger = logging.getLogger(__name__)
 
+ClonesBackend = Union[CloneRuntime, CloneSupervisor]
+
 
 async def handle_clone_command(client: Client, message: Message, db: AsyncIOMotorDatabase):
     """Handle /clone command - Create bot clone"""
@@ -64,7 +72,7 @@ async def handle_clone_command(client: Client, message: Message, db: AsyncIOMoto
         await message.reply_text(EmojiMessages.error_message(str(e)))
 
 
-async def handle_clone_setup(client: Client, message: Message, db: AsyncIOMotorDatabase):
+async def handle_clone_setup(client: Client, message: Message, db: AsyncIOMotorDatabase, clone_runtime: ClonesBackend):
     """Handle /clone_setup <token> - Setup cloned bot"""
     try:
         user_id = message.from_user.id
@@ -121,15 +129,35 @@ async def handle_clone_setup(client: Client, message: Message, db: AsyncIOMotorD
         
         await db.cloned_bots.insert_one(clone_config)
         
+        # Connect it right away; this also checks the token with Telegram
+        connected = await clone_runtime.add_clone(clone_config)
+        if connected is False:
+            await db.cloned_bots.delete_one({"clone_id": clone_id})
+            await message.reply_text(
+                f"{EMOJIS['error']} Telegram rejected this bot token!\n\n"
+                f"Check it with @BotFather and try again."
+            )
+            return
+        
+        if connected:
+            title = f"{EMOJIS['success']} **Clone Created Successfully!** {EMOJIS['success']}"
+            status = f"{EMOJIS['rocket']} Status: Active\n\n{EMOJIS['info']} Your clone is ready to use!"
+        else:
+            # The shard checks the token once it picks the clone up
+            title = f"⏳ **Clone Saved - Connecting** ⏳"
+            status = (
+                f"⏳ Status: Pending\n\n"
+                f"{EMOJIS['info']} Your clone is still connecting. Check /clone_info in a minute; "
+                f"it shows INVALID_TOKEN if Telegram rejects the token."
+            )
+        
         # Create success message
         success_msg = f"""
-{EMOJIS['success']} **Clone Created Successfully!** {EMOJIS['success']}
+{title}
 
 {EMOJIS['bot']} Clone ID: `{clone_id}`
 🔑 Bot Token: `{bot_token}`
-{EMOJIS['rocket']} Status: Active
-
-{EMOJIS['info']} Your clone is ready to use!
+{status}
 
 **Next Steps:**
 1. Add your bot to a group/channel
@@ -184,7 +212,7 @@ async def handle_clone_info(client: Client, message: Message, db: AsyncIOMotorDa
 🌐 Language: {clone['settings']['language']}
 🕐 Timezone: {clone['settings']['timezone']}
 
-{EMOJIS['info']} Use /clone_update to modify settings
+{EMOJIS['info']} Use the buttons below to manage your clone
 """
         
         buttons = [
@@ -204,51 +232,152 @@ async def handle_clone_info(client: Client, message: Message, db: AsyncIOMotorDa
         await message.reply_text(EmojiMessages.error_message(str(e)))
 
 
-async def handle_clone_delete(client: Client, message: Message, db: AsyncIOMotorDatabase):
+async def delete_clone(db: AsyncIOMotorDatabase, clone_runtime: ClonesBackend, user_id: int) -> bool:
+    """
+    Stop and delete a user's clone
+
+    Returns:
+        False if the user has no clone
+    """
+    clone = await db.cloned_bots.find_one({"owner_id": user_id})
+    if not clone:
+        return False
+    
+    await clone_runtime.remove_clone(clone["clone_id"])
+    await db.cloned_bots.delete_one({"owner_id": user_id})
+    await log_activity(db, user_id, "bot_clone_deleted", "Deleted bot clone")
+    return True
+
+
+async def handle_clone_delete(client: Client, message: Message, db: AsyncIOMotorDatabase, clone_runtime: ClonesBackend):
     """Handle /clone_delete - Delete cloned bot"""
     try:
-        user_id = message.from_user.id
-        
-        clone = await db.cloned_bots.find_one({"owner_id": user_id})
-        
-        if not clone:
+        if not await delete_clone(db, clone_runtime, message.from_user.id):
             await message.reply_text(
                 f"{EMOJIS['error']} You don't have a cloned bot to delete!"
             )
             return
         
-        # Delete the clone
-        await db.cloned_bots.delete_one({"owner_id": user_id})
-        
         await message.reply_text(
             f"{EMOJIS['success']} Your bot clone has been deleted!\n\n"
             f"Use /clone to create a new one."
         )
         
-        await log_activity(db, user_id, "bot_clone_deleted", "Deleted bot clone")
-        
     except Exception as e:
         logger.error(f"Error in clone delete: {e}")
         await message.reply_text(EmojiMessages.error_message(str(e)))
 
 
-def setup_clone_handlers(client: Client, db: AsyncIOMotorDatabase):
-    """Setup clone handlers"""
+async def handle_clone_settings_callback(client: Client, callback_query: CallbackQuery):
+    """Handle the Update Settings button under /clone_info"""
+    await callback_query.answer(
+        "⚙️ Clone settings can't be changed from the bot yet. Contact @ph0enix_web to update them.",
+        show_alert=True
+    )
+
+
+async def handle_clone_delete_callback(client: Client, callback_query: CallbackQuery):
+    """Handle the Delete Clone button under /clone_info - ask before deleting"""
+    buttons = [
+        [InlineKeyboardButton("🗑️ Yes, delete it", callback_data="clone_delete_confirm")],
+        [InlineKeyboardButton("❌ Cancel", callback_data="close")],
+    ]
+    await callback_query.message.reply_text(
+        f"{EMOJIS['warning']} Delete your bot clone? This can't be undone.",
+        reply_markup=InlineKeyboardMarkup(buttons)
+    )
+    await callback_query.answer()
+
+
+async def handle_clone_delete_confirm(
+    client: Client,
+    callback_query: CallbackQuery,
+    db: AsyncIOMotorDatabase,
+    clone_runtime: ClonesBackend
+):
+    """Handle the delete confirmation button"""
+    if not await delete_clone(db, clone_runtime, callback_query.from_user.id):
+        await callback_query.answer("You don't have a cloned bot to delete!", show_alert=True)
+        return
+    
+    await callback_query.message.edit_text(
+        f"{EMOJIS['success']} Your bot clone has been deleted!\n\n"
+        f"Use /clone to create a new one."
+    )
+    await callback_query.answer()
+
+
+async def handle_clones_command(client: Client, message: Message, db: AsyncIOMotorDatabase, clone_runtime: ClonesBackend):
+    """Handle /clones command - Show clone runtime load (admin)"""
+    if message.from_user.id not in ADMINS:
+        await message.reply_text("❌ This command is only for admins!")
+        return
+    
+    try:
+        args = message.text.split()
+        if len(args) > 1 and isinstance(clone_runtime, CloneSupervisor):
+            await clone_runtime.scale(max(1, int(args[1])))
+        
+        stats = clone_runtime.get_stats()
+        text = (
+            f"{EMOJIS['bot']} **Clone Runtime**\n\n"
+            f"🟢 Connected: {stats['active']}\n"
+            f"💤 Sleeping: {stats['sleeping']}\n"
+        )
+        
+        shards = stats.get("shards")
+        if shards:
+            text += "\n**Shards:**\n"
+            for shard_id, shard in shards.items():
+                status = "🟢" if shard["alive"] else "🔴"
+                text += (
+                    f"{status} #{shard_id} (pid {shard['pid']}): "
+                    f"{shard['active']} connected, {shard['sleeping']} sleeping, "
+                    f"{shard['peak_rss_mb']:.0f} MB, {shard['restarts']} restarts\n"
+                )
+            text += "\nUse /clones <n> to change the number of shards"
+        
+        await message.reply_text(text)
+    except ValueError:
+        await message.reply_text("Usage: /clones [shard_count]")
+    except Exception as e:
+        logger.error(f"Error in clones command: {e}")
+        await message.reply_text(EmojiMessages.error_message(str(e)))
+
+
+def setup_clone_handlers(client: Client, db: AsyncIOMotorDatabase, clone_runtime: ClonesBackend):
+    """Setup clone handlers (main bot only - clones can't spawn clones)"""
     
     @client.on_message(filters.command("clone"))
+    @main_bot_only
     async def clone_cmd(client: Client, message: Message):
         await handle_clone_command(client, message, db)
     
     @client.on_message(filters.command("clone_setup"))
+    @main_bot_only
     async def clone_setup_cmd(client: Client, message: Message):
-        await handle_clone_setup(client, message, db)
+        await handle_clone_setup(client, message, db, clone_runtime)
     
     @client.on_message(filters.command("clone_info"))
+    @main_bot_only
     async def clone_info_cmd(client: Client, message: Message):
         await handle_clone_info(client, message, db)
     
     @client.on_message(filters.command("clone_delete"))
+    @main_bot_only
     async def clone_delete_cmd(client: Client, message: Message):
-        await handle_clone_delete(client, message, db)
+        await handle_clone_delete(client, message, db, clone_runtime)
+    
+    @client.on_message(filters.command("clones"))
+    @main_bot_only
+    async def clones_cmd(client: Client, message: Message):
+        await handle_clones_command(client, message, db, clone_runtime)
+    
+    callback_router.register("clone_settings", handle_clone_settings_callback, exact=True)
+    callback_router.register("clone_delete", handle_clone_delete_callback, exact=True)
+    
+    @callback_router.route("clone_delete_confirm", exact=True)
+    async def clone_delete_confirm_cb(client: Client, callback_query: CallbackQuery):
+        await handle_clone_delete_confirm(client, callback_query, db, clone_runtime)
     
     logger.info("✅ Clone handlers setup complete")
@@ -68,13 +68,25 @@ Example: "Superman" or "Avengers"
 • /set_caption - Add caption to file
 • /set_thumb - Set thumbnail
 
+**Groups:**
+• /connections - Groups you added me to
+
 **Admin Commands** (Admin only):
 • /index - Index files from channel
+• /dedupe_files - Merge files indexed more than once
 • /stats - View bot statistics
 • /users - List all users
 • /ban @user - Ban a user
 • /unban @user - Unban a user
+• /revoke_link <link> - Invalidate a stream/download link
 • /broadcast - Send message to all users
+• /grp_broadcast - Send message to all groups
+• /chats - List connected chats
+• /broadcast_cancel <job_id> - Stop a running broadcast
+• /audience - Show how many users are reachable
+• /clones [n] - Clone runtime load (and shard count)
+• /profile <seconds> - Profile the live bot and show hot functions
+• /dbstats - Slowest database query shapes
 • /fsub @channel - Add Force Subscribe channel
 • /nofsub - Remove Force Subscribe
 
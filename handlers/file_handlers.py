@@ -5,8 +5,13 @@ Handles file renaming, captions, thumbnails, and streaming
 
 from pyrogram import Client, filters
 from pyrogram.types import Message
-from config import RENAME_ENABLED, STREAM_ENABLED
+from config import RENAME_ENABLED, STREAM_ENABLED, STREAM_BIN_CHANNEL
 from utils.helpers import log_activity
+from utils.premium_benefits import PremiumBenefits
+from utils.release_names import search_fields
+from web import build_stream_link
+from web.streamer import get_media
+from web.tokens import link_ttl
 from motor.motor_asyncio import AsyncIOMotorDatabase
 import logging
 
@@ -59,9 +64,15 @@ async def handle_set_caption_command(client: Client, message: Message, db: Async
     caption = args[1]
     
     try:
+        file = await db.files.find_one({"file_id": file_id}, {"file_name": 1, "custom_name": 1})
+        if not file:
+            await message.reply_text("❌ File not found in database")
+            return
+        # Captions are searchable, so the search fields change with them
+        file["caption"] = caption
         result = await db.files.update_one(
             {"file_id": file_id},
-            {"$set": {"caption": caption}}
+            {"$set": {"caption": caption, **search_fields(file)}}
         )
         
         if result.modified_count > 0:
@@ -113,9 +124,13 @@ async def handle_del_caption_command(client: Client, message: Message, db: Async
         return
     
     try:
+        file = await db.files.find_one({"file_id": file_id}, {"file_name": 1, "custom_name": 1})
+        if not file:
+            await message.reply_text("❌ File not found")
+            return
         result = await db.files.update_one(
             {"file_id": file_id},
-            {"$set": {"caption": None}}
+            {"$set": {"caption": None, **search_fields(file)}}
         )
         
         if result.modified_count > 0:
@@ -141,16 +156,27 @@ async def handle_stream_command(client: Client, message: Message, db: AsyncIOMot
     
     try:
         file_msg = message.reply_to_message
-        file_id = file_msg.media.file_id if hasattr(file_msg.media, 'file_id') else None
-        file_name = file_msg.media.file_name if hasattr(file_msg.media, 'file_name') else "file"
+        media = get_media(file_msg)
+        file_id = media.file_id if media else None
+        file_name = getattr(media, "file_name", None) or "file"
         
         if not file_id:
             await message.reply_text("❌ Could not get file ID")
             return
         
-        # Generate stream link (placeholder - would integrate with actual streaming service)
-        stream_link = f"https://stream.example.com/file/{file_id}"
-        download_link = f"https://download.example.com/file/{file_id}"
+        # Indexed files stream from their source channel; anything else is
+        # copied to the bin channel so the link keeps working
+        indexed = await db.files.find_one({"file_id": file_id}, {"channel_id": 1, "message_id": 1})
+        if indexed:
+            chat_id, message_id = indexed["channel_id"], indexed["message_id"]
+        else:
+            copied = await file_msg.copy(STREAM_BIN_CHANNEL)
+            chat_id, message_id = STREAM_BIN_CHANNEL, getattr(copied, "message_id", None) or copied.id
+        
+        user_id = message.from_user.id
+        is_premium = await PremiumBenefits.is_premium(db, user_id)
+        stream_link = build_stream_link("stream", chat_id, message_id, user_id, is_premium)
+        download_link = build_stream_link("download", chat_id, message_id, user_id, is_premium)
         
         stream_text = f"""
 🎬 **Stream Links**
@@ -163,6 +189,8 @@ async def handle_stream_command(client: Client, message: Message, db: AsyncIOMot
 📥 Download Link:
 `{download_link}`
 
+⏳ Links expire in {link_ttl(is_premium) // 3600} hours
+
 **Players Supported:**
 • VLC Media Player
 • MX Player
@@ -14,6 +14,9 @@ from config import (
     OWNER_ID,
 )
 from utils.helpers import log_activity
+from utils.reachability import notify_user
+from utils.tenants import main_bot_only
+from utils.callback_router import callback_router
 from motor.motor_asyncio import AsyncIOMotorDatabase
 from datetime import datetime, timedelta
 import logging
@@ -357,10 +360,11 @@ async def handle_approve_payment(client: Client, message: Message, db: AsyncIOMo
         )
         
         # Notify user
-        try:
-            await client.send_message(
-                user_id,
-                f"""
+        await notify_user(
+            client,
+            db,
+            user_id,
+            f"""
 🎉 **Payment Approved!**
 
 Your {plan.capitalize()} premium subscription is now active!
@@ -370,9 +374,7 @@ Expires: {premium_until.strftime('%Y-%m-%d')}
 
 Enjoy unlimited access to all premium features! 🚀
 """
-            )
-        except Exception as e:
-            logger.warning(f"Could not notify user: {e}")
+        )
         
         await log_activity(db, message.from_user.id, "approve_payment", f"Approved payment {payment_id}")
         
@@ -410,19 +412,18 @@ async def handle_reject_payment(client: Client, message: Message, db: AsyncIOMot
         await message.reply_text(f"✅ Payment {payment_id} rejected")
         
         # Notify user
-        try:
-            await client.send_message(
-                payment["user_id"],
-                f"""
+        await notify_user(
+            client,
+            db,
+            payment["user_id"],
+            f"""
 ❌ **Payment Rejected**
 
 Payment ID: {payment_id}
 
 Your payment could not be verified. Please contact @{OWNER_ID} for more information.
 """
-            )
-        except Exception as e:
-            logger.warning(f"Could not notify user: {e}")
+        )
         
         await log_activity(db, message.from_user.id, "reject_payment", f"Rejected payment {payment_id}")
         
@@ -439,27 +440,34 @@ def setup_payment_handlers(client: Client, db: AsyncIOMotorDatabase):
         await handle_buy_command(client, message, db)
     
     @client.on_message(filters.command("approve_payment"))
+    @main_bot_only
     async def approve_payment_cmd(client: Client, message: Message):
         await handle_approve_payment(client, message, db)
     
     @client.on_message(filters.command("reject_payment"))
+    @main_bot_only
     async def reject_payment_cmd(client: Client, message: Message):
         await handle_reject_payment(client, message, db)
     
-    @client.on_callback_query()
-    async def handle_callbacks(client: Client, callback_query):
-        data = callback_query.data
-        
-        if data.startswith("buy_"):
-            await handle_payment_callback(client, callback_query, db)
-        elif data.startswith("pay_bsc_"):
-            await handle_bsc_payment(client, callback_query, db)
-        elif data.startswith("pay_sol_"):
-            await handle_sol_payment(client, callback_query, db)
-        elif data.startswith("confirm_payment_"):
-            await handle_confirm_payment(client, callback_query, db)
-        elif data == "cancel_payment":
-            await callback_query.message.delete()
-            await callback_query.answer()
+    @callback_router.route("buy_")
+    async def buy_cb(client: Client, callback_query):
+        await handle_payment_callback(client, callback_query, db)
+    
+    @callback_router.route("pay_bsc_")
+    async def pay_bsc_cb(client: Client, callback_query):
+        await handle_bsc_payment(client, callback_query, db)
+    
+    @callback_router.route("pay_sol_")
+    async def pay_sol_cb(client: Client, callback_query):
+        await handle_sol_payment(client, callback_query, db)
+    
+    @callback_router.route("confirm_payment_")
+    async def confirm_payment_cb(client: Client, callback_query):
+        await handle_confirm_payment(client, callback_query, db)
+    
+    @callback_router.route("cancel_payment", exact=True)
+    async def cancel_payment_cb(client: Client, callback_query):
+        await callback_query.message.delete()
+        await callback_query.answer()
     
     logger.info("✅ Payment handlers setup complete")
@@ -4,9 +4,12 @@ Handles premium membership and referral system
 """
 
 from pyrogram import Client, filters
-from pyrogram.types import Message, InlineKeyboardMarkup, InlineKeyboardButton
+from pyrogram.types import CallbackQuery, Message, InlineKeyboardMarkup, InlineKeyboardButton
 from config import ADMINS, PREMIUM_ENABLED
+from utils.callback_router import callback_router
 from utils.helpers import log_activity
+from utils.reachability import notify_user
+from utils.tenants import main_bot_only
 from motor.motor_asyncio import AsyncIOMotorDatabase
 from datetime import datetime, timedelta
 import logging
@@ -52,29 +55,24 @@ Contact: @ph0enix_web for payments
     await message.reply_text(plans_text, reply_markup=InlineKeyboardMarkup(buttons))
 
 
-async def handle_myplan_command(client: Client, message: Message, db: AsyncIOMotorDatabase):
-    """Handle /myplan command - Check user's premium status"""
-    if not PREMIUM_ENABLED:
-        await message.reply_text("❌ Premium feature is currently disabled")
-        return
+async def get_plan_status(db: AsyncIOMotorDatabase, user_id: int) -> str:
+    """Describe a user's premium status"""
+    user = await db.users.find_one({"user_id": user_id})
     
-    try:
-        user = await db.users.find_one({"user_id": message.from_user.id})
-        
-        if not user:
-            plan_text = "❌ No account found. Use /start to create one."
-        elif not user.get("is_premium"):
-            plan_text = """
+    if not user:
+        return "❌ No account found. Use /start to create one."
+    if not user.get("is_premium"):
+        return """
 ❌ **No Active Premium**
 
 You don't have an active premium subscription.
 Use /plan to view available plans.
 """
-        else:
-            premium_until = user.get("premium_until")
-            days_left = (premium_until - datetime.utcnow()).days if premium_until else 0
-            
-            plan_text = f"""
+    
+    premium_until = user.get("premium_until")
+    days_left = (premium_until - datetime.utcnow()).days if premium_until else 0
+    
+    return f"""
 ✅ **Your Premium Status**
 
 💎 Status: Active
@@ -82,8 +80,16 @@ Use /plan to view available plans.
 ⏰ Days Left: {days_left}
 👥 Referrals: {user.get('referral_count', 0)}
 """
-        
-        await message.reply_text(plan_text)
+
+
+async def handle_myplan_command(client: Client, message: Message, db: AsyncIOMotorDatabase):
+    """Handle /myplan command - Check user's premium status"""
+    if not PREMIUM_ENABLED:
+        await message.reply_text("❌ Premium feature is currently disabled")
+        return
+    
+    try:
+        await message.reply_text(await get_plan_status(db, message.from_user.id))
         await log_activity(db, message.from_user.id, "check_plan", "Checked premium status")
         
     except Exception as e:
@@ -91,6 +97,17 @@ Use /plan to view available plans.
         await message.reply_text(f"❌ Error: {str(e)}")
 
 
+async def handle_myplan_callback(client: Client, callback_query: CallbackQuery, db: AsyncIOMotorDatabase):
+    """Handle the My Plan button under /plan"""
+    if not PREMIUM_ENABLED:
+        await callback_query.answer("❌ Premium feature is currently disabled", show_alert=True)
+        return
+    
+    await callback_query.message.reply_text(await get_plan_status(db, callback_query.from_user.id))
+    await callback_query.answer()
+    await log_activity(db, callback_query.from_user.id, "check_plan", "Checked premium status")
+
+
 async def handle_add_premium_command(client: Client, message: Message, db: AsyncIOMotorDatabase):
     """Handle /add_premium command - Add premium to user (admin only)"""
     if message.from_user.id not in ADMINS:
@@ -127,15 +144,14 @@ async def handle_add_premium_command(client: Client, message: Message, db: Async
             )
             
             # Notify user
-            try:
-                await client.send_message(
-                    user_id,
-                    f"🎉 **Premium Activated!**\n\n"
-                    f"Your premium subscription is now active for {days} days!\n"
-                    f"Enjoy unlimited access to all features."
-                )
-            except:
-                pass
+            await notify_user(
+                client,
+                db,
+                user_id,
+                f"🎉 **Premium Activated!**\n\n"
+                f"Your premium subscription is now active for {days} days!\n"
+                f"Enjoy unlimited access to all features."
+            )
             
             await log_activity(db, message.from_user.id, "add_premium", f"Added {days} days to user {user_id}")
         else:
@@ -237,11 +253,17 @@ def setup_premium_handlers(client: Client, db: AsyncIOMotorDatabase):
     async def myplan_cmd(client: Client, message: Message):
         await handle_myplan_command(client, message, db)
     
+    @callback_router.route("myplan", exact=True)
+    async def myplan_cb(client: Client, callback_query: CallbackQuery):
+        await handle_myplan_callback(client, callback_query, db)
+    
     @client.on_message(filters.command("add_premium"))
+    @main_bot_only
     async def add_premium_cmd(client: Client, message: Message):
         await handle_add_premium_command(client, message, db)
     
     @client.on_message(filters.command("remove_premium"))
+    @main_bot_only
     async def remove_premium_cmd(client: Client, message: Message):
         await handle_remove_premium_command(client, message, db)
     
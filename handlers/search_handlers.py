@@ -4,9 +4,13 @@ Handles search queries and file delivery
 """
 
 from pyrogram import Client, filters
-from pyrogram.types import Message, InlineKeyboardMarkup, InlineKeyboardButton
+from pyrogram.types import CallbackQuery, Message, InlineKeyboardMarkup, InlineKeyboardButton
+from typing import List, Tuple
 from utils import SearchEngine, FSubManager
+from utils.callback_router import callback_router
 from utils.helpers import log_activity, format_file_info
+from utils.pages import result_pages
+from utils.tenants import get_tenant, main_bot_only
 from config import ADMINS, PM_SEARCH_ENABLED, FORCE_SUB_ENABLED
 from motor.motor_asyncio import AsyncIOMotorDatabase
 import logging
@@ -14,6 +18,108 @@ import logging
 logger = logging.getLogger(__name__)
 
 
+SUGGESTION_PREFIX = "spell_"
+PAGE_PREFIX = "page_"
+# Ranked results kept per search, PAGE_SIZE to a page
+MAX_RESULTS = 50
+
+
+def suggestion_buttons(suggestions: List[str]) -> List[List[InlineKeyboardButton]]:
+    """One button per suggestion that fits in callback data (64 bytes)"""
+    buttons = []
+    for text in suggestions:
+        data = f"{SUGGESTION_PREFIX}{text}"
+        if len(data.encode()) <= 64:
+            buttons.append([InlineKeyboardButton(f"🔎 {text}", callback_data=data)])
+    return buttons
+
+
+def render_page(token: str, number: int) -> Tuple[str, InlineKeyboardMarkup]:
+    """Text and buttons for one page of stored results; raises KeyError if they expired"""
+    pages = result_pages.get(token)
+    if pages is None:
+        raise KeyError(token)
+    number = min(max(number, 0), pages.page_count - 1)
+    first = number * pages.page_size + 1
+    
+    results_text = f"🎬 **Search Results for: {pages.query}**\n\n"
+    buttons = []
+    for idx, file in enumerate(pages.page(number), first):
+        results_text += f"{idx}. {format_file_info(file)}\n\n"
+        buttons.append([
+            InlineKeyboardButton(
+                f"📥 Download #{idx}",
+                callback_data=f"download_{file['_id']}"
+            )
+        ])
+    
+    if pages.page_count > 1:
+        results_text += f"📄 Page {number + 1}/{pages.page_count} · {len(pages.results)} results"
+        navigation = []
+        if number > 0:
+            navigation.append(InlineKeyboardButton("⬅️ Prev", callback_data=f"{PAGE_PREFIX}{token}_{number - 1}"))
+        if number < pages.page_count - 1:
+            navigation.append(InlineKeyboardButton("Next ➡️", callback_data=f"{PAGE_PREFIX}{token}_{number + 1}"))
+        buttons.append(navigation)
+    
+    return results_text.strip(), InlineKeyboardMarkup(buttons)
+
+
+async def show_results(
+    client: Client,
+    target: Message,
+    user_id: int,
+    chat_id: int,
+    query: str,
+    results: List[dict],
+    db: AsyncIOMotorDatabase,
+    fsub_manager: FSubManager
+):
+    """Edit target into the results list, or into join buttons if Force Subscribe blocks the user"""
+    # Check Force Subscribe if enabled
+    if FORCE_SUB_ENABLED:
+        missing_channels = await fsub_manager.get_missing_fsub_channels(
+            client,
+            user_id,
+            chat_id
+        )
+        
+        if missing_channels:
+            # Create join buttons
+            buttons = []
+            for channel_id in missing_channels:
+                try:
+                    channel = await client.get_chat(channel_id)
+                    buttons.append([
+                        InlineKeyboardButton(
+                            f"Join {channel.title}",
+                            url=f"https://t.me/{channel.username}" if channel.username else None
+                        )
+                    ])
+                except:
+                    pass
+            
+            fsub_text = f"""
+❌ **Access Denied**
+
+You need to join the following channel(s) to access files:
+"""
+            
+            await target.edit_text(
+                fsub_text,
+                reply_markup=InlineKeyboardMarkup(buttons)
+            )
+            await log_activity(db, user_id, "fsub_required", f"Query: {query}")
+            return
+    
+    # Results stay in memory so Next/Prev never search again
+    text, markup = render_page(result_pages.save(query, results), 0)
+    await target.edit_text(text, reply_markup=markup)
+    
+    # Log search
+    await log_activity(db, user_id, "search", f"Query: {query} ({len(results)} results)")
+
+
 async def handle_search_query(
     client: Client,
     message: Message,
@@ -37,78 +143,63 @@ async def handle_search_query(
     
     try:
         # Perform search
-        results = await search_engine.search(query, limit=10)
+        # Only files from channels this bot indexed
+        tenant = get_tenant(client)
+        results = await search_engine.search_for(tenant, query, limit=MAX_RESULTS)
         
         if not results:
-            await searching_msg.edit_text(f"❌ No results found for **{query}**")
-            await log_activity(db, message.from_user.id, "search", f"Query: {query} (No results)")
-            return
-        
-        # Check Force Subscribe if enabled
-        if FORCE_SUB_ENABLED:
-            missing_channels = await fsub_manager.get_missing_fsub_channels(
-                client,
-                message.from_user.id,
-                message.chat.id
-            )
-            
-            if missing_channels:
-                # Create join buttons
-                buttons = []
-                for channel_id in missing_channels:
-                    try:
-                        channel = await client.get_chat(channel_id)
-                        buttons.append([
-                            InlineKeyboardButton(
-                                f"Join {channel.title}",
-                                url=f"https://t.me/{channel.username}" if channel.username else None
-                            )
-                        ])
-                    except:
-                        pass
-                
-                fsub_text = f"""
-❌ **Access Denied**
-
-You need to join the following channel(s) to access files:
-"""
-                
+            # Offer spellings that do have results
+            buttons = suggestion_buttons(await search_engine.suggest_for(tenant, query))
+            if buttons:
                 await searching_msg.edit_text(
-                    fsub_text,
+                    f"❌ No results found for **{query}**\n\n🤔 Did you mean:",
                     reply_markup=InlineKeyboardMarkup(buttons)
                 )
-                await log_activity(db, message.from_user.id, "fsub_required", f"Query: {query}")
-                return
-        
-        # Format and send results
-        results_text = f"🎬 **Search Results for: {query}**\n\n"
-        
-        for idx, file in enumerate(results[:5], 1):  # Show top 5 results
-            results_text += f"{idx}. {format_file_info(file)}\n\n"
-        
-        # Create download buttons
-        buttons = []
-        for idx, file in enumerate(results[:5], 1):
-            buttons.append([
-                InlineKeyboardButton(
-                    f"📥 Download #{idx}",
-                    callback_data=f"download_{file['_id']}"
-                )
-            ])
+            else:
+                await searching_msg.edit_text(f"❌ No results found for **{query}**")
+            await log_activity(db, message.from_user.id, "search", f"Query: {query} (No results)")
+            return
         
-        await searching_msg.edit_text(
-            results_text,
-            reply_markup=InlineKeyboardMarkup(buttons)
+        await show_results(
+            client, searching_msg, message.from_user.id, message.chat.id, query, results, db, fsub_manager
         )
         
-        # Log search
-        await log_activity(db, message.from_user.id, "search", f"Query: {query} ({len(results)} results)")
-        
     except Exception as e:
         logger.error(f"Search error: {e}")
         await searching_msg.edit_text("❌ An error occurred during search. Please try again.")
 
 
+async def handle_suggestion_callback(
+    client: Client,
+    callback_query: CallbackQuery,
+    db: AsyncIOMotorDatabase,
+    search_engine: SearchEngine,
+    fsub_manager: FSubManager
+):
+    """Handle a "Did you mean" button - search the suggested spelling in place"""
+    if not get_tenant(client).has_feature("search"):
+        await callback_query.answer("❌ Search is disabled on this bot.", show_alert=True)
+        return
+    
+    query = callback_query.data[len(SUGGESTION_PREFIX):]
+    results = await search_engine.search_for(get_tenant(client), query, limit=MAX_RESULTS)
+    if not results:
+        await callback_query.answer("❌ No results anymore, please search again.", show_alert=True)
+        return
+    
+    await callback_query.answer()
+    await show_results(
+        client,
+        callback_query.message,
+        callback_query.from_user.id,
+        callback_query.message.chat.id,
+        query,
+        results,
+        db,
+        fsub_manager
+    )
+
+
 async def handle_index_command(
     client: Client,
     message: Message,
@@ -116,7 +207,10 @@ async def handle_index_command(
     search_engine: SearchEngine
 ):
     """Handle /index command - Index files from channel"""
-    if message.from_user.id not in ADMINS:
+    tenant = get_tenant(client)
+    # On a clone the owner indexes their own channels
+    allowed = tenant.owner_id == message.from_user.id if tenant.is_clone else message.from_user.id in ADMINS
+    if not allowed:
         await message.reply_text("❌ This command is only for admins!")
         return
     
@@ -133,6 +227,8 @@ async def handle_index_command(
     
     try:
         indexed_count = 0
+        # Files already indexed by another bot become visible to this one too
+        await search_engine.visibility.add_channel(tenant, channel_id)
         
         # Get all messages from channel
         async for msg in client.get_chat_history(channel_id):
@@ -186,6 +282,7 @@ async def handle_delete_command(
         result = await db.files.delete_one({"file_id": file_id})
         
         if result.deleted_count > 0:
+            search_engine.result_cache.clear()
             await message.reply_text(f"✅ File deleted successfully")
             await log_activity(db, message.from_user.id, "delete_file", f"File ID: {file_id}")
         else:
@@ -196,6 +293,44 @@ async def handle_delete_command(
         await message.reply_text(f"❌ Error deleting file: {str(e)}")
 
 
+async def handle_dedupe_files_command(
+    client: Client,
+    message: Message,
+    db: AsyncIOMotorDatabase,
+    search_engine: SearchEngine
+):
+    """Handle /dedupe_files command - Merge files indexed more than once"""
+    if message.from_user.id not in ADMINS:
+        await message.reply_text("❌ This command is only for admins!")
+        return
+    
+    status = await message.reply_text("🔍 Looking for files indexed more than once...")
+    try:
+        removed = await search_engine.remove_duplicate_messages()
+        await status.edit_text(
+            f"✅ Merged {removed} duplicate file(s)\n\n"
+            f"Download buttons for the removed copies now open the file kept."
+        )
+        await log_activity(db, message.from_user.id, "dedupe_files", f"Removed {removed} duplicates")
+    
+    except Exception as e:
+        logger.error(f"Dedupe error: {e}")
+        await status.edit_text(f"❌ Error removing duplicates: {str(e)}")
+
+
+async def handle_page_callback(client: Client, callback_query: CallbackQuery):
+    """Handle Next/Prev on search results - rendered from the stored results, no new search"""
+    token, _, number = callback_query.data[len(PAGE_PREFIX):].rpartition("_")
+    try:
+        text, markup = render_page(token, int(number))
+    except (KeyError, ValueError):
+        await callback_query.answer("⌛ These results have expired, please search again.", show_alert=True)
+        return
+    
+    await callback_query.answer()
+    await callback_query.message.edit_text(text, reply_markup=markup)
+
+
 def setup_search_handlers(client: Client, db: AsyncIOMotorDatabase):
     """Setup search-related handlers"""
     
@@ -208,6 +343,9 @@ def setup_search_handlers(client: Client, db: AsyncIOMotorDatabase):
         # Skip if it's a command
         if message.text.startswith("/"):
             return
+        # Clone owners can switch search off for their bot
+        if not get_tenant(client).has_feature("search"):
+            return
         await handle_search_query(client, message, db, search_engine, fsub_manager)
     
     @client.on_message(filters.command("index"))
@@ -218,6 +356,17 @@ def setup_search_handlers(client: Client, db: AsyncIOMotorDatabase):
     async def delete_cmd(client: Client, message: Message):
         await handle_delete_command(client, message, db, search_engine)
     
+    @client.on_message(filters.command("dedupe_files"))
+    @main_bot_only
+    async def dedupe_files_cmd(client: Client, message: Message):
+        await handle_dedupe_files_command(client, message, db, search_engine)
+    
+    callback_router.register(PAGE_PREFIX, handle_page_callback)
+    
+    @callback_router.route(SUGGESTION_PREFIX)
+    async def suggestion_cb(client: Client, callback_query: CallbackQuery):
+        await handle_suggestion_callback(client, callback_query, db, search_engine, fsub_manager)
+    
     logger.info("✅ Search handlers setup complete")
     
     return search_engine, fsub_manager
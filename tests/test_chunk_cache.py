@@ -0,0 +1,87 @@
+"""
+Tests for the streaming server's chunk cache
+"""
+
+import asyncio
+import pytest
+from web.chunk_cache import ChunkCache
+
+KEY = ("file", 0)
+DATA = b"chunk data"
+
+
+def read(fobj) -> bytes:
+    with fobj:
+        return fobj.read()
+
+
+def test_waiter_fetches_after_leader_is_cancelled(tmp_path):
+    cache = ChunkCache(str(tmp_path), max_bytes=1024)
+    fetches = []
+
+    async def run():
+        leader_started = asyncio.Event()
+
+        async def stuck_fetch():
+            fetches.append("leader")
+            leader_started.set()
+            await asyncio.sleep(3600)
+
+        async def fetch():
+            fetches.append("waiter")
+            return DATA
+
+        leader = asyncio.create_task(cache.open_chunk(KEY, stuck_fetch))
+        await leader_started.wait()
+        waiter = asyncio.create_task(cache.open_chunk(KEY, fetch))
+        await asyncio.sleep(0)
+
+        leader.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await leader
+        return read(await asyncio.wait_for(waiter, 5))
+
+    assert asyncio.run(run()) == DATA
+    assert fetches == ["leader", "waiter"]
+
+
+def test_waiter_fetches_after_leader_fails(tmp_path):
+    cache = ChunkCache(str(tmp_path), max_bytes=1024)
+
+    async def run():
+        release = asyncio.Event()
+
+        async def failing_fetch():
+            await release.wait()
+            raise RuntimeError("telegram failed")
+
+        async def fetch():
+            return DATA
+
+        leader = asyncio.create_task(cache.open_chunk(KEY, failing_fetch))
+        await asyncio.sleep(0)
+        waiter = asyncio.create_task(cache.open_chunk(KEY, fetch))
+        await asyncio.sleep(0)
+
+        release.set()
+        with pytest.raises(RuntimeError):
+            await leader
+        return read(await asyncio.wait_for(waiter, 5))
+
+    assert asyncio.run(run()) == DATA
+
+
+def test_concurrent_readers_share_one_fetch(tmp_path):
+    cache = ChunkCache(str(tmp_path), max_bytes=1024)
+    fetches = []
+
+    async def run():
+        async def fetch():
+            fetches.append(1)
+            await asyncio.sleep(0.01)
+            return DATA
+
+        return await asyncio.gather(*(cache.open_chunk(KEY, fetch) for _ in range(5)))
+
+    assert [read(fobj) for fobj in asyncio.run(run())] == [DATA] * 5
+    assert len(fetches) == 1
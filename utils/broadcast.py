@@ -0,0 +1,346 @@
+"""
+Broadcast engine for Phoenix Filter Bot
+Streams recipients (users or groups) from the database and sends with
+concurrent, rate-limited workers. Job state is checkpointed so broadcasts
+resume after a restart.
+
+Every send is recorded as soon as it finishes, so a resumed job skips the
+recipients already handled. Delivery is still at-least-once: sends that
+were in flight when the bot stopped (at most BROADCAST_CONCURRENCY) are
+made again.
+"""
+
+import asyncio
+import logging
+import secrets
+import time
+from datetime import datetime
+from typing import Dict, List, Optional, Tuple
+from motor.motor_asyncio import AsyncIOMotorDatabase
+from pyrogram import Client
+from pyrogram.errors import FloodWait, SlowmodeWait
+from config import (
+    BROADCAST_CONCURRENCY,
+    BROADCAST_RATE_LIMIT,
+    BROADCAST_BATCH_SIZE,
+    BROADCAST_PROGRESS_INTERVAL,
+    GROUP_BROADCAST_RATE_LIMIT,
+    GROUP_MIN_INTERVAL,
+)
+from utils.chats import ChatsRegistry, ACTIVE_GROUPS_QUERY
+from utils.rate_limiter import RateLimiter, get_wait_seconds
+from utils.reachability import (
+    REACHABLE_QUERY,
+    UNREACHABLE_REASONS,
+    classify_send_error,
+    mark_unreachable,
+)
+
+logger = logging.getLogger(__name__)
+
+MAX_SEND_ATTEMPTS = 3
+# Groups in a longer slowmode are reported failed instead of holding up the batch
+MAX_SLOWMODE_WAIT = 300
+
+# Recipient sources per broadcast target
+BROADCAST_TARGETS = {
+    "users": {
+        "collection": "users",
+        "id_field": "user_id",
+        "query": {"is_banned": False, **REACHABLE_QUERY},
+    },
+    "groups": {
+        "collection": "chats",
+        "id_field": "chat_id",
+        "query": ACTIVE_GROUPS_QUERY,
+    },
+}
+
+
+class BroadcastManager:
+    """Create, run and resume broadcast jobs"""
+
+    def __init__(self, db: AsyncIOMotorDatabase):
+        self.db = db
+        self.jobs_collection = db.broadcast_jobs
+        self.chats_registry = ChatsRegistry(db)
+
+        # Global budget shared by every job, plus tighter per-target budgets
+        self.limiter = RateLimiter(BROADCAST_RATE_LIMIT, burst=BROADCAST_CONCURRENCY)
+        self.target_limiters = {
+            "groups": RateLimiter(GROUP_BROADCAST_RATE_LIMIT, burst=BROADCAST_CONCURRENCY),
+        }
+        self._chat_next_send: Dict[int, float] = {}
+        self._tasks: Dict[str, asyncio.Task] = {}
+
+    async def create_job(self, source_chat_id: int, source_message_id: int,
+                         status_chat_id: int, status_message_id: int, created_by: int,
+                         target: str = "users") -> dict:
+        """
+        Persist a new broadcast job
+
+        Args:
+            source_chat_id: Chat holding the message to copy
+            source_message_id: ID of the message to copy
+            status_chat_id: Chat of the progress message
+            status_message_id: ID of the progress message
+            created_by: Admin who started the broadcast
+            target: Recipient set, "users" or "groups"
+
+        Returns:
+            The stored job document
+        """
+        spec = BROADCAST_TARGETS[target]
+        job = {
+            "job_id": secrets.token_hex(4),
+            "target": target,
+            "status": "running",
+            "source_chat_id": source_chat_id,
+            "source_message_id": source_message_id,
+            "status_chat_id": status_chat_id,
+            "status_message_id": status_message_id,
+            "last_id": None,
+            # Recipients past last_id already handled; cleared at each checkpoint
+            "batch_done": [],
+            "total": await self.db[spec["collection"]].count_documents(spec["query"]),
+            "sent": 0,
+            "failed": 0,
+            "failures": {},
+            "created_by": created_by,
+            "created_at": datetime.utcnow(),
+            "updated_at": datetime.utcnow(),
+        }
+        await self.jobs_collection.insert_one(job)
+        return job
+
+    def start_job(self, client: Client, job: dict) -> asyncio.Task:
+        """Run a job in the background"""
+        task = asyncio.create_task(self._run_job(client, job))
+        self._tasks[job["job_id"]] = task
+        task.add_done_callback(lambda _: self._tasks.pop(job["job_id"], None))
+        return task
+
+    async def resume_jobs(self, client: Client) -> int:
+        """Resume every job that was running when the bot stopped"""
+        try:
+            jobs = await self.jobs_collection.find({"status": "running"}).to_list(length=None)
+            resumed = 0
+            for job in jobs:
+                if job["job_id"] not in self._tasks:
+                    logger.info(f"Resuming broadcast {job['job_id']} ({job['sent']} sent so far)")
+                    self.start_job(client, job)
+                    resumed += 1
+            return resumed
+        except Exception as e:
+            logger.error(f"Error resuming broadcasts: {e}")
+            return 0
+
+    async def cancel_job(self, job_id: str) -> bool:
+        """Cancel a running job"""
+        result = await self.jobs_collection.update_one(
+            {"job_id": job_id, "status": "running"},
+            {"$set": {"status": "cancelled", "updated_at": datetime.utcnow()}}
+        )
+        task = self._tasks.get(job_id)
+        if task:
+            task.cancel()
+        return result.modified_count > 0
+
+    async def shutdown(self):
+        """Stop workers; running jobs stay 'running' and resume on next start"""
+        for task in list(self._tasks.values()):
+            task.cancel()
+        if self._tasks:
+            await asyncio.gather(*self._tasks.values(), return_exceptions=True)
+
+    async def _run_job(self, client: Client, job: dict):
+        """Stream recipients in checkpointed batches"""
+        spec = BROADCAST_TARGETS[job.get("target", "users")]
+        query = dict(spec["query"])
+        if job.get("last_id") is not None:
+            query["_id"] = {"$gt": job["last_id"]}
+
+        cursor = self.db[spec["collection"]].find(query, {spec["id_field"]: 1}).sort("_id", 1).batch_size(BROADCAST_BATCH_SIZE)
+        last_progress = 0.0
+        batch: List[dict] = []
+
+        try:
+            async for user in cursor:
+                batch.append(user)
+                if len(batch) >= BROADCAST_BATCH_SIZE:
+                    await self._process_batch(client, job, batch)
+                    batch = []
+                    if time.monotonic() - last_progress >= BROADCAST_PROGRESS_INTERVAL:
+                        await self._report_progress(client, job)
+                        last_progress = time.monotonic()
+
+            if batch:
+                await self._process_batch(client, job, batch)
+
+            job["status"] = "completed"
+            await self.jobs_collection.update_one(
+                {"job_id": job["job_id"]},
+                {"$set": {"status": "completed", "updated_at": datetime.utcnow()}}
+            )
+            await self._report_progress(client, job)
+            logger.info(f"Broadcast {job['job_id']} complete: {job['sent']} sent, {job['failed']} failed")
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            logger.error(f"Broadcast {job['job_id']} failed: {e}")
+            await self.jobs_collection.update_one(
+                {"job_id": job["job_id"]},
+                {"$set": {"status": "failed", "error": str(e), "updated_at": datetime.utcnow()}}
+            )
+
+    async def _process_batch(self, client: Client, job: dict, batch: List[dict]):
+        """Send one batch with concurrent workers and checkpoint it"""
+        target = job.get("target", "users")
+        id_field = BROADCAST_TARGETS[target]["id_field"]
+        done = set(job.get("batch_done") or [])
+
+        # Items are (chat_id, FloodWaits so far); chats that can't be sent to yet
+        # are put back later instead of holding a worker
+        queue: asyncio.Queue = asyncio.Queue()
+        for doc in batch:
+            if doc[id_field] not in done:
+                queue.put_nowait((doc[id_field], 0))
+
+        remaining = queue.qsize()
+        workers = min(BROADCAST_CONCURRENCY, remaining)
+        retries: List[asyncio.TimerHandle] = []
+        failures: Dict[str, List[int]] = {}
+        loop = asyncio.get_running_loop()
+
+        async def worker():
+            nonlocal remaining
+            while True:
+                item = await queue.get()
+                if item is None:
+                    return
+                chat_id, floods = item
+                reason, retry_after = await self._send_one(client, job, chat_id)
+                if reason == "flood":
+                    floods += 1
+                if retry_after is not None and floods < MAX_SEND_ATTEMPTS:
+                    retries.append(loop.call_later(retry_after, queue.put_nowait, (chat_id, floods)))
+                    continue
+
+                await self._record_result(job, chat_id, reason)
+                if reason is not None:
+                    failures.setdefault(reason, []).append(chat_id)
+                remaining -= 1
+                if not remaining:
+                    for _ in range(workers):
+                        queue.put_nowait(None)
+
+        tasks = [asyncio.create_task(worker()) for _ in range(workers)]
+        try:
+            await asyncio.gather(*tasks)
+        finally:
+            for task in tasks:
+                task.cancel()
+            for handle in retries:
+                handle.cancel()
+
+        # Drop dead recipients so later broadcasts skip them
+        for reason, chat_ids in failures.items():
+            if reason not in UNREACHABLE_REASONS:
+                continue
+            if target == "groups":
+                await self.chats_registry.mark_inactive(chat_ids, reason)
+            else:
+                await mark_unreachable(self.db, chat_ids, reason)
+
+        job["last_id"] = batch[-1]["_id"]
+        job["batch_done"] = []
+        await self.jobs_collection.update_one(
+            {"job_id": job["job_id"]},
+            {"$set": {"last_id": job["last_id"], "batch_done": [], "updated_at": datetime.utcnow()}}
+        )
+
+    async def _record_result(self, job: dict, chat_id: int, reason: Optional[str]):
+        """Count one send and remember its recipient until the next checkpoint"""
+        if reason is None:
+            job["sent"] += 1
+            inc = {"sent": 1}
+        else:
+            job["failed"] += 1
+            failures = job.setdefault("failures", {})
+            failures[reason] = failures.get(reason, 0) + 1
+            inc = {"failed": 1, f"failures.{reason}": 1}
+
+        await self.jobs_collection.update_one(
+            {"job_id": job["job_id"]},
+            {"$inc": inc, "$addToSet": {"batch_done": chat_id}}
+        )
+
+    async def _send_one(self, client: Client, job: dict, chat_id: int) -> Tuple[Optional[str], Optional[float]]:
+        """
+        Try once to copy the broadcast message to a single chat
+
+        Returns:
+            (reason, retry_after): reason is None on success, otherwise the
+            failure reason; retry_after is set when the chat should be tried
+            again after that many seconds rather than counted as failed
+        """
+        if job.get("target", "users") in self.target_limiters:
+            wait = self._chat_wait(chat_id)
+            if wait > 0:
+                return "paced", wait
+            await self.target_limiters[job["target"]].acquire()
+            self._chat_next_send[chat_id] = time.monotonic() + GROUP_MIN_INTERVAL
+
+        await self.limiter.acquire()
+        try:
+            await client.copy_message(chat_id, job["source_chat_id"], job["source_message_id"])
+            return None, None
+        except FloodWait as e:
+            wait = get_wait_seconds(e)
+            logger.warning(f"Broadcast FloodWait: sleeping {wait}s")
+            self.limiter.pause(wait)
+            return "flood", 0.0
+        except SlowmodeWait as e:
+            # Only this chat is throttled; retry it later without stalling others
+            wait = get_wait_seconds(e)
+            if wait > MAX_SLOWMODE_WAIT:
+                return "slowmode", None
+            self._chat_next_send[chat_id] = time.monotonic() + wait
+            return "slowmode", wait
+        except Exception as e:
+            logger.debug(f"Broadcast to {chat_id} failed: {e}")
+            return classify_send_error(e), None
+
+    def _chat_wait(self, chat_id: int) -> float:
+        """Seconds until a group may be sent to again (GROUP_MIN_INTERVAL apart, or after slowmode)"""
+        now = time.monotonic()
+        # Forget chats whose pacing window has long passed
+        if len(self._chat_next_send) > 10000:
+            self._chat_next_send = {k: v for k, v in self._chat_next_send.items() if v > now}
+        return self._chat_next_send.get(chat_id, 0.0) - now
+
+    async def _report_progress(self, client: Client, job: dict):
+        """Edit the admin's status message with current counts"""
+        done = job["sent"] + job["failed"]
+        percent = (done / job["total"] * 100) if job["total"] else 100
+        header = "✅ **Broadcast Complete**" if job["status"] == "completed" else "📢 **Broadcasting...**"
+        target = job.get("target", "users")
+
+        try:
+            await client.edit_message_text(
+                job["status_chat_id"],
+                job["status_message_id"],
+                f"{header}\n\n"
+                f"🆔 Job: `{job['job_id']}`\n"
+                f"🎯 Target: {target}\n"
+                f"📊 Progress: {done}/{job['total']} ({percent:.1f}%)\n"
+                f"✅ Sent: {job['sent']}\n"
+                f"❌ Failed: {job['failed']}"
+                + "".join(f"\n  • {reason}: {count}" for reason, count in job.get("failures", {}).items())
+            )
+        except Exception as e:
+            logger.debug(f"Could not update broadcast progress: {e}")
+
+    async def get_job(self, job_id: str) -> Optional[dict]:
+        """Get a job by ID"""
+        return await self.jobs_collection.find_one({"job_id": job_id})
@@ -0,0 +1,106 @@
+"""
+Callback query router for Phoenix Filter Bot
+A single dispatch table for every button callback. Modules register
+prefix or exact routes instead of installing their own catch-all handler.
+"""
+
+import logging
+import time
+from typing import Awaitable, Callable, Dict, List, Optional, Tuple
+from pyrogram import Client
+from pyrogram.types import CallbackQuery
+
+logger = logging.getLogger(__name__)
+
+CallbackHandler = Callable[[Client, CallbackQuery], Awaitable[None]]
+
+SLOW_CALLBACK_SECONDS = 1.0
+
+
+class CallbackRouter:
+    """Dispatch callback queries by exact match or prefix"""
+
+    def __init__(self):
+        self._exact: Dict[str, CallbackHandler] = {}
+        self._prefixes: Dict[str, CallbackHandler] = {}
+        self._prefix_lengths: List[int] = []
+        self.stats: Dict[str, dict] = {}
+
+    def register(self, key: str, handler: CallbackHandler, exact: bool = False):
+        """
+        Register a callback route
+
+        Args:
+            key: Callback data (exact) or callback data prefix
+            handler: Coroutine called with (client, callback_query)
+            exact: Match the whole callback data instead of a prefix
+        """
+        table = self._exact if exact else self._prefixes
+        if key in table:
+            logger.warning(f"Callback route '{key}' registered twice, replacing")
+        table[key] = handler
+
+        if not exact:
+            # Longest prefix wins, so "pay_bsc_" beats a hypothetical "pay_"
+            self._prefix_lengths = sorted({len(p) for p in self._prefixes}, reverse=True)
+
+    def route(self, key: str, exact: bool = False):
+        """Decorator form of register()"""
+        def decorator(handler: CallbackHandler) -> CallbackHandler:
+            self.register(key, handler, exact)
+            return handler
+        return decorator
+
+    def resolve(self, data: str) -> Tuple[Optional[str], Optional[CallbackHandler]]:
+        """Find the route for callback data; one dict lookup per distinct prefix length"""
+        handler = self._exact.get(data)
+        if handler:
+            return data, handler
+
+        for length in self._prefix_lengths:
+            if length > len(data):
+                continue
+            prefix = data[:length]
+            handler = self._prefixes.get(prefix)
+            if handler:
+                return prefix, handler
+
+        return None, None
+
+    async def dispatch(self, client: Client, callback_query: CallbackQuery):
+        """Run the handler for a callback query and record its latency"""
+        data = callback_query.data or ""
+        route, handler = self.resolve(data)
+
+        if not handler:
+            await callback_query.answer("Unknown action", show_alert=False)
+            return
+
+        started = time.perf_counter()
+        error = False
+        try:
+            await handler(client, callback_query)
+        except Exception as e:
+            error = True
+            logger.error(f"Error in callback '{route}': {e}")
+            try:
+                await callback_query.answer("❌ Something went wrong", show_alert=True)
+            except Exception:
+                pass
+        finally:
+            self._record(route, time.perf_counter() - started, error)
+
+    def _record(self, route: str, elapsed: float, error: bool):
+        """Accumulate per-route latency stats"""
+        stats = self.stats.setdefault(route, {"count": 0, "errors": 0, "total": 0.0, "max": 0.0})
+        stats["count"] += 1
+        stats["errors"] += int(error)
+        stats["total"] += elapsed
+        stats["max"] = max(stats["max"], elapsed)
+
+        if elapsed > SLOW_CALLBACK_SECONDS:
+            logger.warning(f"Slow callback '{route}': {elapsed * 1000:.0f}ms")
+
+
+callback_router = CallbackRouter()
+"""Shared router used by every handler module"""
@@ -0,0 +1,107 @@
+"""
+Chats registry for Phoenix Filter Bot
+Tracks the groups and channels the bot is a member of
+"""
+
+import logging
+from datetime import datetime
+from typing import Iterable, List, Optional
+from motor.motor_asyncio import AsyncIOMotorDatabase
+
+logger = logging.getLogger(__name__)
+
+ACTIVE_STATUSES = ("member", "administrator", "owner", "creator", "restricted")
+
+ACTIVE_GROUPS_QUERY = {"is_active": True, "type": {"$in": ["group", "supergroup"]}}
+"""Query matching groups the bot can currently post in"""
+
+
+def enum_value(value) -> Optional[str]:
+    """Normalize Pyrogram enums (v2) and plain strings (v1) to a string"""
+    if value is None:
+        return None
+    return str(getattr(value, "value", value)).lower()
+
+
+class ChatsRegistry:
+    """Registry of chats the bot has been added to"""
+
+    def __init__(self, db: AsyncIOMotorDatabase):
+        self.db = db
+        self.chats_collection = db.chats
+
+    async def update_membership(self, chat, status: str, added_by: Optional[int] = None) -> bool:
+        """
+        Record the bot's membership status in a chat
+
+        Args:
+            chat: Pyrogram Chat object
+            status: Bot's new member status (member, administrator, left, ...)
+            added_by: User who changed the bot's membership
+
+        Returns:
+            True if successful, False otherwise
+        """
+        try:
+            is_active = status in ACTIVE_STATUSES
+            update = {
+                "$set": {
+                    "title": chat.title,
+                    "username": chat.username,
+                    "type": enum_value(chat.type),
+                    "status": status,
+                    "is_active": is_active,
+                    "updated_at": datetime.utcnow(),
+                },
+                "$setOnInsert": {"joined_at": datetime.utcnow()},
+            }
+            if is_active and added_by:
+                update["$set"]["added_by"] = added_by
+
+            await self.chats_collection.update_one({"chat_id": chat.id}, update, upsert=True)
+            logger.info(f"Chat {chat.id} ({chat.title}) membership: {status}")
+            return True
+        except Exception as e:
+            logger.error(f"Error updating chat membership: {e}")
+            return False
+
+    async def mark_inactive(self, chat_ids: Iterable[int], reason: str) -> int:
+        """Mark chats the bot can no longer post in"""
+        chat_ids = list(chat_ids)
+        if not chat_ids:
+            return 0
+
+        try:
+            result = await self.chats_collection.update_many(
+                {"chat_id": {"$in": chat_ids}},
+                {"$set": {"is_active": False, "status": reason, "updated_at": datetime.utcnow()}}
+            )
+            return result.modified_count
+        except Exception as e:
+            logger.error(f"Error marking chats inactive: {e}")
+            return 0
+
+    async def get_stats(self) -> dict:
+        """Count chats by type and activity"""
+        stats = {"active": 0, "inactive": 0, "types": {}}
+
+        pipeline = [{"$group": {"_id": {"type": "$type", "active": "$is_active"}, "count": {"$sum": 1}}}]
+        async for row in self.chats_collection.aggregate(pipeline):
+            if row["_id"].get("active"):
+                stats["active"] += row["count"]
+                chat_type = row["_id"].get("type") or "unknown"
+                stats["types"][chat_type] = stats["types"].get(chat_type, 0) + row["count"]
+            else:
+                stats["inactive"] += row["count"]
+
+        return stats
+
+    async def get_recent_chats(self, limit: int = 10) -> List[dict]:
+        """Get the most recently joined active chats"""
+        return await self.chats_collection.find({"is_active": True}).sort("joined_at", -1).limit(limit).to_list(length=limit)
+
+    async def get_user_connections(self, user_id: int, limit: int = 50) -> List[dict]:
+        """Get active chats a user added the bot to"""
+        return await self.chats_collection.find(
+            {"added_by": user_id, "is_active": True}
+        ).limit(limit).to_list(length=limit)
@@ -0,0 +1,146 @@
+"""
+Worker client pool for Phoenix Filter Bot
+Extra bot sessions share media transfer load so one session's bandwidth
+cap or FloodWait doesn't stall the main bot's interactive replies.
+"""
+
+import logging
+import time
+from contextlib import asynccontextmanager
+from typing import AsyncIterator, Dict, List, Optional
+from pyrogram import Client
+from pyrogram.errors import FloodWait
+from config import API_ID, API_HASH, METRICS_ENABLED, WORKER_BOT_TOKENS
+from utils.cache import TTLCache
+from utils.metrics import instrument_api
+from utils.rate_limiter import get_wait_seconds
+
+logger = logging.getLogger(__name__)
+
+UNREACHABLE_PEER_TTL = 24 * 3600
+
+
+def client_name(client: Client) -> str:
+    """Session name of a client (Pyrogram 1.x calls it session_name)"""
+    return getattr(client, "name", None) or client.session_name
+
+
+class ClientPool:
+    """
+    Least-loaded selection over worker sessions
+    The main client is only used when no worker is available. Bots can only
+    message users who started them, so sends to a user go through a worker
+    only once it is known to reach them, or while the main client is
+    flood-waiting.
+    """
+
+    def __init__(self, main_client: Client, tokens: List[str] = WORKER_BOT_TOKENS):
+        self.main_client = main_client
+        self.tokens = tokens
+        self.workers: List[Client] = []
+        self._active: Dict[str, int] = {}
+        self._requests: Dict[str, int] = {}
+        self._flood_until: Dict[str, float] = {}
+        # (worker, chat) pairs a send failed or succeeded for
+        self._unreachable = TTLCache(maxsize=100000, ttl=UNREACHABLE_PEER_TTL)
+        self._reachable = TTLCache(maxsize=100000, ttl=UNREACHABLE_PEER_TTL)
+
+    async def start(self):
+        """Log in the worker sessions; failing tokens are skipped"""
+        if self.workers:
+            return
+        for index, token in enumerate(self.tokens, start=1):
+            worker = Client(
+                f"phoenix_worker_{index}",
+                api_id=API_ID,
+                api_hash=API_HASH,
+                bot_token=token,
+                sleep_threshold=0,
+                no_updates=True,
+            )
+            if METRICS_ENABLED:
+                instrument_api(worker)
+            try:
+                await worker.start()
+            except Exception as e:
+                logger.error(f"Worker session {index} failed to start: {e}")
+                continue
+            self.workers.append(worker)
+
+        if self.workers:
+            logger.info(f"✅ Started {len(self.workers)} worker session(s)")
+
+    async def stop(self):
+        """Log out the worker sessions"""
+        for worker in self.workers:
+            try:
+                await worker.stop()
+            except Exception as e:
+                logger.warning(f"Error stopping {client_name(worker)}: {e}")
+        self.workers = []
+
+    def pick(self, peer_id: Optional[int] = None) -> Client:
+        """
+        Choose the least busy worker that isn't flood-waiting
+
+        Args:
+            peer_id: Chat the client has to send to, if any
+        """
+        now = time.monotonic()
+        candidates = [worker for worker in self.workers if self._flood_until.get(client_name(worker), 0) <= now]
+        if peer_id is not None:
+            reached = [worker for worker in candidates if self._reachable.get((client_name(worker), peer_id))]
+            if reached:
+                candidates = reached
+            elif self._flood_until.get(client_name(self.main_client), 0) <= now:
+                # Trying a worker the user may never have started costs a round trip
+                return self.main_client
+            else:
+                candidates = [
+                    worker for worker in candidates
+                    if self._unreachable.get((client_name(worker), peer_id)) is None
+                ]
+        if not candidates:
+            return self.main_client
+        return min(candidates, key=lambda worker: self._active.get(client_name(worker), 0))
+
+    @asynccontextmanager
+    async def acquire(self, peer_id: Optional[int] = None) -> AsyncIterator[Client]:
+        """Borrow a client for one request, tracking load and FloodWaits"""
+        client = self.pick(peer_id)
+        name = client_name(client)
+        self._active[name] = self._active.get(name, 0) + 1
+        self._requests[name] = self._requests.get(name, 0) + 1
+        try:
+            yield client
+        except FloodWait as e:
+            # Route around this session until the wait is over
+            wait = get_wait_seconds(e)
+            self._flood_until[name] = time.monotonic() + wait
+            logger.warning(f"{name} flood-waiting {wait}s")
+            raise
+        finally:
+            self._active[name] -= 1
+
+    def mark_unreachable(self, client: Client, peer_id: int):
+        """Remember that a worker cannot message this chat"""
+        self._reachable.pop((client_name(client), peer_id))
+        self._unreachable.set((client_name(client), peer_id), True)
+
+    def mark_reachable(self, client: Client, peer_id: int):
+        """Remember that a worker can message this chat"""
+        if client is not self.main_client:
+            self._reachable.set((client_name(client), peer_id), True)
+
+    def get_metrics(self) -> dict:
+        """Per-session load"""
+        now = time.monotonic()
+        metrics = {}
+        for client in [self.main_client, *self.workers]:
+            name = client_name(client)
+            metrics[name] = {
+                "active": self._active.get(name, 0),
+                "requests": self._requests.get(name, 0),
+                "flood_wait": max(0.0, self._flood_until.get(name, 0) - now),
+            }
+        return metrics
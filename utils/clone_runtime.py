@@ -0,0 +1,323 @@
+"""
+Clone runtime for Phoenix Filter Bot
+Runs every active cloned bot as a lightweight client in the main event loop.
+Clones reuse the main bot's handlers, database and caches; idle clones are
+disconnected and reconnected when Telegram holds updates for them.
+
+Pyrogram only asks for the current update state when it connects, so a
+clone's update state is saved when it goes to sleep and the updates it
+missed are fetched with updates.GetDifference and dispatched on wake.
+"""
+
+import asyncio
+import logging
+import os
+import time
+from typing import Callable, Dict, Optional
+import aiohttp
+from motor.motor_asyncio import AsyncIOMotorDatabase
+from pyrogram import Client, raw
+from pyrogram.errors import AccessTokenExpired, AccessTokenInvalid, AuthKeyUnregistered, UserDeactivated
+from pyrogram.handlers import RawUpdateHandler
+from config import (
+    API_ID,
+    API_HASH,
+    CLONE_SESSION_DIR,
+    CLONE_MAX_ACTIVE,
+    CLONE_IDLE_MINUTES,
+    CLONE_WAKE_INTERVAL,
+    CLONE_CLIENT_WORKERS,
+    METRICS_ENABLED,
+)
+from utils.metrics import instrument_api
+from utils.tenants import TenantContext, is_main_only
+
+logger = logging.getLogger(__name__)
+
+DEAD_TOKEN_ERRORS = (AccessTokenExpired, AccessTokenInvalid, AuthKeyUnregistered, UserDeactivated)
+WAKE_CHECK_CONCURRENCY = 20
+ACTIVITY_GROUP = -1000
+# GetDifference pages fetched on wake at most; each holds up to a few hundred updates
+CATCH_UP_MAX_SLICES = 10
+
+
+class CloneRuntime:
+    """Start, evict and lazily restart clone clients"""
+
+    def __init__(self, main_client: Client, db: AsyncIOMotorDatabase):
+        self.main_client = main_client
+        self.db = db
+        self.clones: Dict[str, dict] = {}
+        self.clients: Dict[str, Client] = {}
+        self._last_active: Dict[str, float] = {}
+        self._locks: Dict[str, asyncio.Lock] = {}
+        self._task: Optional[asyncio.Task] = None
+        self._http: Optional[aiohttp.ClientSession] = None
+        self._owner: Callable[[str], bool] = lambda clone_id: True
+
+    def set_owner(self, owner: Callable[[str], bool]):
+        """Restrict this runtime to the clones a predicate accepts (used by shards)"""
+        self._owner = owner
+
+    def owns(self, clone_id: str) -> bool:
+        """Whether this process is responsible for a clone"""
+        return self._owner(clone_id)
+
+    async def start(self):
+        """Load active clones (asleep) and start the wake/evict loop"""
+        os.makedirs(CLONE_SESSION_DIR, exist_ok=True)
+        self._http = aiohttp.ClientSession(timeout=aiohttp.ClientTimeout(total=10))
+
+        await self._load_owned()
+
+        # Clones start asleep; the first wake check connects those with pending updates
+        self._task = asyncio.create_task(self._run())
+        logger.info(f"✅ Clone runtime managing {len(self.clones)} clone(s)")
+
+    async def _load_owned(self):
+        """Register active clones this process owns (asleep)"""
+        async for clone in self.db.cloned_bots.find({"status": "active"}):
+            if clone["clone_id"] not in self.clones and self.owns(clone["clone_id"]):
+                self.clones[clone["clone_id"]] = clone
+
+    async def rebalance(self):
+        """Drop clones that moved to another shard and pick up new ones"""
+        for clone_id in [clone_id for clone_id in self.clones if not self.owns(clone_id)]:
+            await self.remove_clone(clone_id)
+        await self._load_owned()
+
+    async def add_clone(self, clone: dict) -> bool:
+        """
+        Register a new clone and connect it
+
+        Returns:
+            False if Telegram rejected the token
+        """
+        self.clones[clone["clone_id"]] = clone
+        await self.wake(clone["clone_id"])
+        return clone["clone_id"] in self.clones
+
+    async def remove_clone(self, clone_id: str):
+        """Disconnect a clone and forget it"""
+        await self.sleep(clone_id)
+        self.clones.pop(clone_id, None)
+        self._locks.pop(clone_id, None)
+
+    async def wake(self, clone_id: str) -> Optional[Client]:
+        """Connect a sleeping clone, sharing the main bot's handlers"""
+        async with self._lock(clone_id):
+            if clone_id in self.clients:
+                return self.clients[clone_id]
+            clone = self.clones.get(clone_id)
+            if clone is None:
+                return None
+
+            if len(self.clients) >= CLONE_MAX_ACTIVE:
+                await self._evict_least_recent()
+
+            client = Client(
+                f"clone_{clone_id}",
+                api_id=API_ID,
+                api_hash=API_HASH,
+                bot_token=clone["bot_token"],
+                workdir=CLONE_SESSION_DIR,
+                workers=CLONE_CLIENT_WORKERS,
+                sleep_threshold=0,
+            )
+            client.tenant = TenantContext.from_clone(clone)
+            if METRICS_ENABLED:
+                instrument_api(client)
+            self._share_handlers(client, clone_id)
+
+            try:
+                await client.start()
+            except DEAD_TOKEN_ERRORS as e:
+                logger.warning(f"Clone {clone_id} token rejected: {e}")
+                self.clones.pop(clone_id, None)
+                await self.db.cloned_bots.update_one({"clone_id": clone_id}, {"$set": {"status": "invalid_token"}})
+                return None
+            except Exception as e:
+                logger.error(f"Error starting clone {clone_id}: {e}")
+                return None
+
+            self.clients[clone_id] = client
+            self._last_active[clone_id] = time.monotonic()
+            try:
+                missed = await self._catch_up(clone_id, client)
+                await self._save_update_state(clone_id, client)
+            except Exception as e:
+                missed = 0
+                logger.warning(f"Could not catch up clone {clone_id}: {e}")
+            # Everything queued for the Bot API arrived (or will) over MTProto
+            await self._acknowledge_pending(clone["bot_token"])
+            logger.info(f"🤖 Clone {clone_id} connected ({len(self.clients)} active, {missed} missed update(s))")
+            return client
+
+    async def sleep(self, clone_id: str):
+        """Disconnect a clone but keep it registered"""
+        async with self._lock(clone_id):
+            client = self.clients.pop(clone_id, None)
+            self._last_active.pop(clone_id, None)
+            if client is None:
+                return
+            try:
+                await self._save_update_state(clone_id, client)
+            except Exception as e:
+                logger.warning(f"Could not save the update state of clone {clone_id}: {e}")
+            await self._acknowledge_pending(self.clones.get(clone_id, {}).get("bot_token"))
+            try:
+                await client.stop()
+            except Exception as e:
+                logger.warning(f"Error stopping clone {clone_id}: {e}")
+
+    async def _save_update_state(self, clone_id: str, client: Client):
+        """Remember where a clone's updates stand, to catch up from there on the next wake"""
+        state = await client.send(raw.functions.updates.GetState())
+        update_state = {"pts": state.pts, "qts": state.qts, "date": state.date}
+        clone = self.clones.get(clone_id)
+        if clone is not None:
+            clone["update_state"] = update_state
+        await self.db.cloned_bots.update_one({"clone_id": clone_id}, {"$set": {"update_state": update_state}})
+
+    async def _catch_up(self, clone_id: str, client: Client) -> int:
+        """
+        Dispatch the updates a clone missed while asleep
+
+        Clones that never saved an update state (connected for the first
+        time) have nothing to catch up on.
+
+        Returns:
+            Number of updates dispatched
+        """
+        state = (self.clones.get(clone_id) or {}).get("update_state")
+        if not state:
+            return 0
+        pts, qts, date = state["pts"], state["qts"], state["date"]
+
+        dispatched = 0
+        for _ in range(CATCH_UP_MAX_SLICES):
+            diff = await client.send(raw.functions.updates.GetDifference(pts=pts, date=date, qts=qts))
+            if isinstance(diff, raw.types.updates.DifferenceEmpty):
+                break
+            if isinstance(diff, raw.types.updates.DifferenceTooLong):
+                logger.warning(f"Clone {clone_id} slept too long to catch up on missed updates")
+                break
+
+            await client.fetch_peers(diff.users)
+            await client.fetch_peers(diff.chats)
+            users = {user.id: user for user in diff.users}
+            chats = {chat.id: chat for chat in diff.chats}
+            for message in diff.new_messages:
+                update = raw.types.UpdateNewMessage(message=message, pts=pts, pts_count=0)
+                client.dispatcher.updates_queue.put_nowait((update, users, chats))
+            for update in diff.other_updates:
+                client.dispatcher.updates_queue.put_nowait((update, users, chats))
+            dispatched += len(diff.new_messages) + len(diff.other_updates)
+
+            if isinstance(diff, raw.types.updates.Difference):
+                break
+            # DifferenceSlice: more to fetch from the intermediate state
+            state = diff.intermediate_state
+            pts, qts, date = state.pts, state.qts, state.date
+        return dispatched
+
+    async def _acknowledge_pending(self, bot_token: Optional[str]):
+        """
+        Confirm the updates the Bot API queued for a clone
+
+        The queue only serves as the wake signal; left unconfirmed, it
+        would wake an evicted clone again on the next check.
+        """
+        if not bot_token or not self._http:
+            return
+        url = f"https://api.telegram.org/bot{bot_token}/getUpdates"
+        try:
+            async with self._http.get(url, params={"offset": -1, "limit": 1, "timeout": 0}) as resp:
+                latest = (await resp.json()).get("result") or []
+            if latest:
+                # Asking for the updates after the latest one confirms everything up to it
+                async with self._http.get(
+                    url, params={"offset": latest[-1]["update_id"] + 1, "limit": 1, "timeout": 0}
+                ) as resp:
+                    await resp.read()
+        except Exception as e:
+            logger.debug(f"Could not acknowledge pending updates: {e}")
+
+    def _lock(self, clone_id: str) -> asyncio.Lock:
+        lock = self._locks.get(clone_id)
+        if lock is None:
+            lock = self._locks[clone_id] = asyncio.Lock()
+        return lock
+
+    def _share_handlers(self, client: Client, clone_id: str):
+        """Register the main bot's handler objects on a clone client"""
+        for group, handlers in self.main_client.dispatcher.groups.items():
+            for handler in handlers:
+                if not is_main_only(handler.callback):
+                    client.add_handler(handler, group)
+
+        async def touch(_client, _update, _users, _chats):
+            self._last_active[clone_id] = time.monotonic()
+
+        client.add_handler(RawUpdateHandler(touch), ACTIVITY_GROUP)
+
+    async def _evict_least_recent(self):
+        # Nothing connected to make room from
+        if not self._last_active:
+            return
+        clone_id = min(self._last_active, key=self._last_active.get)
+        logger.info(f"Clone {clone_id} evicted to make room")
+        await self.sleep(clone_id)
+
+    async def _evict_idle(self):
+        cutoff = time.monotonic() - CLONE_IDLE_MINUTES * 60
+        for clone_id in [cid for cid, last in self._last_active.items() if last < cutoff]:
+            await self.sleep(clone_id)
+
+    async def _pending_updates(self, bot_token: str) -> int:
+        """Updates Telegram is holding for a bot, via the Bot API (no MTProto session needed)"""
+        try:
+            async with self._http.get(f"https://api.telegram.org/bot{bot_token}/getWebhookInfo") as resp:
+                data = await resp.json()
+        except Exception as e:
+            logger.debug(f"Wake check failed: {e}")
+            return 0
+        return data.get("result", {}).get("pending_update_count", 0) if data.get("ok") else 0
+
+    async def _wake_pending(self):
+        """Connect sleeping clones that have users waiting"""
+        semaphore = asyncio.Semaphore(WAKE_CHECK_CONCURRENCY)
+
+        async def check(clone_id: str, clone: dict):
+            async with semaphore:
+                if await self._pending_updates(clone["bot_token"]):
+                    await self.wake(clone_id)
+
+        await asyncio.gather(
+            *(check(clone_id, clone) for clone_id, clone in list(self.clones.items()) if clone_id not in self.clients),
+            return_exceptions=True,
+        )
+
+    async def _run(self):
+        while True:
+            await asyncio.sleep(CLONE_WAKE_INTERVAL)
+            try:
+                await self._evict_idle()
+                await self._wake_pending()
+            except Exception as e:
+                logger.error(f"Clone runtime loop error: {e}")
+
+    def get_stats(self) -> dict:
+        """Connected and sleeping clone counts"""
+        return {"active": len(self.clients), "sleeping": len(self.clones) - len(self.clients)}
+
+    async def shutdown(self):
+        """Disconnect every clone"""
+        if self._task:
+            self._task.cancel()
+            await asyncio.gather(self._task, return_exceptions=True)
+            self._task = None
+        for clone_id in list(self.clients):
+            await self.sleep(clone_id)
+        if self._http:
+            await self._http.close()
@@ -0,0 +1,309 @@
+"""
+Clone sharding for Phoenix Filter Bot
+A supervisor spreads cloned bots over worker processes by consistent
+hashing of clone_id; each worker runs a CloneRuntime for its share.
+"""
+
+import asyncio
+import bisect
+import hashlib
+import itertools
+import logging
+import multiprocessing
+import resource
+import time
+from typing import Dict, List, Optional
+from config import CLONE_WAKE_INTERVAL, METRICS_PORT
+
+logger = logging.getLogger(__name__)
+
+RING_REPLICAS = 64
+SHARD_CHECK_INTERVAL = 5
+RESTART_BACKOFF_MAX = 60
+ADD_CLONE_TIMEOUT = 60
+
+
+class HashRing:
+    """Consistent hash ring mapping keys to shard IDs"""
+
+    def __init__(self, nodes: Optional[List[int]] = None, replicas: int = RING_REPLICAS):
+        self.replicas = replicas
+        self.nodes: List[int] = []
+        self._keys: List[int] = []
+        self._owners: List[int] = []
+        self.set_nodes(nodes or [])
+
+    @staticmethod
+    def _hash(value: str) -> int:
+        return int.from_bytes(hashlib.md5(value.encode()).digest()[:8], "big")
+
+    def set_nodes(self, nodes: List[int]):
+        """Rebuild the ring; keys only move to or from changed nodes"""
+        self.nodes = sorted(nodes)
+        points = sorted(
+            (self._hash(f"shard-{node}-{replica}"), node)
+            for node in self.nodes
+            for replica in range(self.replicas)
+        )
+        self._keys = [point for point, _ in points]
+        self._owners = [node for _, node in points]
+
+    def node_for(self, key: str) -> Optional[int]:
+        """Shard owning a key, or None for an empty ring"""
+        if not self._keys:
+            return None
+        index = bisect.bisect(self._keys, self._hash(key)) % len(self._keys)
+        return self._owners[index]
+
+
+def _watch(conn) -> asyncio.Queue:
+    """
+    Feed messages from a pipe into a queue without blocking a thread
+
+    None is queued when the other end closes.
+    """
+    loop = asyncio.get_running_loop()
+    queue: asyncio.Queue = asyncio.Queue()
+
+    def on_readable():
+        try:
+            while conn.poll():
+                queue.put_nowait(conn.recv())
+        except (EOFError, OSError):
+            loop.remove_reader(conn.fileno())
+            queue.put_nowait(None)
+
+    loop.add_reader(conn.fileno(), on_readable)
+    return queue
+
+
+def run_shard(shard_id: int, conn):
+    """Worker process entry point"""
+    asyncio.run(_run_shard(shard_id, conn))
+
+
+async def _run_shard(shard_id: int, conn):
+    # Imported here: the worker builds the same handlers as the main bot
+    from bot import PhoenixFilterBot
+
+    ring = HashRing()
+    bot = PhoenixFilterBot(clone_shard=shard_id)
+    await bot.initialize()
+    await bot.start_metrics_server(METRICS_PORT + 1 + shard_id)
+    runtime = bot.clone_runtime
+    runtime.set_owner(lambda clone_id: ring.node_for(clone_id) == shard_id)
+    await runtime.start()
+
+    async def report():
+        while True:
+            stats = runtime.get_stats()
+            stats["peak_rss_mb"] = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+            conn.send(("stats", stats))
+            await asyncio.sleep(CLONE_WAKE_INTERVAL)
+
+    reporter = asyncio.create_task(report())
+    inbox = _watch(conn)
+    try:
+        while True:
+            message = await inbox.get()
+            if message is None:
+                # Supervisor went away
+                break
+            kind = message[0]
+            if kind == "ring":
+                ring.set_nodes(message[1])
+                await runtime.rebalance()
+            elif kind == "add":
+                _, request_id, clone = message
+                conn.send(("added", request_id, await runtime.add_clone(clone)))
+            elif kind == "remove":
+                await runtime.remove_clone(message[1])
+            elif kind == "stop":
+                break
+    finally:
+        reporter.cancel()
+        await bot.stop()
+
+
+class CloneSupervisor:
+    """
+    Run clones across worker processes
+    Exposes the same add/remove/stats interface as CloneRuntime.
+    """
+
+    def __init__(self, shard_count: int):
+        self.shard_count = shard_count
+        self.ring = HashRing()
+        self.shards: Dict[int, dict] = {}
+        self._context = multiprocessing.get_context("spawn")
+        self._requests = itertools.count()
+        self._pending: Dict[int, asyncio.Future] = {}
+        self._task: Optional[asyncio.Task] = None
+
+    async def start(self):
+        """Spawn the shard processes and start watching them"""
+        for shard_id in range(self.shard_count):
+            self._spawn(shard_id)
+        self._publish_ring()
+        self._task = asyncio.create_task(self._monitor())
+        logger.info(f"✅ Clone supervisor started {self.shard_count} shard(s)")
+
+    def _spawn(self, shard_id: int):
+        parent_conn, child_conn = self._context.Pipe()
+        process = self._context.Process(
+            target=run_shard,
+            args=(shard_id, child_conn),
+            name=f"clone-shard-{shard_id}",
+            daemon=True,
+        )
+        process.start()
+        child_conn.close()
+
+        shard = self.shards.setdefault(shard_id, {"restarts": 0, "stats": {}})
+        shard.update(process=process, conn=parent_conn, alive=True, started=time.time(), retry_at=None)
+        shard["reader"] = asyncio.create_task(self._read(shard_id, parent_conn))
+
+    async def _read(self, shard_id: int, conn):
+        """Collect stats and replies from a shard"""
+        inbox = _watch(conn)
+        while True:
+            message = await inbox.get()
+            if message is None:
+                return
+            if message[0] == "stats":
+                self.shards[shard_id]["stats"] = message[1]
+            elif message[0] == "added":
+                future = self._pending.pop(message[1], None)
+                if future and not future.done():
+                    future.set_result(message[2])
+
+    def _send(self, shard_id: int, message: tuple) -> bool:
+        shard = self.shards.get(shard_id)
+        if not shard or not shard["alive"]:
+            return False
+        try:
+            shard["conn"].send(message)
+            return True
+        except (BrokenPipeError, OSError):
+            return False
+
+    def _publish_ring(self):
+        """Point the ring at the live shards and tell each one"""
+        nodes = [shard_id for shard_id, shard in self.shards.items() if shard["alive"]]
+        self.ring.set_nodes(nodes)
+        for shard_id in nodes:
+            self._send(shard_id, ("ring", nodes))
+
+    async def _monitor(self):
+        """Reassign a crashed shard's clones and restart it with backoff"""
+        while True:
+            await asyncio.sleep(SHARD_CHECK_INTERVAL)
+            changed = False
+            now = time.time()
+
+            for shard_id, shard in list(self.shards.items()):
+                if shard["alive"] and not shard["process"].is_alive():
+                    shard["alive"] = False
+                    shard["stats"] = {}
+                    self._close_conn(shard)
+                    shard["restarts"] += 1
+                    backoff = min(RESTART_BACKOFF_MAX, 2 ** shard["restarts"])
+                    shard["retry_at"] = now + backoff
+                    logger.error(
+                        f"Clone shard {shard_id} died (exit code {shard['process'].exitcode}); "
+                        f"restarting in {backoff}s"
+                    )
+                    changed = True
+                elif not shard["alive"] and shard["retry_at"] and now >= shard["retry_at"]:
+                    self._spawn(shard_id)
+                    changed = True
+
+            if changed:
+                self._publish_ring()
+
+    async def scale(self, shard_count: int):
+        """Add or remove shards; only the clones that change owner move"""
+        for shard_id in range(self.shard_count, shard_count):
+            self._spawn(shard_id)
+        for shard_id in range(shard_count, self.shard_count):
+            await self._stop_shard(shard_id)
+        self.shard_count = shard_count
+        self._publish_ring()
+
+    async def _stop_shard(self, shard_id: int):
+        shard = self.shards.pop(shard_id, None)
+        if not shard:
+            return
+        shard["alive"] = False
+        try:
+            shard["conn"].send(("stop",))
+        except (BrokenPipeError, OSError):
+            pass
+        await asyncio.get_running_loop().run_in_executor(None, shard["process"].join, 30)
+        if shard["process"].is_alive():
+            shard["process"].terminate()
+        self._close_conn(shard)
+
+    @staticmethod
+    def _close_conn(shard: dict):
+        shard["reader"].cancel()
+        try:
+            asyncio.get_running_loop().remove_reader(shard["conn"].fileno())
+        except (OSError, ValueError):
+            pass
+        shard["conn"].close()
+
+    async def add_clone(self, clone: dict) -> Optional[bool]:
+        """
+        Hand a new clone to its shard and wait for it to connect
+
+        Returns:
+            False if Telegram rejected the token, None if no shard answered
+            in time (the shard checks the token once it gets the clone)
+        """
+        shard_id = self.ring.node_for(clone["clone_id"])
+        request_id = next(self._requests)
+        future = asyncio.get_running_loop().create_future()
+        self._pending[request_id] = future
+
+        if shard_id is None or not self._send(shard_id, ("add", request_id, clone)):
+            # No live shard; it is picked up from the database on the next rebalance
+            self._pending.pop(request_id, None)
+            return None
+        try:
+            return await asyncio.wait_for(future, ADD_CLONE_TIMEOUT)
+        except asyncio.TimeoutError:
+            self._pending.pop(request_id, None)
+            return None
+
+    async def remove_clone(self, clone_id: str):
+        shard_id = self.ring.node_for(clone_id)
+        if shard_id is not None:
+            self._send(shard_id, ("remove", clone_id))
+
+    def get_stats(self) -> dict:
+        """Totals plus per-shard load"""
+        shards = {}
+        for shard_id, shard in sorted(self.shards.items()):
+            stats = shard["stats"]
+            shards[shard_id] = {
+                "alive": shard["alive"],
+                "pid": shard["process"].pid,
+                "restarts": shard["restarts"],
+                "active": stats.get("active", 0),
+                "sleeping": stats.get("sleeping", 0),
+                "peak_rss_mb": stats.get("peak_rss_mb", 0),
+            }
+        return {
+            "active": sum(shard["active"] for shard in shards.values()),
+            "sleeping": sum(shard["sleeping"] for shard in shards.values()),
+            "shards": shards,
+        }
+
+    async def shutdown(self):
+        """Stop every shard"""
+        if self._task:
+            self._task.cancel()
+            await asyncio.gather(self._task, return_exceptions=True)
+            self._task = None
+        await asyncio.gather(*(self._stop_shard(shard_id) for shard_id in list(self.shards)))
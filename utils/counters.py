@@ -0,0 +1,161 @@
+"""
+Write-behind counters for Phoenix Filter Bot
+Accumulates download counts in memory and flushes them as one bulk write
+"""
+
+import asyncio
+import logging
+import secrets
+from datetime import datetime
+from typing import Dict, Optional
+from motor.motor_asyncio import AsyncIOMotorCollection
+from pymongo import UpdateOne
+from pymongo.errors import BulkWriteError
+from config import DOWNLOAD_FLUSH_INTERVAL
+from utils.ranking import POPULARITY_DECAY
+
+logger = logging.getLogger(__name__)
+
+# Flushes remembered per file; a flush is retried at the next one, well within this
+FLUSH_ID_HISTORY = 10
+
+
+def increment_pipeline(count: int, now: datetime, flush_id: Optional[str] = None) -> list:
+    """
+    Update pipeline adding count to download_count and to popularity
+    
+    popularity is the download count with older downloads decayed by
+    POPULARITY_DECAY, brought up to date at popularity_at; search ranking
+    decays it the rest of the way to the time of the query.
+    
+    With a flush_id, the ID is appended to the document's last
+    FLUSH_ID_HISTORY flush_ids so a retry of the same flush can skip it.
+    """
+    # Files without popularity yet start from download_count aged since indexing,
+    # as decayed_popularity assumes for them
+    since = {"$ifNull": ["$popularity_at", {"$ifNull": ["$indexed_at", now]}]}
+    previous = {"$ifNull": ["$popularity", {"$ifNull": ["$download_count", 0]}]}
+    elapsed = {"$divide": [{"$subtract": [now, since]}, 1000]}
+    decay = {"$exp": {"$multiply": [-POPULARITY_DECAY, {"$max": [0, elapsed]}]}}
+    update = {
+        "download_count": {"$add": [{"$ifNull": ["$download_count", 0]}, count]},
+        "popularity": {"$add": [{"$multiply": [previous, decay]}, count]},
+        "popularity_at": now,
+    }
+    if flush_id is not None:
+        update["flush_ids"] = {
+            "$slice": [{"$concatArrays": [{"$ifNull": ["$flush_ids", []]}, [flush_id]]}, -FLUSH_ID_HISTORY]
+        }
+    return [{"$set": update}]
+
+
+class DownloadCounter:
+    """
+    Buffered download_count increments keyed by file_id
+    
+    A flush that fails without saying which writes were applied (a network
+    error, for instance) is retried under the same flush ID, and files that
+    already carry that ID are skipped, so counts are neither lost nor added
+    twice. Increments still in memory are lost if the process dies.
+    """
+
+    def __init__(self, collection: AsyncIOMotorCollection, flush_interval: float = DOWNLOAD_FLUSH_INTERVAL):
+        self.collection = collection
+        self.flush_interval = flush_interval
+        self._pending: Dict[str, int] = {}
+        self._inflight: Dict[str, int] = {}
+        # Flushes whose outcome is unknown, by flush ID
+        self._unconfirmed: Dict[str, Dict[str, int]] = {}
+        self._task: Optional[asyncio.Task] = None
+        self._flush_lock = asyncio.Lock()
+
+    def increment(self, file_id: str, amount: int = 1):
+        """Record downloads; written to the database on the next flush"""
+        if not file_id:
+            return
+        self._pending[file_id] = self._pending.get(file_id, 0) + amount
+        if self._task is None:
+            self._task = asyncio.create_task(self._flush_loop())
+
+    def pending(self, file_id: str) -> int:
+        """Increments not yet visible in the database"""
+        unconfirmed = sum(counts.get(file_id, 0) for counts in self._unconfirmed.values())
+        return self._pending.get(file_id, 0) + self._inflight.get(file_id, 0) + unconfirmed
+
+    def merge(self, file_doc: dict) -> dict:
+        """
+        A file document with pending increments added to its download_count
+
+        Returns a copy when there are any, so documents held in caches are
+        never counted twice.
+        """
+        extra = self.pending(file_doc.get("file_id"))
+        if extra:
+            return {**file_doc, "download_count": file_doc.get("download_count", 0) + extra}
+        return file_doc
+
+    async def flush(self) -> int:
+        """
+        Retry unconfirmed flushes, then write all pending increments as a
+        single unordered bulk_write
+
+        Returns:
+            Number of files updated
+        """
+        async with self._flush_lock:
+            batches = list(self._unconfirmed.items())
+            self._unconfirmed = {}
+            if self._pending:
+                batches.append((secrets.token_hex(8), self._pending))
+                self._pending = {}
+
+            updated = 0
+            try:
+                for flush_id, counts in batches:
+                    self._inflight = counts
+                    updated += await self._write(flush_id, counts)
+            finally:
+                self._inflight = {}
+            return updated
+
+    async def _write(self, flush_id: str, counts: Dict[str, int]) -> int:
+        """Write one flush; documents that already carry flush_id are left alone"""
+        items = list(counts.items())
+        now = datetime.utcnow()
+        operations = [
+            UpdateOne({"file_id": file_id, "flush_ids": {"$ne": flush_id}}, increment_pipeline(count, now, flush_id))
+            for file_id, count in items
+        ]
+
+        try:
+            await self.collection.bulk_write(operations, ordered=False)
+            return len(operations)
+        except BulkWriteError as e:
+            # Unordered: everything except the reported failures was applied
+            failed = {error["index"] for error in e.details.get("writeErrors", [])}
+            logger.error(f"Error flushing {len(failed)} download counts: {e}")
+            self._requeue(items[i] for i in failed)
+            return len(operations) - len(failed)
+        except Exception as e:
+            # Some writes may have been applied; retry them all under the same ID
+            logger.error(f"Error flushing download counts: {e}")
+            self._unconfirmed[flush_id] = counts
+            return 0
+
+    def _requeue(self, items):
+        """Put counts back so the next flush retries them"""
+        for file_id, count in items:
+            self._pending[file_id] = self._pending.get(file_id, 0) + count
+
+    async def _flush_loop(self):
+        while True:
+            await asyncio.sleep(self.flush_interval)
+            await self.flush()
+
+    async def close(self):
+        """Stop the flush loop and write whatever is left"""
+        if self._task:
+            self._task.cancel()
+            await asyncio.gather(self._task, return_exceptions=True)
+            self._task = None
+        await self.flush()
@@ -0,0 +1,385 @@
+"""
+File delivery engine for Phoenix Filter Bot
+Sends indexed files to users by copying the source channel message or
+re-sending the cached file_id, so nothing is ever re-uploaded. Sends are
+scheduled fairly so one user cannot monopolise the send capacity.
+"""
+
+import asyncio
+import logging
+import time
+from collections import deque
+from typing import Awaitable, Callable, Dict, Optional, Tuple
+from bson import ObjectId
+from bson.errors import InvalidId
+from motor.motor_asyncio import AsyncIOMotorDatabase
+from pyrogram import Client
+from pyrogram.errors import FloodWait, PeerIdInvalid, RPCError, UserIsBlocked
+from config import DELIVERY_WORKERS, DELIVERY_PREMIUM_WEIGHT, DELIVERY_MAX_PENDING
+from utils.cache import TTLCache
+from utils.client_pool import ClientPool
+from utils.premium_benefits import PremiumBenefits
+from utils.reachability import UNREACHABLE_REASONS, classify_send_error, mark_unreachable
+from utils.search import SearchEngine
+from utils.tenants import MAIN_TENANT, TenantContext, get_tenant
+
+logger = logging.getLogger(__name__)
+
+FILE_CACHE_SIZE = 5000
+FILE_CACHE_TTL = 300
+TIER_CACHE_TTL = 60
+# Users a send just failed for, so their next click gets an alert instead of a failed send
+UNREACHABLE_CACHE_TTL = 60
+
+NOT_STARTED = "❌ I can't message you. Please start me in private (or unblock me) and try again."
+
+
+class DeliveryQueueFull(Exception):
+    """Raised when a user already has too many deliveries waiting"""
+
+
+class DeliveryScheduler:
+    """
+    Fair scheduler for file sends
+    Each user is capped at their tier's concurrent_downloads; across users,
+    the premium and free queues are served by weighted round robin.
+    """
+
+    def __init__(self, workers: int = DELIVERY_WORKERS, premium_weight: int = DELIVERY_PREMIUM_WEIGHT):
+        self.workers = workers
+        self.premium_weight = premium_weight
+        self._queues: Dict[str, deque] = {"premium": deque(), "free": deque()}
+        self._users: Dict[int, dict] = {}
+        self._ready: Optional[asyncio.Event] = None
+        self._worker_tasks = []
+        self._premium_streak = 0
+        self._active = 0
+        self.stats = {"completed": 0, "failed": 0, "wait_total": 0.0, "wait_max": 0.0}
+
+    def _ensure_workers(self):
+        """Start workers on first use, inside the running event loop"""
+        if self._worker_tasks:
+            return
+        self._ready = asyncio.Event()
+        self._worker_tasks = [asyncio.create_task(self._worker()) for _ in range(self.workers)]
+
+    def would_wait(self, user_id: int, is_premium: bool) -> bool:
+        """Whether a new request from this user would have to queue"""
+        limit = PremiumBenefits.get_limits(is_premium)["concurrent_downloads"]
+        state = self._users.get(user_id)
+        if state and state["pending"] >= limit:
+            return True
+        return self._active >= self.workers or any(self._queues.values())
+
+    def submit(self, user_id: int, is_premium: bool, send: Callable[[], Awaitable]) -> asyncio.Task:
+        """
+        Queue a send without waiting for it
+
+        Returns:
+            A task that finishes with the send
+
+        Raises:
+            DeliveryQueueFull: the user already has too many requests waiting
+        """
+        self._ensure_workers()
+
+        limit = PremiumBenefits.get_limits(is_premium)["concurrent_downloads"]
+        state = self._users.get(user_id)
+        if state is None:
+            state = self._users[user_id] = {"slots": asyncio.Semaphore(limit), "pending": 0}
+
+        if state["pending"] >= limit * DELIVERY_MAX_PENDING:
+            raise DeliveryQueueFull()
+
+        state["pending"] += 1
+        return asyncio.create_task(self._wait_turn(user_id, state, is_premium, send))
+
+    async def _wait_turn(self, user_id: int, state: dict, is_premium: bool, send: Callable[[], Awaitable]):
+        try:
+            # Wait for one of the user's own slots before competing with others
+            async with state["slots"]:
+                future = asyncio.get_running_loop().create_future()
+                self._queues["premium" if is_premium else "free"].append((send, future, time.monotonic()))
+                self._ready.set()
+                return await future
+        finally:
+            state["pending"] -= 1
+            if state["pending"] == 0:
+                self._users.pop(user_id, None)
+
+    def _next_job(self):
+        """Pick the next job by weighted round robin between tiers"""
+        premium, free = self._queues["premium"], self._queues["free"]
+
+        if premium and (self._premium_streak < self.premium_weight or not free):
+            self._premium_streak += 1
+            return premium.popleft()
+        if free:
+            self._premium_streak = 0
+            return free.popleft()
+        return None
+
+    async def _worker(self):
+        while True:
+            job = self._next_job()
+            if job is None:
+                self._ready.clear()
+                await self._ready.wait()
+                continue
+
+            send, future, enqueued = job
+            if future.cancelled():
+                continue
+
+            waited = time.monotonic() - enqueued
+            self.stats["wait_total"] += waited
+            self.stats["wait_max"] = max(self.stats["wait_max"], waited)
+
+            self._active += 1
+            try:
+                result = await send()
+                self.stats["completed"] += 1
+                if not future.done():
+                    future.set_result(result)
+            except Exception as e:
+                self.stats["failed"] += 1
+                if not future.done():
+                    future.set_exception(e)
+            finally:
+                self._active -= 1
+
+    def get_metrics(self) -> dict:
+        """Queue depths and wait statistics"""
+        processed = self.stats["completed"] + self.stats["failed"]
+        return {
+            "queue_premium": len(self._queues["premium"]),
+            "queue_free": len(self._queues["free"]),
+            "active": self._active,
+            "waiting_users": len(self._users),
+            "completed": self.stats["completed"],
+            "failed": self.stats["failed"],
+            "wait_avg": self.stats["wait_total"] / processed if processed else 0.0,
+            "wait_max": self.stats["wait_max"],
+        }
+
+    async def shutdown(self):
+        """Stop the workers"""
+        for task in self._worker_tasks:
+            task.cancel()
+        await asyncio.gather(*self._worker_tasks, return_exceptions=True)
+        self._worker_tasks = []
+
+
+class DeliveryEngine:
+    """Resolve download requests and deliver files"""
+
+    def __init__(self, db: AsyncIOMotorDatabase, search_engine: SearchEngine, client_pool: ClientPool):
+        self.db = db
+        self.search_engine = search_engine
+        self.client_pool = client_pool
+        self.scheduler = DeliveryScheduler()
+        self.file_cache = TTLCache(maxsize=FILE_CACHE_SIZE, ttl=FILE_CACHE_TTL)
+        self.tier_cache = TTLCache(maxsize=FILE_CACHE_SIZE, ttl=TIER_CACHE_TTL)
+        self.unreachable = TTLCache(maxsize=FILE_CACHE_SIZE, ttl=UNREACHABLE_CACHE_TTL)
+        self._background: set = set()
+
+    async def get_file_doc(self, doc_id: str) -> Optional[dict]:
+        """Get an indexed file by its document ID, through the cache"""
+        file_doc = self.file_cache.get(doc_id)
+        if file_doc is not None:
+            return file_doc
+
+        try:
+            _id = ObjectId(doc_id)
+        except InvalidId:
+            return None
+
+        file_doc = await self.db.files.find_one({"_id": _id})
+        if file_doc is None:
+            # Buttons sent for a copy merged away by /dedupe_files
+            alias = await self.db.file_aliases.find_one({"_id": _id})
+            if alias:
+                file_doc = await self.db.files.find_one({"_id": alias["duplicate_of"]})
+
+        if file_doc:
+            self.file_cache.set(doc_id, file_doc)
+        return file_doc
+
+    async def _is_premium(self, user_id: int) -> bool:
+        """Get the user's tier, cached briefly"""
+        is_premium = self.tier_cache.get(user_id)
+        if is_premium is None:
+            is_premium = await PremiumBenefits.is_premium(self.db, user_id)
+            self.tier_cache.set(user_id, is_premium)
+        return is_premium
+
+    async def _is_reachable(self, user_id: int, tenant: TenantContext) -> bool:
+        """False if a send to the user just failed, or the main bot knows it can't reach them"""
+        if self.unreachable.get((tenant.tenant_id, user_id)):
+            return False
+        if tenant.is_clone:
+            # The users collection tracks the main bot's audience only
+            return True
+        user = await self.db.users.find_one({"user_id": user_id}, {"is_reachable": 1})
+        return not (user and user.get("is_reachable") is False)
+
+    async def check_request(
+        self, user_id: int, doc_id: str, tenant: TenantContext = MAIN_TENANT
+    ) -> Tuple[Optional[dict], bool, Optional[str]]:
+        """
+        Resolve a file and check it is visible to the tenant and within the user's quotas
+
+        An accepted request has reserved one of the user's daily downloads;
+        deliver() gives it back if the file can't be sent.
+
+        Returns:
+            (file_doc, is_premium, None) if the user may download,
+            otherwise (None, is_premium, reason)
+        """
+        # File, tier, today's usage and reachability are independent lookups - run them together
+        file_doc, is_premium, downloads_today, reachable = await asyncio.gather(
+            self.get_file_doc(doc_id),
+            self._is_premium(user_id),
+            PremiumBenefits.get_downloads_today(self.db, user_id),
+            self._is_reachable(user_id, tenant),
+        )
+
+        if not file_doc or not await self.search_engine.visibility.can_see(tenant, file_doc):
+            return None, is_premium, "❌ File not found. It may have been removed."
+
+        if not reachable:
+            return None, is_premium, NOT_STARTED
+
+        limits = PremiumBenefits.get_limits(is_premium)
+
+        if downloads_today >= limits["daily_downloads"]:
+            return None, is_premium, (
+                f"❌ Daily download limit reached ({limits['daily_downloads']}/day).\n"
+                f"Upgrade to Premium with /buy for unlimited downloads!"
+            )
+
+        if file_doc.get("file_size", 0) > limits["max_file_size_mb"] * 1024 * 1024:
+            return None, is_premium, (
+                f"❌ This file is larger than your {limits['max_file_size_mb']}MB limit.\n"
+                f"Upgrade to Premium with /buy for files up to "
+                f"{PremiumBenefits.PREMIUM_LIMITS['max_file_size_mb']}MB!"
+            )
+
+        # Requests already queued may have used up the quota since it was read
+        if not await PremiumBenefits.reserve_download(self.db, user_id, limits["daily_downloads"]):
+            return None, is_premium, (
+                f"❌ Daily download limit reached ({limits['daily_downloads']}/day).\n"
+                f"Upgrade to Premium with /buy for unlimited downloads!"
+            )
+
+        return file_doc, is_premium, None
+
+    def deliver(self, client: Client, user_id: int, file_doc: dict, is_premium: bool) -> asyncio.Task:
+        """
+        Queue a file send through the fair scheduler and return at once
+
+        The returned task records the download once the file is sent and
+        reports a failed send to the user, so the update handler that
+        queued it is free to take the next update.
+
+        Raises:
+            DeliveryQueueFull: the user already has too many requests waiting
+        """
+        try:
+            sending = self.scheduler.submit(user_id, is_premium, lambda: self.send_file(client, user_id, file_doc))
+        except DeliveryQueueFull:
+            self._run_in_background(PremiumBenefits.release_download(self.db, user_id))
+            raise
+        return self._run_in_background(self._complete_delivery(client, user_id, file_doc, sending))
+
+    def _run_in_background(self, coro) -> asyncio.Task:
+        task = asyncio.create_task(coro)
+        self._background.add(task)
+        task.add_done_callback(self._background.discard)
+        return task
+
+    async def _complete_delivery(self, client: Client, user_id: int, file_doc: dict, sending: asyncio.Task):
+        try:
+            await sending
+        except asyncio.CancelledError:
+            sending.cancel()
+            await PremiumBenefits.release_download(self.db, user_id)
+            raise
+        except Exception as e:
+            await PremiumBenefits.release_download(self.db, user_id)
+            await self._report_failure(client, user_id, file_doc, e)
+            return
+        await self.search_engine.update_download_count(file_doc.get("file_id"))
+
+    async def _report_failure(self, client: Client, user_id: int, file_doc: dict, error: Exception):
+        """
+        Log a failed send and tell the user if they can be told
+
+        Users who blocked the bot or never started it can't be messaged;
+        they are marked unreachable, so their next click is answered with
+        an alert instead.
+        """
+        reason = classify_send_error(error)
+        tenant = get_tenant(client)
+        if reason in UNREACHABLE_REASONS:
+            logger.info(f"Could not deliver file {file_doc.get('_id')} to {user_id}: {reason}")
+            self.unreachable.set((tenant.tenant_id, user_id), True)
+            if not tenant.is_clone:
+                await mark_unreachable(self.db, [user_id], reason)
+            return
+
+        logger.error(f"Error delivering file {file_doc.get('_id')} to {user_id}: {error}")
+        try:
+            await client.send_message(user_id, "❌ Could not send the file. Please try again later.")
+        except Exception as e:
+            logger.debug(f"Could not tell {user_id} about the failed delivery: {e}")
+
+    async def send_file(self, client: Client, chat_id: int, file_doc: dict):
+        """Send a file without re-uploading it"""
+        caption = file_doc.get("caption") or file_doc.get("custom_name") or ""
+
+        if not (file_doc.get("channel_id") and file_doc.get("message_id")):
+            # file_ids only work for the bot that received them
+            await client.send_cached_media(chat_id, file_doc["file_id"], caption=caption)
+            return
+
+        if get_tenant(client).is_clone:
+            # Clone users talk to the clone; the pooled sessions can't reach them
+            await client.copy_message(chat_id, file_doc["channel_id"], file_doc["message_id"], caption=caption or None)
+            return
+
+        # Each failed worker is parked or marked, so every session is tried at most once
+        for _ in range(len(self.client_pool.workers) + 1):
+            sender = client
+            try:
+                async with self.client_pool.acquire(peer_id=chat_id) as sender:
+                    await sender.copy_message(
+                        chat_id, file_doc["channel_id"], file_doc["message_id"], caption=caption or None
+                    )
+                self.client_pool.mark_reachable(sender, chat_id)
+                return
+            except FloodWait:
+                if sender is client and not self.client_pool.workers:
+                    raise
+                # acquire() parked this session until the wait is over; try another one
+            except (PeerIdInvalid, UserIsBlocked):
+                if sender is client:
+                    raise
+                # The user never started (or blocked) this worker bot
+                self.client_pool.mark_unreachable(sender, chat_id)
+            except RPCError as e:
+                if sender is client:
+                    raise
+                # Specific to the worker, e.g. it is not a member of the source channel
+                logger.warning(f"Worker send to {chat_id} failed, using the main bot: {e}")
+                break
+
+        await client.copy_message(chat_id, file_doc["channel_id"], file_doc["message_id"], caption=caption or None)
+
+    async def shutdown(self):
+        """Drop queued deliveries and stop the scheduler"""
+        for task in list(self._background):
+            task.cancel()
+        if self._background:
+            await asyncio.gather(*self._background, return_exceptions=True)
+        await self.scheduler.shutdown()
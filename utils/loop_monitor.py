@@ -0,0 +1,104 @@
+"""
+Event loop lag monitor for Phoenix Filter Bot
+A ticker task measures how late the loop wakes it; a watchdog thread
+notices when the ticker stops and records what the loop is stuck running.
+"""
+
+import asyncio
+import logging
+import sys
+import threading
+import time
+import traceback
+from collections import deque
+from typing import Optional
+from config import LOOP_LAG_THRESHOLD_MS
+from utils.metrics import metrics
+
+logger = logging.getLogger(__name__)
+
+TICK_INTERVAL = 0.1
+LAG_WINDOW = 3000
+BLOCKING_SAMPLES = 10
+QUANTILES = (0.5, 0.9, 0.99)
+
+LOOP_LAG = metrics.histogram(
+    "phoenix_loop_lag_seconds", "How late the event loop ran a scheduled callback",
+    buckets=(0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10),
+)
+LOOP_BLOCKED = metrics.counter(
+    "phoenix_loop_blocked_total", "Times the event loop was blocked longer than LOOP_LAG_THRESHOLD_MS"
+)
+
+
+class LoopLagMonitor:
+    """Measure event loop lag and capture the stack of blocking code"""
+
+    def __init__(self, threshold_ms: float = LOOP_LAG_THRESHOLD_MS, interval: float = TICK_INTERVAL):
+        self.threshold = threshold_ms / 1000
+        self.interval = interval
+        self.recent_lag: deque = deque(maxlen=LAG_WINDOW)
+        self.blocking_samples: deque = deque(maxlen=BLOCKING_SAMPLES)
+        self._heartbeat = time.monotonic()
+        self._thread_id: Optional[int] = None
+        self._task: Optional[asyncio.Task] = None
+        self._stop = threading.Event()
+        self._watchdog: Optional[threading.Thread] = None
+        metrics.gauge(
+            "phoenix_loop_lag_quantile_seconds", "Event loop lag over the last few minutes", ("quantile",),
+            collect=lambda: {(str(q),): lag for q, lag in self.percentiles().items()},
+        )
+
+    def percentiles(self) -> dict:
+        ordered = sorted(self.recent_lag)
+        if not ordered:
+            return {}
+        return {q: ordered[min(len(ordered) - 1, int(q * len(ordered)))] for q in QUANTILES}
+
+    def start(self):
+        """Start monitoring the running loop"""
+        if self._task:
+            return
+        self._thread_id = threading.get_ident()
+        self._heartbeat = time.monotonic()
+        self._stop.clear()
+        self._task = asyncio.create_task(self._tick())
+        self._watchdog = threading.Thread(target=self._watch, name="phoenix-loop-watchdog", daemon=True)
+        self._watchdog.start()
+
+    async def _tick(self):
+        while True:
+            expected = time.monotonic() + self.interval
+            await asyncio.sleep(self.interval)
+            now = time.monotonic()
+            self._heartbeat = now
+            lag = max(0.0, now - expected)
+            self.recent_lag.append(lag)
+            LOOP_LAG.observe(lag)
+
+    def _watch(self):
+        """Runs in its own thread, so it keeps going while the loop is stuck"""
+        captured_for = None
+        while not self._stop.wait(self.threshold / 2):
+            heartbeat = self._heartbeat
+            stalled = time.monotonic() - heartbeat - self.interval
+            if stalled < self.threshold or captured_for == heartbeat:
+                continue
+            captured_for = heartbeat
+            frame = sys._current_frames().get(self._thread_id)
+            if frame is None:
+                continue
+            stack = "".join(traceback.format_stack(frame))
+            LOOP_BLOCKED.inc()
+            self.blocking_samples.append({"at": time.time(), "stalled_ms": stalled * 1000, "stack": stack})
+            logger.warning(f"⏱ Event loop blocked for {stalled * 1000:.0f}ms+ in:\n{stack}")
+
+    async def stop(self):
+        self._stop.set()
+        if self._task:
+            self._task.cancel()
+            await asyncio.gather(self._task, return_exceptions=True)
+            self._task = None
+
+
+loop_monitor = LoopLagMonitor()
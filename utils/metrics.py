@@ -0,0 +1,310 @@
+"""
+Metrics for Phoenix Filter Bot
+Latency histograms, error counters and gauges, rendered in the Prometheus
+text format. Observing a value is a lock and a few additions, so
+instrumentation stays on in production.
+"""
+
+import bisect
+import functools
+import inspect
+import logging
+import threading
+import time
+from typing import Callable, Dict, Iterable, List, Optional, Tuple
+from pymongo import monitoring
+from pyrogram import Client, ContinuePropagation, StopPropagation
+
+logger = logging.getLogger(__name__)
+
+LATENCY_BUCKETS = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30)
+
+Labels = Tuple[str, ...]
+
+
+def _escape(value) -> str:
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _format_labels(names: Iterable[str], values: Iterable[str]) -> str:
+    pairs = [f'{name}="{_escape(value)}"' for name, value in zip(names, values)]
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+class Counter:
+    """Monotonic count per label set"""
+
+    kind = "counter"
+
+    def __init__(self, name: str, documentation: str, labelnames: Tuple[str, ...] = ()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = labelnames
+        self._values: Dict[Labels, float] = {}
+        self._lock = threading.Lock()
+
+    def inc(self, *labels: str, amount: float = 1):
+        with self._lock:
+            self._values[labels] = self._values.get(labels, 0) + amount
+
+    def get(self, *labels: str) -> float:
+        return self._values.get(labels, 0)
+
+    def render(self) -> List[str]:
+        with self._lock:
+            items = list(self._values.items())
+        return [f"{self.name}{_format_labels(self.labelnames, labels)} {value}" for labels, value in items]
+
+
+class Histogram:
+    """Cumulative-bucket histogram per label set"""
+
+    kind = "histogram"
+
+    def __init__(
+        self,
+        name: str,
+        documentation: str,
+        labelnames: Tuple[str, ...] = (),
+        buckets: Tuple[float, ...] = LATENCY_BUCKETS,
+    ):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = labelnames
+        self.buckets = buckets
+        # labels -> [per-bucket counts (last is +Inf), sum, count]
+        self._series: Dict[Labels, list] = {}
+        self._lock = threading.Lock()
+
+    def observe(self, value: float, *labels: str):
+        index = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            series = self._series.get(labels)
+            if series is None:
+                series = self._series[labels] = [[0] * (len(self.buckets) + 1), 0.0, 0]
+            series[0][index] += 1
+            series[1] += value
+            series[2] += 1
+
+    def render(self) -> List[str]:
+        with self._lock:
+            items = [(labels, list(series[0]), series[1], series[2]) for labels, series in self._series.items()]
+
+        lines = []
+        for labels, counts, total, count in items:
+            cumulative = 0
+            for bound, bucket_count in zip((*self.buckets, "+Inf"), counts):
+                cumulative += bucket_count
+                label_text = _format_labels((*self.labelnames, "le"), (*labels, bound))
+                lines.append(f"{self.name}_bucket{label_text} {cumulative}")
+            label_text = _format_labels(self.labelnames, labels)
+            lines.append(f"{self.name}_sum{label_text} {total}")
+            lines.append(f"{self.name}_count{label_text} {count}")
+        return lines
+
+
+class Gauge:
+    """Point-in-time values, read from a callback when metrics are collected"""
+
+    kind = "gauge"
+
+    def __init__(
+        self,
+        name: str,
+        documentation: str,
+        labelnames: Tuple[str, ...] = (),
+        collect: Optional[Callable[[], Dict[Labels, float]]] = None,
+    ):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = labelnames
+        self._values: Dict[Labels, float] = {}
+        self._collectors: List[Callable[[], Dict[Labels, float]]] = [collect] if collect else []
+
+    def set(self, value: float, *labels: str):
+        self._values[labels] = value
+
+    def add_collector(self, collect: Callable[[], Dict[Labels, float]]):
+        self._collectors.append(collect)
+
+    def render(self) -> List[str]:
+        values = dict(self._values)
+        for collect in self._collectors:
+            try:
+                values.update(collect())
+            except Exception as e:
+                logger.warning(f"Metrics collector for {self.name} failed: {e}")
+        return [f"{self.name}{_format_labels(self.labelnames, labels)} {value}" for labels, value in values.items()]
+
+
+class MetricsRegistry:
+    """All metrics exported by this process"""
+
+    def __init__(self):
+        self._metrics: Dict[str, object] = {}
+        self._caches: Dict[str, object] = {}
+        self.cache_hit_rate = self.gauge(
+            "phoenix_cache_hit_rate", "Fraction of cache lookups served from memory", ("cache",),
+            collect=lambda: {(name,): cache.hit_rate for name, cache in list(self._caches.items())},
+        )
+        self.cache_size = self.gauge(
+            "phoenix_cache_entries", "Entries held by each cache", ("cache",),
+            collect=lambda: {(name,): len(cache) for name, cache in list(self._caches.items())},
+        )
+
+    def _register(self, metric):
+        existing = self._metrics.get(metric.name)
+        if existing is not None:
+            return existing
+        self._metrics[metric.name] = metric
+        return metric
+
+    def counter(self, name: str, documentation: str, labelnames: Tuple[str, ...] = ()) -> Counter:
+        return self._register(Counter(name, documentation, labelnames))
+
+    def histogram(
+        self, name: str, documentation: str, labelnames: Tuple[str, ...] = (), buckets: Tuple[float, ...] = LATENCY_BUCKETS
+    ) -> Histogram:
+        return self._register(Histogram(name, documentation, labelnames, buckets))
+
+    def gauge(
+        self, name: str, documentation: str, labelnames: Tuple[str, ...] = (),
+        collect: Optional[Callable[[], Dict[Labels, float]]] = None,
+    ) -> Gauge:
+        gauge = self._register(Gauge(name, documentation, labelnames))
+        if collect:
+            gauge.add_collector(collect)
+        return gauge
+
+    def register_cache(self, name: str, cache):
+        """Export hit rate and size of any cache with hits, misses, hit_rate and __len__"""
+        self._caches[name] = cache
+
+    def render(self) -> str:
+        """All metrics in the Prometheus text exposition format"""
+        lines = []
+        for metric in list(self._metrics.values()):
+            samples = metric.render()
+            if not samples:
+                continue
+            lines.append(f"# HELP {metric.name} {metric.documentation}")
+            lines.append(f"# TYPE {metric.name} {metric.kind}")
+            lines.extend(samples)
+        return "\n".join(lines) + "\n"
+
+
+metrics = MetricsRegistry()
+
+HANDLER_LATENCY = metrics.histogram(
+    "phoenix_handler_seconds", "Time spent in update handlers", ("handler",)
+)
+HANDLER_ERRORS = metrics.counter(
+    "phoenix_handler_errors_total", "Exceptions raised by update handlers", ("handler", "error")
+)
+DB_LATENCY = metrics.histogram(
+    "phoenix_db_seconds", "MongoDB command latency", ("command", "collection")
+)
+DB_ERRORS = metrics.counter(
+    "phoenix_db_errors_total", "Failed MongoDB commands", ("command", "collection")
+)
+TELEGRAM_LATENCY = metrics.histogram(
+    "phoenix_telegram_seconds", "Telegram API call latency", ("method",)
+)
+TELEGRAM_ERRORS = metrics.counter(
+    "phoenix_telegram_errors_total", "Failed Telegram API calls", ("method", "error")
+)
+
+
+def handler_name(callback: Callable) -> str:
+    """Short, stable label for a handler callback, e.g. search_handlers.handle_pm_search"""
+    module = getattr(callback, "__module__", "") or ""
+    return f"{module.rsplit('.', 1)[-1]}.{getattr(callback, '__name__', 'handler')}"
+
+
+def timed_handler(callback: Callable) -> Callable:
+    """Wrap a handler callback with latency and error accounting"""
+    if not inspect.iscoroutinefunction(callback) or getattr(callback, "_timed", False):
+        return callback
+    name = handler_name(callback)
+
+    @functools.wraps(callback)
+    async def wrapper(*args, **kwargs):
+        started = time.perf_counter()
+        try:
+            return await callback(*args, **kwargs)
+        except (StopPropagation, ContinuePropagation):
+            raise
+        except Exception as e:
+            HANDLER_ERRORS.inc(name, type(e).__name__)
+            raise
+        finally:
+            HANDLER_LATENCY.observe(time.perf_counter() - started, name)
+
+    wrapper._timed = True
+    return wrapper
+
+
+def instrument_handlers(client: Client):
+    """
+    Time every handler registered on a client from now on
+
+    Call before the setup_* functions. Clones reuse the main bot's handler
+    objects, so they are timed without being instrumented themselves.
+    """
+    add_handler = client.add_handler
+
+    def instrumented_add_handler(handler, group: int = 0):
+        handler.callback = timed_handler(handler.callback)
+        return add_handler(handler, group)
+
+    client.add_handler = instrumented_add_handler
+
+
+def instrument_api(client: Client):
+    """Time every raw Telegram API call made through a client"""
+    # Pyrogram 2.x sends raw functions through invoke, 1.x through send
+    method_name = "invoke" if hasattr(client, "invoke") else "send"
+    send = getattr(client, method_name)
+    if getattr(send, "_timed", False):
+        return
+
+    @functools.wraps(send)
+    async def instrumented_send(data, *args, **kwargs):
+        method = type(data).__name__
+        started = time.perf_counter()
+        try:
+            return await send(data, *args, **kwargs)
+        except Exception as e:
+            TELEGRAM_ERRORS.inc(method, type(e).__name__)
+            raise
+        finally:
+            TELEGRAM_LATENCY.observe(time.perf_counter() - started, method)
+
+    instrumented_send._timed = True
+    setattr(client, method_name, instrumented_send)
+
+
+class CommandMetrics(monitoring.CommandListener):
+    """
+    pymongo listener timing every MongoDB command
+
+    Runs on Motor's worker threads, so it only touches thread-safe metrics.
+    """
+
+    def __init__(self):
+        self._collections: Dict[int, str] = {}
+
+    def started(self, event: monitoring.CommandStartedEvent):
+        collection = event.command.get(event.command_name)
+        if event.command_name == "getMore":
+            collection = event.command.get("collection")
+        self._collections[event.request_id] = collection if isinstance(collection, str) else ""
+
+    def succeeded(self, event: monitoring.CommandSucceededEvent):
+        collection = self._collections.pop(event.request_id, "")
+        DB_LATENCY.observe(event.duration_micros / 1e6, event.command_name, collection)
+
+    def failed(self, event: monitoring.CommandFailedEvent):
+        collection = self._collections.pop(event.request_id, "")
+        DB_LATENCY.observe(event.duration_micros / 1e6, event.command_name, collection)
+        DB_ERRORS.inc(event.command_name, collection)
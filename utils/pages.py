@@ -0,0 +1,61 @@
+"""
+Search result pages for Phoenix Filter Bot
+Keeps the ranked results of a search in memory under a short token, so
+Next/Prev buttons render any page without searching again.
+"""
+
+import math
+import secrets
+from dataclasses import dataclass
+from typing import List, Optional
+from utils.cache import TTLCache
+
+PAGE_SIZE = 5
+PAGE_STATE_SIZE = 5000
+PAGE_STATE_TTL = 15 * 60
+
+# What a results page shows; the rest of the document stays in MongoDB
+DISPLAY_FIELDS = ("file_name", "custom_name", "file_type", "file_size", "download_count", "caption")
+
+
+@dataclass
+class ResultPages:
+    """Ranked results of one search"""
+    query: str
+    results: List[dict]
+    page_size: int = PAGE_SIZE
+
+    @property
+    def page_count(self) -> int:
+        return max(1, math.ceil(len(self.results) / self.page_size))
+
+    def page(self, number: int) -> List[dict]:
+        start = number * self.page_size
+        return self.results[start:start + self.page_size]
+
+
+class PageStore:
+    """Result pages by token, expiring PAGE_STATE_TTL after the last look"""
+
+    def __init__(self, maxsize: int = PAGE_STATE_SIZE, ttl: float = PAGE_STATE_TTL):
+        self.cache = TTLCache(maxsize=maxsize, ttl=ttl)
+
+    def save(self, query: str, results: List[dict], page_size: int = PAGE_SIZE) -> str:
+        """Store results and return the token that callback data refers to them by"""
+        slim = [
+            {"_id": str(doc["_id"]), **{name: doc[name] for name in DISPLAY_FIELDS if name in doc}}
+            for doc in results
+        ]
+        token = secrets.token_urlsafe(6)
+        self.cache.set(token, ResultPages(query, slim, page_size))
+        return token
+
+    def get(self, token: str) -> Optional[ResultPages]:
+        pages = self.cache.get(token)
+        if pages is not None:
+            # Paging through results keeps them alive
+            self.cache.set(token, pages)
+        return pages
+
+
+result_pages = PageStore()
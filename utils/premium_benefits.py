@@ -39,6 +39,11 @@ class PremiumBenefits:
         "ad_free": True,  # No ads
     }
     
+    @staticmethod
+    def _today() -> datetime:
+        """Today's date as a datetime (BSON cannot store a bare date)"""
+        return datetime.combine(datetime.utcnow().date(), datetime.min.time())
+    
     @staticmethod
     async def is_premium(db: AsyncIOMotorDatabase, user_id: int) -> bool:
         """Check if user has active premium"""
@@ -88,7 +93,7 @@ class PremiumBenefits:
             return True, daily_limit
         
         # Get today's search count
-        today = datetime.utcnow().date()
+        today = PremiumBenefits._today()
         search_log = await db.search_logs.find_one({
             "user_id": user_id,
             "date": today,
@@ -103,7 +108,7 @@ class PremiumBenefits:
     async def log_search(db: AsyncIOMotorDatabase, user_id: int):
         """Log a search for daily limit tracking"""
         try:
-            today = datetime.utcnow().date()
+            today = PremiumBenefits._today()
             
             await db.search_logs.update_one(
                 {"user_id": user_id, "date": today},
@@ -127,7 +132,7 @@ class PremiumBenefits:
             return True, daily_limit
         
         # Get today's download count
-        today = datetime.utcnow().date()
+        today = PremiumBenefits._today()
         download_log = await db.download_logs.find_one({
             "user_id": user_id,
             "date": today,
@@ -138,11 +143,59 @@ class PremiumBenefits:
         
         return downloads_today < daily_limit, remaining
     
+    @staticmethod
+    async def get_downloads_today(db: AsyncIOMotorDatabase, user_id: int) -> int:
+        """Get the number of downloads a user made today"""
+        download_log = await db.download_logs.find_one({
+            "user_id": user_id,
+            "date": PremiumBenefits._today(),
+        })
+        return download_log["count"] if download_log else 0
+    
+    @staticmethod
+    async def ensure_indexes(db: AsyncIOMotorDatabase):
+        """One usage document per user and day, so reservations can't split across copies"""
+        await db.download_logs.create_index([("user_id", 1), ("date", 1)], unique=True)
+    
+    @staticmethod
+    async def reserve_download(db: AsyncIOMotorDatabase, user_id: int, daily_limit: int) -> bool:
+        """
+        Count a download against today's limit before it is sent
+        
+        The check and the increment are one conditional update, so requests
+        queued at the same time can't all pass a limit that has room for one.
+        
+        Returns:
+            False if the daily limit is already reached
+        """
+        today = PremiumBenefits._today()
+        await db.download_logs.update_one(
+            {"user_id": user_id, "date": today},
+            {"$setOnInsert": {"count": 0}},
+            upsert=True
+        )
+        result = await db.download_logs.update_one(
+            {"user_id": user_id, "date": today, "count": {"$lt": daily_limit}},
+            {"$inc": {"count": 1}}
+        )
+        return result.modified_count > 0
+    
+    @staticmethod
+    async def release_download(db: AsyncIOMotorDatabase, user_id: int):
+        """Give back a reserved download whose send failed"""
+        try:
+            await db.download_logs.update_one(
+                {"user_id": user_id, "date": PremiumBenefits._today(), "count": {"$gt": 0}},
+                {"$inc": {"count": -1}}
+            )
+        except Exception as e:
+            logger.error(f"Error releasing download: {e}")
+    
     @staticmethod
     async def log_download(db: AsyncIOMotorDatabase, user_id: int):
         """Log a download for daily limit tracking"""
         try:
-            today = datetime.utcnow().date()
+            today = PremiumBenefits._today()
             
             await db.download_logs.update_one(
                 {"user_id": user_id, "date": today},
@@ -159,7 +212,7 @@ class PremiumBenefits:
         limits = PremiumBenefits.get_limits(is_premium)
         
         # Get daily usage
-        today = datetime.utcnow().date()
+        today = PremiumBenefits._today()
         search_log = await db.search_logs.find_one({"user_id": user_id, "date": today})
         download_log = await db.download_logs.find_one({"user_id": user_id, "date": today})
         
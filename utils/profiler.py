@@ -0,0 +1,122 @@
+"""
+Sampling profiler for Phoenix Filter Bot
+A background thread samples the event loop thread's stack at a fixed rate,
+so the live bot can be profiled without restarting it or slowing it down.
+"""
+
+import asyncio
+import sys
+import threading
+import time
+from collections import Counter
+from dataclasses import dataclass
+from typing import List, Optional, Tuple
+
+SAMPLE_INTERVAL = 0.005
+MAX_PROFILE_SECONDS = 120
+
+# Leaf functions meaning the loop was waiting for I/O rather than running code
+IDLE_FUNCTIONS = {"select", "poll"}
+
+
+@dataclass
+class ProfileResult:
+    """Samples collected over one profiling run"""
+    duration: float
+    samples: int
+    idle_samples: int
+    stacks: Counter
+
+    def collapsed(self) -> str:
+        """Stacks in the collapsed format read by flamegraph.pl and speedscope"""
+        return "".join(f"{stack} {count}\n" for stack, count in self.stacks.most_common())
+
+    def top_functions(self, limit: int = 15) -> List[Tuple[str, int, int]]:
+        """
+        Hottest functions by own (self) samples
+
+        Returns:
+            [(function, self_samples, total_samples)] for busy samples only
+        """
+        own: Counter = Counter()
+        total: Counter = Counter()
+        for stack, count in self.stacks.items():
+            frames = stack.split(";")
+            if _is_idle(frames[-1]):
+                continue
+            own[frames[-1]] += count
+            for frame in set(frames):
+                total[frame] += count
+        return [(frame, count, total[frame]) for frame, count in own.most_common(limit)]
+
+
+def _is_idle(frame: str) -> bool:
+    return frame.split(" ", 1)[0] in IDLE_FUNCTIONS
+
+
+def _describe(code) -> str:
+    module = code.co_filename.rsplit("/", 1)[-1]
+    return f"{code.co_name} ({module}:{code.co_firstlineno})"
+
+
+class SamplingProfiler:
+    """Statistical profiler for one thread, usually the one running the event loop"""
+
+    def __init__(self, interval: float = SAMPLE_INTERVAL):
+        self.interval = interval
+        self._lock = asyncio.Lock()
+
+    @property
+    def running(self) -> bool:
+        return self._lock.locked()
+
+    def _sample(self, thread_id: int, stop: threading.Event, stacks: Counter) -> Tuple[int, int]:
+        samples = idle = 0
+        while not stop.wait(self.interval):
+            frame = sys._current_frames().get(thread_id)
+            if frame is None:
+                continue
+            names = []
+            while frame is not None:
+                names.append(_describe(frame.f_code))
+                frame = frame.f_back
+            names.reverse()
+            stacks[";".join(names)] += 1
+            samples += 1
+            if _is_idle(names[-1]):
+                idle += 1
+        return samples, idle
+
+    async def profile(self, seconds: float, thread_id: Optional[int] = None) -> ProfileResult:
+        """
+        Sample the calling thread's stacks for a number of seconds
+
+        Only one run at a time; raises RuntimeError if one is in progress.
+        """
+        if self.running:
+            raise RuntimeError("A profile is already running")
+
+        async with self._lock:
+            seconds = max(1.0, min(seconds, MAX_PROFILE_SECONDS))
+            thread_id = thread_id or threading.get_ident()
+            stop = threading.Event()
+            stacks: Counter = Counter()
+            counts: List[int] = []
+
+            def run():
+                counts.extend(self._sample(thread_id, stop, stacks))
+
+            sampler = threading.Thread(target=run, name="phoenix-profiler", daemon=True)
+            started = time.monotonic()
+            sampler.start()
+            try:
+                await asyncio.sleep(seconds)
+            finally:
+                stop.set()
+                await asyncio.get_running_loop().run_in_executor(None, sampler.join)
+
+            samples, idle = counts or (0, 0)
+            return ProfileResult(time.monotonic() - started, samples, idle, stacks)
+
+
+profiler = SamplingProfiler()
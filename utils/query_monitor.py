@@ -0,0 +1,386 @@
+"""
+MongoDB query monitor for Phoenix Filter Bot
+Groups every command by query shape (operation, collection and filter
+structure with values stripped) and tracks latency, documents returned
+and, from sampled explain() runs, documents examined per shape.
+"""
+
+import asyncio
+import json
+import logging
+import threading
+import time
+from collections import deque
+from datetime import datetime
+from typing import Dict, List, Optional
+from bson import ObjectId, Regex, json_util
+from motor.motor_asyncio import AsyncIOMotorClient
+from pymongo import monitoring
+from config import DB_SLOW_MS, DB_EXPLAIN_INTERVAL
+from utils.metrics import metrics
+
+logger = logging.getLogger(__name__)
+
+SHAPES_COLLECTION = "query_shapes"
+SHAPE_FLUSH_INTERVAL = 60
+LATENCY_WINDOW = 256
+SLOW_SAMPLES = 20
+
+# Commands that carry a query worth grouping and explaining
+EXPLAINABLE = {"find", "count", "distinct", "aggregate", "update", "delete", "findAndModify"}
+IGNORED = {"explain", "getMore", "killCursors", "endSessions", "ping", "hello", "isMaster", "ismaster", "buildInfo"}
+
+# Values kept as-is when stripping a command down to its shape
+STRUCTURAL_KEYS = {
+    "sort", "projection", "hint", "limit", "skip", "batchSize", "key", "multi", "upsert",
+    "$sort", "$limit", "$skip", "$project", "$group", "$unwind", "$count", "$lookup", "$options",
+}
+# Driver bookkeeping that must not be sent back inside explain
+SESSION_KEYS = {"lsid", "txnNumber", "$clusterTime", "$db", "$readPreference", "readConcern", "writeConcern"}
+
+SLOW_QUERIES = metrics.counter(
+    "phoenix_db_slow_queries_total", "MongoDB commands slower than DB_SLOW_MS", ("command", "collection")
+)
+
+
+def _normalize(value, key: Optional[str] = None):
+    """Replace values with placeholders of the same type, keeping operators and field names"""
+    if key in STRUCTURAL_KEYS:
+        return value
+    if isinstance(value, dict):
+        return {k: _normalize(v, k) for k, v in value.items()}
+    if isinstance(value, (list, tuple)):
+        # $in/$nin lists of any length share a shape
+        return [_normalize(value[0])] if value and key not in ("pipeline", "$and", "$or", "$nor") else [
+            _normalize(item) for item in value
+        ]
+    if isinstance(value, str):
+        return value if value.startswith("$") else "x"
+    if isinstance(value, bool):
+        return False
+    if isinstance(value, int):
+        return 0
+    if isinstance(value, float):
+        return 0.0
+    if isinstance(value, datetime):
+        return datetime(1970, 1, 1)
+    if isinstance(value, ObjectId):
+        return ObjectId("0" * 24)
+    if isinstance(value, Regex):
+        return Regex("x", value.flags)
+    return value
+
+
+def _strip_session(command: dict) -> dict:
+    """Copy of a command without driver bookkeeping, and one statement at most"""
+    stripped = {k: v for k, v in command.items() if k not in SESSION_KEYS}
+    for statements in ("updates", "deletes"):
+        if stripped.get(statements):
+            stripped[statements] = list(stripped[statements])[:1]
+    return stripped
+
+
+def _query_part(command_name: str, command: dict):
+    """The part of a command that decides which index is used"""
+    if command_name == "find":
+        return {"filter": command.get("filter", {}), "sort": command.get("sort")}
+    if command_name in ("count", "distinct", "findAndModify"):
+        return {"query": command.get("query", {}), "key": command.get("key"), "sort": command.get("sort")}
+    if command_name == "aggregate":
+        return {"pipeline": command.get("pipeline", [])}
+    if command_name == "update":
+        updates = command.get("updates") or [{}]
+        return {"q": updates[0].get("q", {})}
+    if command_name == "delete":
+        deletes = command.get("deletes") or [{}]
+        return {"q": deletes[0].get("q", {})}
+    return None
+
+
+def shape_of(command_name: str, command: dict) -> str:
+    """Stable key for a command's query shape, e.g. find files {"filter": {"file_id": "x"}}"""
+    collection = command.get(command_name)
+    part = _query_part(command_name, command)
+    if part is None:
+        return f"{command_name} {collection}"
+    part = {k: v for k, v in part.items() if v is not None}
+    return f"{command_name} {collection} {json.dumps(_normalize(part), sort_keys=True, default=str)}"
+
+
+def _returned(command_name: str, reply: dict) -> int:
+    """Documents a command returned or touched, from its reply"""
+    cursor = reply.get("cursor")
+    if cursor:
+        return len(cursor.get("firstBatch") or cursor.get("nextBatch") or [])
+    if command_name == "distinct":
+        return len(reply.get("values", []))
+    if command_name == "findAndModify":
+        return 1 if reply.get("value") else 0
+    return reply.get("n", 0)
+
+
+def _plan_stages(plan: dict) -> List[str]:
+    """Every stage name in a winning plan tree"""
+    stages = []
+    pending = [plan]
+    while pending:
+        node = pending.pop()
+        if not isinstance(node, dict):
+            continue
+        if "stage" in node:
+            stages.append(node["stage"])
+        for child in ("inputStage", "queryPlan", "winningPlan"):
+            if child in node:
+                pending.append(node[child])
+        pending.extend(node.get("inputStages", []))
+    return stages
+
+
+def _explain_summary(explanation: dict) -> dict:
+    """Plan stages and execution counters from an explain() reply"""
+    planner = explanation.get("queryPlanner") or {}
+    if not planner and explanation.get("stages"):
+        # Aggregations nest the planner under their $cursor stage
+        planner = explanation["stages"][0].get("$cursor", {}).get("queryPlanner", {})
+    stages = _plan_stages(planner.get("winningPlan", {}))
+    stats = explanation.get("executionStats") or {}
+    return {
+        "stages": stages,
+        "collscan": "COLLSCAN" in stages,
+        "docs_examined": stats.get("totalDocsExamined"),
+        "keys_examined": stats.get("totalKeysExamined"),
+        "returned": stats.get("nReturned"),
+        "explained_at": time.time(),
+    }
+
+
+class ShapeStats:
+    """Latency and document counts for one query shape"""
+
+    def __init__(self, shape: str, database: str, command: dict):
+        self.shape = shape
+        self.database = database
+        self.command = command
+        self.count = 0
+        self.errors = 0
+        self.total_ms = 0.0
+        self.max_ms = 0.0
+        self.returned = 0
+        self.recent_ms: deque = deque(maxlen=LATENCY_WINDOW)
+        self.plan: Optional[dict] = None
+
+    def percentile(self, fraction: float) -> float:
+        ordered = sorted(self.recent_ms)
+        if not ordered:
+            return 0.0
+        return ordered[min(len(ordered) - 1, int(fraction * len(ordered)))]
+
+    @property
+    def avg_ms(self) -> float:
+        return self.total_ms / self.count if self.count else 0.0
+
+
+class QueryMonitor(monitoring.CommandListener):
+    """
+    pymongo listener grouping commands by query shape
+
+    The listener runs on Motor's worker threads; explain() runs are handed
+    to a task on the event loop.
+    """
+
+    def __init__(self, slow_ms: float = DB_SLOW_MS, explain_interval: float = DB_EXPLAIN_INTERVAL):
+        self.slow_ms = slow_ms
+        self.explain_interval = explain_interval
+        self.shapes: Dict[str, ShapeStats] = {}
+        self.slow_samples: deque = deque(maxlen=SLOW_SAMPLES)
+        self.audit_results: List[dict] = []
+        self._inflight: Dict[int, tuple] = {}
+        self._cursors: Dict[int, str] = {}
+        self._new_shapes: set = set()
+        self._lock = threading.Lock()
+        self._client: Optional[AsyncIOMotorClient] = None
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._explain_queue: Optional[asyncio.Queue] = None
+        self._tasks: List[asyncio.Task] = []
+
+    # pymongo listener callbacks (worker threads)
+
+    def started(self, event: monitoring.CommandStartedEvent):
+        name = event.command_name
+        if name in IGNORED and name != "getMore":
+            return
+        command = event.command
+        if name == "getMore":
+            shape = self._cursors.get(command.get("getMore"))
+            if shape is None:
+                return
+        elif command.get(name) == SHAPES_COLLECTION:
+            return
+        else:
+            shape = shape_of(name, command)
+        self._inflight[event.request_id] = (shape, name, event.database_name, command)
+
+    def succeeded(self, event: monitoring.CommandSucceededEvent):
+        entry = self._inflight.pop(event.request_id, None)
+        if entry is None:
+            return
+        shape, name, database, command = entry
+        reply = event.reply
+        cursor = reply.get("cursor") or {}
+        if cursor.get("id"):
+            self._cursors[cursor["id"]] = shape
+        elif name == "getMore":
+            self._cursors.pop(command.get("getMore"), None)
+        self._record(shape, name, database, command, event.duration_micros / 1000, _returned(name, reply))
+
+    def failed(self, event: monitoring.CommandFailedEvent):
+        entry = self._inflight.pop(event.request_id, None)
+        if entry is None:
+            return
+        shape, name, database, command = entry
+        self._record(shape, name, database, command, event.duration_micros / 1000, 0, failed=True)
+
+    def _record(self, shape: str, name: str, database: str, command: dict,
+                duration_ms: float, returned: int, failed: bool = False):
+        with self._lock:
+            stats = self.shapes.get(shape)
+            if stats is None:
+                stats = self.shapes[shape] = ShapeStats(shape, database, _strip_session(command))
+                self._new_shapes.add(shape)
+            # Later batches of a cursor add to the query that opened it
+            stats.total_ms += duration_ms
+            stats.returned += returned
+            stats.errors += failed
+            if name != "getMore":
+                stats.count += 1
+                stats.max_ms = max(stats.max_ms, duration_ms)
+                stats.recent_ms.append(duration_ms)
+
+        slow = duration_ms >= self.slow_ms
+        if slow and name != "getMore":
+            SLOW_QUERIES.inc(name, str(command.get(name)))
+            self.slow_samples.append({
+                "at": time.time(),
+                "shape": shape,
+                "duration_ms": duration_ms,
+                "returned": returned,
+            })
+
+        # Explain new shapes once, and slow ones again every explain_interval
+        due = stats.plan is None or (slow and time.time() - stats.plan["explained_at"] > self.explain_interval)
+        if name in EXPLAINABLE and due and self._loop and not failed:
+            stats.plan = stats.plan or {"explained_at": time.time(), "stages": [], "collscan": False}
+            stats.plan["explained_at"] = time.time()
+            self._loop.call_soon_threadsafe(self._queue_explain, shape, _strip_session(command))
+
+    # Event loop side
+
+    def start(self, client: AsyncIOMotorClient):
+        """Start explaining sampled queries and saving shapes for the startup audit"""
+        self._client = client
+        self._loop = asyncio.get_running_loop()
+        self._explain_queue = asyncio.Queue(maxsize=1000)
+        self._tasks = [
+            asyncio.create_task(self._explain_loop()),
+            asyncio.create_task(self._flush_loop()),
+        ]
+
+    def _queue_explain(self, shape: str, command: dict):
+        try:
+            self._explain_queue.put_nowait((shape, command))
+        except asyncio.QueueFull:
+            pass
+
+    async def _explain(self, database: str, command: dict, verbosity: str) -> dict:
+        return await self._client[database].command({"explain": command, "verbosity": verbosity})
+
+    async def _explain_loop(self):
+        while True:
+            shape, command = await self._explain_queue.get()
+            stats = self.shapes.get(shape)
+            if stats is None:
+                continue
+            try:
+                summary = _explain_summary(await self._explain(stats.database, command, "executionStats"))
+            except Exception as e:
+                logger.debug(f"Could not explain {shape}: {e}")
+                continue
+            stats.plan = summary
+            if summary["collscan"]:
+                logger.warning(f"🐢 Collection scan: {shape}")
+
+    async def _flush_loop(self):
+        while True:
+            await asyncio.sleep(SHAPE_FLUSH_INTERVAL)
+            await self.flush_shapes()
+
+    async def flush_shapes(self):
+        """Save newly seen shapes so the next startup can audit them"""
+        with self._lock:
+            shapes, self._new_shapes = self._new_shapes, set()
+        if not shapes or not self._client:
+            return
+        for shape in shapes:
+            stats = self.shapes[shape]
+            try:
+                await self._client[stats.database][SHAPES_COLLECTION].update_one(
+                    {"shape": shape},
+                    {
+                        "$set": {"last_seen": datetime.utcnow()},
+                        "$setOnInsert": {
+                            "shape": shape,
+                            "database": stats.database,
+                            # Values are placeholders; only the structure is stored
+                            "command": json_util.dumps(_normalize(stats.command)),
+                        },
+                    },
+                    upsert=True,
+                )
+            except Exception as e:
+                logger.warning(f"Could not save query shape: {e}")
+                return
+
+    async def audit(self, database: str) -> List[dict]:
+        """
+        Explain every query shape seen on earlier runs and flag collection scans
+
+        Uses the queryPlanner verbosity, so no query is executed.
+        """
+        results = []
+        try:
+            saved = await self._client[database][SHAPES_COLLECTION].find({}).to_list(length=None)
+        except Exception as e:
+            logger.warning(f"Query audit skipped: {e}")
+            return results
+
+        for doc in saved:
+            try:
+                command = json_util.loads(doc["command"])
+                summary = _explain_summary(await self._explain(doc["database"], command, "queryPlanner"))
+            except Exception as e:
+                logger.debug(f"Could not explain {doc['shape']}: {e}")
+                continue
+            results.append({"shape": doc["shape"], **summary})
+            if summary["collscan"]:
+                logger.warning(f"🐢 Collection scan: {doc['shape']}")
+
+        self.audit_results = results
+        flagged = sum(result["collscan"] for result in results)
+        logger.info(f"🔎 Query audit: {len(results)} shape(s) explained, {flagged} collection scan(s)")
+        return results
+
+    def top_shapes(self, limit: int = 10) -> List[ShapeStats]:
+        """Shapes that took the most total time"""
+        with self._lock:
+            shapes = list(self.shapes.values())
+        return sorted(shapes, key=lambda stats: stats.total_ms, reverse=True)[:limit]
+
+    async def stop(self):
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks = []
+        await self.flush_shapes()
+
+
+query_monitor = QueryMonitor()
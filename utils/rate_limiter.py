@@ -0,0 +1,49 @@
+"""
+Rate limiter for Phoenix Filter Bot
+Token bucket shared by concurrent senders to stay under Telegram limits
+"""
+
+import asyncio
+import time
+
+
+class RateLimiter:
+    """Async token bucket limiting operations to `rate` per second"""
+
+    def __init__(self, rate: float, burst: int = 1):
+        self.rate = rate
+        self.burst = max(1, burst)
+        self._tokens = float(self.burst)
+        self._updated = time.monotonic()
+        self._paused_until = 0.0
+        self._lock = asyncio.Lock()
+
+    async def acquire(self):
+        """Wait until a token is available and consume it"""
+        async with self._lock:
+            while True:
+                now = time.monotonic()
+
+                # Honour a global pause (e.g. after a FloodWait)
+                if now < self._paused_until:
+                    await asyncio.sleep(self._paused_until - now)
+                    continue
+
+                self._tokens = min(self.burst, self._tokens + (now - self._updated) * self.rate)
+                self._updated = now
+
+                if self._tokens >= 1:
+                    self._tokens -= 1
+                    return
+
+                await asyncio.sleep((1 - self._tokens) / self.rate)
+
+    def pause(self, seconds: float):
+        """Block every acquirer for the given number of seconds"""
+        self._paused_until = max(self._paused_until, time.monotonic() + seconds)
+        self._tokens = 0
+
+
+def get_wait_seconds(error: Exception) -> int:
+    """Duration of a FloodWait/SlowmodeWait (Pyrogram 1.x uses .x, 2.x uses .value)"""
+    return int(getattr(error, "value", None) or getattr(error, "x", 0) or 0)
@@ -0,0 +1,166 @@
+"""
+Recipient reachability tracking for Phoenix Filter Bot
+Classifies delivery failures and marks users who blocked the bot or
+deleted their account so broadcasts and notifications skip them
+"""
+
+import asyncio
+import logging
+from datetime import datetime
+from typing import Iterable
+from motor.motor_asyncio import AsyncIOMotorDatabase
+from pyrogram import Client
+from pyrogram.errors import (
+    FloodWait,
+    SlowmodeWait,
+    UserIsBlocked,
+    InputUserDeactivated,
+    PeerIdInvalid,
+    ChatWriteForbidden,
+    ChannelPrivate,
+    ChannelInvalid,
+)
+
+logger = logging.getLogger(__name__)
+
+# Failure reasons that mean the recipient will never receive messages again
+UNREACHABLE_REASONS = ("blocked", "deactivated", "invalid_peer", "write_forbidden", "chat_private")
+
+REACHABLE_QUERY = {"is_reachable": {"$ne": False}}
+"""Query fragment matching users that can still receive messages"""
+
+
+def classify_send_error(error: Exception) -> str:
+    """
+    Classify a failed send
+
+    Returns:
+        One of "blocked", "deactivated", "invalid_peer", "write_forbidden",
+        "chat_private", "flood", "slowmode" or "other"
+    """
+    if isinstance(error, UserIsBlocked):
+        return "blocked"
+    if isinstance(error, InputUserDeactivated):
+        return "deactivated"
+    if isinstance(error, PeerIdInvalid):
+        return "invalid_peer"
+    if isinstance(error, ChatWriteForbidden):
+        return "write_forbidden"
+    if isinstance(error, (ChannelPrivate, ChannelInvalid)):
+        return "chat_private"
+    if isinstance(error, FloodWait):
+        return "flood"
+    if isinstance(error, SlowmodeWait):
+        return "slowmode"
+    return "other"
+
+
+async def mark_unreachable(db: AsyncIOMotorDatabase, user_ids: Iterable[int], reason: str) -> int:
+    """Mark users unreachable in a single bulk update"""
+    user_ids = list(user_ids)
+    if not user_ids:
+        return 0
+
+    try:
+        result = await db.users.update_many(
+            {"user_id": {"$in": user_ids}},
+            {
+                "$set": {
+                    "is_reachable": False,
+                    "unreachable_reason": reason,
+                    "unreachable_at": datetime.utcnow(),
+                }
+            }
+        )
+        return result.modified_count
+    except Exception as e:
+        logger.error(f"Error marking users unreachable: {e}")
+        return 0
+
+
+async def mark_reachable(db: AsyncIOMotorDatabase, user_id: int) -> bool:
+    """Clear the unreachable flag once a user talks to the bot again"""
+    try:
+        result = await db.users.update_one(
+            {"user_id": user_id, "is_reachable": False},
+            {
+                "$set": {"is_reachable": True},
+                "$unset": {"unreachable_reason": "", "unreachable_at": ""},
+            }
+        )
+        return result.modified_count > 0
+    except Exception as e:
+        logger.error(f"Error marking user reachable: {e}")
+        return False
+
+
+async def notify_user(client: Client, db: AsyncIOMotorDatabase, user_id: int, text: str) -> bool:
+    """
+    Send a notification unless the user is known to be unreachable
+
+    Returns:
+        True if the message was delivered
+    """
+    try:
+        user = await db.users.find_one({"user_id": user_id}, {"is_reachable": 1})
+        if user and user.get("is_reachable") is False:
+            logger.debug(f"Skipping notification to unreachable user {user_id}")
+            return False
+
+        await client.send_message(user_id, text)
+        return True
+    except Exception as e:
+        reason = classify_send_error(e)
+        if reason in UNREACHABLE_REASONS:
+            await mark_unreachable(db, [user_id], reason)
+        logger.warning(f"Could not notify user {user_id}: {e}")
+        return False
+
+
+async def get_audience_report(db: AsyncIOMotorDatabase) -> dict:
+    """Count reachable and unreachable users, grouped by failure reason"""
+    report = {"total": 0, "reachable": 0, "unreachable": 0, "reasons": {}}
+
+    pipeline = [
+        {"$match": {"is_banned": {"$ne": True}}},
+        {"$group": {"_id": "$unreachable_reason", "count": {"$sum": 1}}},
+    ]
+
+    async for row in db.users.aggregate(pipeline):
+        report["total"] += row["count"]
+        if row["_id"] is None:
+            report["reachable"] += row["count"]
+        else:
+            report["unreachable"] += row["count"]
+            report["reasons"][row["_id"]] = row["count"]
+
+    return report
+
+
+def format_audience_report(report: dict) -> str:
+    """Format an audience report for display"""
+    total = report["total"]
+    percent = (report["reachable"] / total * 100) if total else 0
+
+    text = (
+        f"📡 **Audience Reachability**\n\n"
+        f"👥 Total Users: {total}\n"
+        f"✅ Reachable: {report['reachable']} ({percent:.1f}%)\n"
+        f"❌ Unreachable: {report['unreachable']}\n"
+    )
+    for reason, count in sorted(report["reasons"].items(), key=lambda x: -x[1]):
+        text += f"  • {reason}: {count}\n"
+    return text
+
+
+async def run_audience_reports(client: Client, db: AsyncIOMotorDatabase, chat_id: int, interval_hours: float):
+    """Periodically post the audience report to a chat"""
+    while True:
+        await asyncio.sleep(interval_hours * 3600)
+        try:
+            report = await get_audience_report(db)
+            await client.send_message(chat_id, format_audience_report(report))
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            logger.error(f"Error sending audience report: {e}")
@@ -0,0 +1,190 @@
+"""
+Release-name normalizer for Phoenix Filter Bot
+Turns "Superman.2013.1080p.WEB-DL.x264-GROUP.mkv" into search tokens and
+structured fields once, at index time, and normalizes queries the same way.
+"""
+
+import re
+import unicodedata
+from dataclasses import dataclass, field
+from datetime import datetime
+from typing import Dict, List, Optional
+
+EXTENSIONS = {
+    "mkv", "mp4", "avi", "m4v", "webm", "mov", "wmv", "flv", "ts", "mpg", "mpeg",
+    "mp3", "m4a", "flac", "srt", "ass", "zip", "rar", "7z", "pdf", "epub", "apk",
+}
+
+# Spellings folded to one token before splitting, so "WEB-DL", "web dl" and
+# "WEBDL" all become "webdl"; order matters where patterns overlap
+CANONICAL = [
+    (re.compile(r"\b(?:web[ ._-]?dl)\b"), "webdl"),
+    (re.compile(r"\b(?:web[ ._-]?rip)\b"), "webrip"),
+    (re.compile(r"\b(?:blu[ ._-]?ray|bdrip|brrip|bd[ ._-]?rip)\b"), "bluray"),
+    (re.compile(r"\b(?:hd[ ._-]?rip)\b"), "hdrip"),
+    (re.compile(r"\b(?:dvd[ ._-]?rip|dvdscr)\b"), "dvdrip"),
+    (re.compile(r"\b(?:hd[ ._-]?cam|cam[ ._-]?rip)\b"), "cam"),
+    (re.compile(r"\b(?:[xh][ ._-]?264|avc)\b"), "x264"),
+    (re.compile(r"\b(?:[xh][ ._-]?265|hevc)\b"), "x265"),
+    (re.compile(r"\b(ddp?|dts|aac|ac3|eac3)[ ._-]?([257])[ ._-]([01])\b"), r"\1\2\3"),
+    (re.compile(r"\b(480|576|720|1080|2160)[pi]\b"), r"\1p"),
+    (re.compile(r"\b(?:4k|uhd)\b"), "2160p"),
+    (re.compile(r"\bdual[ ._-]?audio\b"), "dual"),
+    (re.compile(r"\bs(\d{1,2})[ ._-]?e(\d{1,3})\b"), lambda m: f"s{int(m[1]):02d}e{int(m[2]):02d}"),
+    (re.compile(r"\b(\d{1,2})x(\d{2,3})\b"), lambda m: f"s{int(m[1]):02d}e{int(m[2]):02d}"),
+    (re.compile(r"\b(?:s|season[ ._-]?)(\d{1,2})\b"), lambda m: f"s{int(m[1]):02d}"),
+]
+
+RESOLUTIONS = {"480p", "576p", "720p", "1080p", "2160p"}
+CODECS = {"x264", "x265", "av1", "xvid", "divx", "vp9"}
+SOURCES = {"webdl", "webrip", "bluray", "hdrip", "hdtv", "dvdrip", "cam", "hdts", "predvd"}
+LANGUAGES = {
+    "english": "english", "eng": "english",
+    "hindi": "hindi", "hin": "hindi",
+    "tamil": "tamil", "tam": "tamil",
+    "telugu": "telugu", "tel": "telugu",
+    "malayalam": "malayalam", "mal": "malayalam",
+    "kannada": "kannada", "kan": "kannada",
+    "bengali": "bengali", "marathi": "marathi", "punjabi": "punjabi", "urdu": "urdu",
+    "korean": "korean", "kor": "korean",
+    "japanese": "japanese", "jap": "japanese", "jpn": "japanese",
+    "chinese": "chinese", "mandarin": "chinese",
+    "spanish": "spanish", "spa": "spanish",
+    "french": "french", "fre": "french",
+    "german": "german", "ger": "german",
+    "italian": "italian", "ita": "italian",
+    "russian": "russian", "rus": "russian",
+    "arabic": "arabic", "turkish": "turkish", "portuguese": "portuguese",
+    "dual": "dual", "multi": "multi",
+}
+
+_SEASON_EPISODE = re.compile(r"^s(\d{1,2})e(\d{1,3})$")
+_SEASON = re.compile(r"^s(\d{1,2})$")
+_YEAR = re.compile(r"^(19\d\d|20\d\d)$")
+_TOKEN = re.compile(r"[^\W_]+")
+
+
+def _fold(text: str) -> str:
+    """Lowercase and strip accents"""
+    text = unicodedata.normalize("NFKD", text.lower())
+    return "".join(char for char in text if not unicodedata.combining(char))
+
+
+def _strip_extension(name: str) -> str:
+    stem, dot, extension = name.rpartition(".")
+    return stem if dot and extension.lower() in EXTENSIONS else name
+
+
+def tokenize(text: Optional[str], languages: bool = True) -> List[str]:
+    """
+    Normalized tokens of a release name or query, in order
+
+    With languages, short language names become the full name ("tam" is
+    "tamil"); pass False for words that may be the start of a longer one.
+    """
+    if not text:
+        return []
+    text = _fold(text).replace("_", " ")
+    for pattern, replacement in CANONICAL:
+        text = pattern.sub(replacement, text)
+    tokens = _TOKEN.findall(text)
+    if not languages:
+        return tokens
+    return [LANGUAGES.get(token, token) for token in tokens]
+
+
+@dataclass
+class ReleaseInfo:
+    """What a release name says about the file"""
+    title: str = ""
+    title_tokens: List[str] = field(default_factory=list)
+    year: Optional[int] = None
+    season: Optional[int] = None
+    episode: Optional[int] = None
+    resolution: Optional[str] = None
+    codec: Optional[str] = None
+    source: Optional[str] = None
+    languages: List[str] = field(default_factory=list)
+
+
+def parse_release_name(name: Optional[str]) -> ReleaseInfo:
+    """
+    Split a release name into title and attributes
+
+    The title is everything before the first year, episode, resolution,
+    source or codec marker. A year that is the first word ("1917") is
+    treated as part of the title.
+    """
+    info = ReleaseInfo()
+    tokens = tokenize(_strip_extension(name or ""))
+    max_year = datetime.utcnow().year + 1
+    title_end = None
+
+    for position, token in enumerate(tokens):
+        marker = True
+        match = _SEASON_EPISODE.match(token)
+        if match:
+            info.season = info.season or int(match.group(1))
+            info.episode = info.episode or int(match.group(2))
+        elif _SEASON.match(token):
+            info.season = info.season or int(token[1:])
+        elif _YEAR.match(token) and position > 0 and int(token) <= max_year:
+            info.year = int(token)
+        elif token in RESOLUTIONS:
+            info.resolution = info.resolution or token
+        elif token in CODECS:
+            info.codec = info.codec or token
+        elif token in SOURCES:
+            info.source = info.source or token
+        elif token in LANGUAGES.values() and position > 0:
+            if token not in info.languages:
+                info.languages.append(token)
+        else:
+            marker = False
+        if marker and title_end is None:
+            title_end = position
+
+    info.title_tokens = tokens[:title_end] if title_end is not None else tokens
+    info.title = " ".join(info.title_tokens)
+    return info
+
+
+def search_fields(file_doc: dict) -> Dict:
+    """
+    Precomputed search fields for a file document
+
+    tokens holds every normalized word of the file name, custom name and
+    caption, attributes included ("2013", "1080p", "hindi"), so one
+    multikey index answers every query; the structured fields are for
+    display, filtering and ranking.
+    """
+    name = file_doc.get("custom_name") or file_doc.get("file_name") or ""
+    info = parse_release_name(name)
+    if not info.title_tokens and file_doc.get("caption"):
+        # Names like "video.mp4" carry nothing; the caption usually has the release name
+        info = parse_release_name(file_doc["caption"].split("\n", 1)[0])
+
+    tokens = []
+    seen = set()
+    for text in (file_doc.get("file_name"), file_doc.get("custom_name"), file_doc.get("caption")):
+        for token in tokenize(_strip_extension(text) if text else None):
+            if token not in seen:
+                seen.add(token)
+                tokens.append(token)
+            match = _SEASON_EPISODE.match(token)
+            if match and f"s{match.group(1)}" not in seen:
+                # "s01" on its own finds every episode of the season
+                seen.add(f"s{match.group(1)}")
+                tokens.append(f"s{match.group(1)}")
+
+    return {
+        "tokens": tokens,
+        "title": info.title,
+        "year": info.year,
+        "season": info.season,
+        "episode": info.episode,
+        "resolution": info.resolution,
+        "codec": info.codec,
+        "source": info.source,
+        "languages": info.languages,
+    }
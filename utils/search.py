@@ -3,13 +3,86 @@ Search Engine for Phoenix Filter Bot
 Handles file searching and indexing
 """
 
+import asyncio
 import logging
-from typing import List, Optional
+import re
+import time
+from datetime import datetime
+from typing import FrozenSet, List, Optional, Tuple
 from motor.motor_asyncio import AsyncIOMotorClient, AsyncIOMotorDatabase
+from pymongo import ASCENDING, DESCENDING, UpdateOne
+from pymongo.errors import OperationFailure
 from database.models import File
+from utils.cache import TTLCache
+from utils.counters import DownloadCounter
+from utils.ranking import Ranker, TermStats
+from utils.release_names import search_fields, tokenize
+from utils.spelling import SpellIndex
+from utils.tenants import TenantContext
+from utils.visibility import ChannelVisibility
 
 logger = logging.getLogger(__name__)
 
+# Entries hold a whole ranked result list (50 files for chat searches)
+RESULT_CACHE_SIZE = 2000
+RESULT_CACHE_TTL = 60
+BACKFILL_BATCH_SIZE = 1000
+# MongoDB error code for a unique index violation
+DUPLICATE_KEY = 11000
+# Matches fetched per query for ranking, in CANDIDATE_ORDER. This is a ceiling:
+# when a broad query ("avengers", "2019") matches more files, only the most
+# popular (then newest) CANDIDATE_LIMIT are ranked, and a closer title match
+# among the rest is never shown
+CANDIDATE_LIMIT = 200
+# Stored popularity is decayed only up to each file's last download, which is
+# close enough to pick candidates; ranking decays it to the time of the query
+CANDIDATE_ORDER = [("popularity", DESCENDING), ("indexed_at", DESCENDING)]
+VOCABULARY_REFRESH_INTERVAL = 6 * 3600
+# Shorter last words are matched whole; a prefix that short matches too much of the index
+MIN_PREFIX_LENGTH = 3
+
+
+def split_query(query: str) -> Tuple[List[str], Optional[str]]:
+    """
+    Normalized words of a query: (whole words, prefix)
+    
+    The last word is a prefix, so "super" still finds "Superman", unless it
+    is too short to be one. The prefix is taken as typed, not as a language
+    alias: "mal" finds "Maleficent" as well as "Malayalam".
+    """
+    words = tokenize(query)
+    if not words:
+        return [], None
+    *whole, last = words
+    if len(last) >= MIN_PREFIX_LENGTH:
+        return whole, tokenize(query, languages=False)[-1]
+    return whole + [last], None
+
+
+def query_criteria(terms: List[str], prefix: Optional[str], channels: Optional[FrozenSet[int]] = None) -> dict:
+    """MongoDB filter: every term is a token of the file, and some token starts with prefix"""
+    criteria = {}
+    if terms:
+        criteria["tokens"] = {"$all": terms}
+    if prefix:
+        # Anchored, so it is a range scan on the tokens index
+        prefix_criteria = {"tokens": {"$regex": f"^{re.escape(prefix)}"}}
+        if terms:
+            criteria["$and"] = [prefix_criteria]
+        else:
+            criteria.update(prefix_criteria)
+    if channels is not None:
+        criteria["channel_id"] = {"$in": sorted(channels)}
+    return criteria
+
+
+def prepare_file(file_data: dict) -> dict:
+    """Add the fields index_file stores with every file to file_data, in place"""
+    file_data.update(search_fields(file_data))
+    file_data.setdefault("indexed_at", datetime.utcnow())
+    file_data.setdefault("download_count", 0)
+    return file_data
+
 
 class SearchEngine:
     """Search engine for finding files in the database"""
@@ -17,38 +90,230 @@ class SearchEngine:
     def __init__(self, db: AsyncIOMotorDatabase):
         self.db = db
         self.files_collection = db.files
+        self.download_counter = DownloadCounter(self.files_collection)
+        self.visibility = ChannelVisibility(db)
+        # Term statistics for ranking and the spelling vocabulary, rebuilt together
+        self.term_stats = TermStats(self.files_collection)
+        self.ranker = Ranker(self.term_stats)
+        self.spelling = SpellIndex()
+        # Keyed by channel set, not tenant, so clones seeing the same channels share entries
+        self.result_cache = TTLCache(maxsize=RESULT_CACHE_SIZE, ttl=RESULT_CACHE_TTL)
+        self._backfill_task: Optional[asyncio.Task] = None
+        self._vocabulary_task: Optional[asyncio.Task] = None
     
-    async def search(self, query: str, limit: int = 10) -> List[dict]:
+    async def ensure_indexes(self):
+        """
+        Create the indexes the shared files index relies on
+        
+        Each step runs on its own, so one failing does not skip the others;
+        the visibility backfill in particular decides what the main bot sees.
+        """
+        steps = [
+            ("channel visibility", self._ensure_visibility),
+            ("unique channel message index", self._ensure_message_index),
+            ("file_id index", lambda: self.files_collection.create_index("file_id")),
+            # Serves CANDIDATE_ORDER for the matches of a query's first term
+            ("tokens index", lambda: self.files_collection.create_index([("tokens", ASCENDING), *CANDIDATE_ORDER])),
+            ("indexed_at backfill", self.backfill_indexed_at),
+        ]
+        for name, step in steps:
+            try:
+                await step()
+            except Exception as e:
+                logger.warning(f"Could not prepare the {name}: {e}")
+        
+        if await self.files_collection.find_one({"tokens": {"$exists": False}}, {"_id": 1}):
+            # Large indexes take a while; search what is ready meanwhile
+            self._backfill_task = asyncio.create_task(self.backfill_search_fields())
+    
+    async def _ensure_visibility(self):
+        await self.visibility.ensure_indexes()
+        await self.visibility.backfill()
+    
+    async def _ensure_message_index(self):
+        try:
+            await self.files_collection.create_index(
+                [("channel_id", ASCENDING), ("message_id", ASCENDING)], unique=True, sparse=True
+            )
+        except OperationFailure as e:
+            if e.code != DUPLICATE_KEY:
+                raise
+            logger.warning("Files indexed more than once block the unique message index; run /dedupe_files")
+    
+    async def remove_duplicate_messages(self) -> int:
+        """
+        Delete extra copies of a channel message, keeping the first indexed
+        
+        index_file used to insert a message again every time its channel
+        was indexed. The copies' download counts are added to the one kept,
+        and each removed _id is recorded in file_aliases with duplicate_of
+        pointing at it, so download buttons already sent for a copy still
+        resolve. Run by admins with /dedupe_files.
+        
+        Returns:
+            Number of documents deleted
+        """
+        removed = 0
+        async for group in self.files_collection.aggregate(
+            [
+                {"$match": {"channel_id": {"$ne": None}, "message_id": {"$ne": None}}},
+                {"$group": {
+                    "_id": {"channel_id": "$channel_id", "message_id": "$message_id"},
+                    "ids": {"$push": "$_id"},
+                    "downloads": {"$sum": {"$ifNull": ["$download_count", 0]}},
+                }},
+                {"$match": {"ids.1": {"$exists": True}}},
+            ],
+            allowDiskUse=True,
+        ):
+            keep, *extra = sorted(group["ids"])
+            await self.db.file_aliases.bulk_write(
+                [UpdateOne({"_id": _id}, {"$set": {"duplicate_of": keep}}, upsert=True) for _id in extra],
+                ordered=False,
+            )
+            await self.files_collection.update_one({"_id": keep}, {"$set": {"download_count": group["downloads"]}})
+            removed += (await self.files_collection.delete_many({"_id": {"$in": extra}})).deleted_count
+            logger.info(f"Merged duplicate file(s) {', '.join(map(str, extra))} into {keep}")
+        if removed:
+            self.result_cache.clear()
+            logger.info(f"Removed {removed} duplicate file(s) from the index")
+            await self._ensure_message_index()
+        return removed
+    
+    async def backfill_indexed_at(self) -> int:
+        """Date files indexed before indexed_at was stored by their ObjectId's creation time"""
+        result = await self.files_collection.update_many(
+            {"indexed_at": {"$exists": False}},
+            [{"$set": {"indexed_at": {"$toDate": "$_id"}}}],
+        )
+        if result.modified_count:
+            logger.info(f"Dated {result.modified_count} file(s) by when they were indexed")
+        return result.modified_count
+    
+    async def backfill_search_fields(self) -> int:
+        """Add search fields to files indexed before they existed"""
+        updated = 0
+        projection = {"file_name": 1, "custom_name": 1, "caption": 1}
+        try:
+            while True:
+                batch = await self.files_collection.find(
+                    {"tokens": {"$exists": False}}, projection
+                ).limit(BACKFILL_BATCH_SIZE).to_list(length=BACKFILL_BATCH_SIZE)
+                if not batch:
+                    break
+                await self.files_collection.bulk_write(
+                    [UpdateOne({"_id": doc["_id"]}, {"$set": search_fields(doc)}) for doc in batch],
+                    ordered=False,
+                )
+                updated += len(batch)
+                if updated % (BACKFILL_BATCH_SIZE * 100) == 0:
+                    logger.info(f"Search fields added to {updated} files so far")
+            self.result_cache.clear()
+            # Rebuild term statistics on the next search
+            self.term_stats.loaded_at = None
+            logger.info(f"✅ Search fields added to {updated} files")
+        except Exception as e:
+            logger.error(f"Search fields backfill stopped after {updated} files: {e}")
+        return updated
+    
+    async def refresh_vocabulary(self):
+        """Recount term statistics and rebuild the spelling index from them"""
+        started = time.perf_counter()
+        await self.term_stats.refresh()
+        await self.spelling.rebuild(self.term_stats.document_frequency.items())
+        logger.info(
+            f"Search vocabulary: {len(self.term_stats.document_frequency)} terms over "
+            f"{self.term_stats.documents} files in {time.perf_counter() - started:.1f}s"
+        )
+    
+    def _maybe_refresh_vocabulary(self):
+        """Refresh in the background when missing or stale; searches go on with what is loaded"""
+        if self._vocabulary_task and not self._vocabulary_task.done():
+            return
+        loaded_at = self.term_stats.loaded_at
+        if loaded_at is not None and time.monotonic() - loaded_at < VOCABULARY_REFRESH_INTERVAL:
+            return
+        self._vocabulary_task = asyncio.create_task(self._refresh_vocabulary_logged())
+    
+    async def _refresh_vocabulary_logged(self):
+        try:
+            await self.refresh_vocabulary()
+        except Exception as e:
+            # Retry in five minutes rather than on every search
+            self.term_stats.loaded_at = time.monotonic() - VOCABULARY_REFRESH_INTERVAL + 300
+            logger.error(f"Could not build the search vocabulary: {e}")
+    
+    async def search(self, query: str, limit: int = 10, channels: Optional[FrozenSet[int]] = None) -> List[dict]:
         """
         Search for files matching the query
         
         Args:
             query: Search query string
             limit: Maximum number of results
+            channels: Only return files from these channels (None searches everything)
         
         Returns:
-            List of matching files
+            List of matching files, best match first
         """
-        try:
-            # Search in file name and custom name
-            results = await self.files_collection.find({
-                "$or": [
-                    {"file_name": {"$regex": query, "$options": "i"}},
-                    {"custom_name": {"$regex": query, "$options": "i"}},
-                    {"caption": {"$regex": query, "$options": "i"}},
-                ]
-            }).limit(limit).to_list(length=limit)
-            
-            logger.info(f"Search for '{query}' returned {len(results)} results")
-            return results
-        except Exception as e:
-            logger.error(f"Search error: {e}")
+        if channels is not None and not channels:
+            return []
+        
+        terms, prefix = split_query(query)
+        if not terms and not prefix:
+            return []
+        self._maybe_refresh_vocabulary()
+        
+        # Queries that normalize the same ("Superman 2013", "superman.2013") share an entry
+        cache_key = (channels, tuple(terms), prefix, limit)
+        results = self.result_cache.get(cache_key)
+        if results is None:
+            try:
+                candidates = await self.files_collection.find(
+                    query_criteria(terms, prefix, channels)
+                ).sort(CANDIDATE_ORDER).limit(CANDIDATE_LIMIT).to_list(length=CANDIDATE_LIMIT)
+            except Exception as e:
+                logger.error(f"Search error: {e}")
+                return []
+            # BM25 plus popularity and recency boosts
+            results = self.ranker.rank(terms, prefix, candidates, limit)
+            self.result_cache.set(cache_key, results)
+        
+        logger.info(f"Search for '{query}' returned {len(results)} results")
+        return [self.download_counter.merge(file) for file in results]
+    
+    async def search_for(self, tenant: TenantContext, query: str, limit: int = 10) -> List[dict]:
+        """Search the files a tenant's channels make visible"""
+        channels = await self.visibility.channels_for(tenant)
+        return await self.search(query, limit=limit, channels=channels)
+    
+    async def suggest_for(self, tenant: TenantContext, query: str, limit: int = 3) -> List[str]:
+        """
+        Spelling corrections of a query that have results for this tenant
+        
+        The vocabulary covers every bot's files, so each suggestion is
+        checked against the tenant's own channels before it is offered.
+        """
+        self._maybe_refresh_vocabulary()
+        channels = await self.visibility.channels_for(tenant)
+        if channels is not None and not channels:
             return []
+        suggestions = []
+        for text in await self.spelling.suggest(query, limit=limit * 2):
+            if await self.files_collection.find_one(query_criteria(*split_query(text), channels), {"_id": 1}):
+                suggestions.append(text)
+                if len(suggestions) >= limit:
+                    break
+        return suggestions
     
     async def index_file(self, file_data: dict) -> bool:
         """
         Index a new file in the database
         
+        A channel message is stored once however many bots index it; which
+        bots can see it is tracked per channel by ChannelVisibility. The
+        release name is normalized here, once, into the fields search uses,
+        and indexed_at is set for the ranking's recency boost.
+        
         Args:
             file_data: File information dictionary
         
@@ -56,8 +321,21 @@ class SearchEngine:
             True if successful, False otherwise
         """
         try:
-            result = await self.files_collection.insert_one(file_data)
-            logger.info(f"Indexed file: {file_data.get('file_name')} (ID: {result.inserted_id})")
+            prepare_file(file_data)
+            if file_data.get("channel_id") is not None and file_data.get("message_id") is not None:
+                result = await self.files_collection.update_one(
+                    {"channel_id": file_data["channel_id"], "message_id": file_data["message_id"]},
+                    {"$setOnInsert": file_data},
+                    upsert=True,
+                )
+                doc_id = result.upserted_id
+            else:
+                doc_id = (await self.files_collection.insert_one(file_data)).inserted_id
+            if doc_id is not None:
+                self.term_stats.add(file_data["tokens"])
+                self.spelling.add(file_data["tokens"])
+            self.result_cache.clear()
+            logger.info(f"Indexed file: {file_data.get('file_name')} (ID: {doc_id})")
             return True
         except Exception as e:
             logger.error(f"Indexing error: {e}")
@@ -67,28 +345,32 @@ class SearchEngine:
         """Get file information by file ID"""
         try:
             file = await self.files_collection.find_one({"file_id": file_id})
-            return file
+            return self.download_counter.merge(file) if file else None
         except Exception as e:
             logger.error(f"Error getting file: {e}")
             return None
     
     async def update_download_count(self, file_id: str) -> bool:
-        """Update the download count for a file"""
-        try:
-            result = await self.files_collection.update_one(
-                {"file_id": file_id},
-                {"$inc": {"download_count": 1}}
-            )
-            return result.modified_count > 0
-        except Exception as e:
-            logger.error(f"Error updating download count: {e}")
-            return False
+        """
+        Update the download count for a file
+        The increment is buffered and written in bulk by the download counter
+        """
+        self.download_counter.increment(file_id)
+        return True
     
     async def get_popular_files(self, limit: int = 10) -> List[dict]:
         """Get most downloaded files"""
         try:
             results = await self.files_collection.find({}).sort("download_count", -1).limit(limit).to_list(length=limit)
-            return results
+            return [self.download_counter.merge(file) for file in results]
         except Exception as e:
             logger.error(f"Error getting popular files: {e}")
             return []
+    
+    async def close(self):
+        """Flush buffered writes before shutdown"""
+        if self._backfill_task:
+            self._backfill_task.cancel()
+        if self._vocabulary_task:
+            self._vocabulary_task.cancel()
+        await self.download_counter.close()
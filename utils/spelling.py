@@ -0,0 +1,194 @@
+"""
+Spelling suggestions for Phoenix Filter Bot
+A trigram index over the words of indexed files, used to turn a query with
+typos ("supermen 2013") into queries that have results ("superman 2013").
+Runs in-process; no external service.
+"""
+
+import asyncio
+from array import array
+from collections import Counter
+from typing import Dict, Iterable, List, Tuple
+from utils.release_names import tokenize
+
+# Words shorter than this are not corrected; too many words are one edit away
+MIN_WORD_LENGTH = 3
+CANDIDATES_PER_WORD = 3
+# Full edit-distance comparisons per word at most
+MAX_COMPARISONS = 300
+# Unknown words looked up per query; the rest of a long query is kept as typed
+MAX_CORRECTED_WORDS = 4
+# Partial corrections kept after each word, so the work grows linearly with the query
+BEAM_WIDTH = 6
+
+
+def trigrams(word: str) -> List[str]:
+    padded = f"${word}$"
+    return [padded[i:i + 3] for i in range(len(padded) - 2)]
+
+
+def max_distance(word: str) -> int:
+    """Edits allowed for a word: one for short words, two otherwise"""
+    return 1 if len(word) <= 5 else 2
+
+
+def edit_distance(a: str, b: str, limit: int) -> int:
+    """
+    Optimal string alignment distance (a swap of neighbours is one edit)
+
+    Returns limit + 1 as soon as the distance is known to exceed limit.
+    """
+    if abs(len(a) - len(b)) > limit:
+        return limit + 1
+    previous2 = None
+    previous = list(range(len(b) + 1))
+    for i in range(1, len(a) + 1):
+        current = [i] + [0] * len(b)
+        row_min = i
+        for j in range(1, len(b) + 1):
+            cost = 0 if a[i - 1] == b[j - 1] else 1
+            current[j] = min(previous[j] + 1, current[j - 1] + 1, previous[j - 1] + cost)
+            if previous2 is not None and i > 1 and j > 1 and a[i - 1] == b[j - 2] and a[i - 2] == b[j - 1]:
+                current[j] = min(current[j], previous2[j - 2] + 1)
+            row_min = min(row_min, current[j])
+        if row_min > limit:
+            return limit + 1
+        previous2, previous = previous, current
+    return previous[-1]
+
+
+class SpellIndex:
+    """Vocabulary of indexed words with a trigram index for fuzzy lookups"""
+
+    def __init__(self):
+        # Word IDs index words and counts; postings hold word IDs per trigram
+        self.words: List[str] = []
+        self.counts = array("I")
+        self.ids: Dict[str, int] = {}
+        self.postings: Dict[str, array] = {}
+
+    def __len__(self) -> int:
+        return len(self.words)
+
+    def __contains__(self, word: str) -> bool:
+        return word in self.ids
+
+    def _add_word(self, word: str, count: int):
+        word_id = self.ids.get(word)
+        if word_id is not None:
+            self.counts[word_id] += count
+            return
+        word_id = len(self.words)
+        self.ids[word] = word_id
+        self.words.append(word)
+        self.counts.append(count)
+        for gram in set(trigrams(word)):
+            self.postings.setdefault(gram, array("I")).append(word_id)
+
+    @staticmethod
+    def _eligible(word: str) -> bool:
+        return len(word) >= MIN_WORD_LENGTH and word.isalpha()
+
+    def add(self, tokens: Iterable[str]):
+        """Add the words of a newly indexed file"""
+        for word in tokens:
+            if self._eligible(word):
+                self._add_word(word, 1)
+
+    def _built(self, rows: Iterable[Tuple[str, int]]) -> "SpellIndex":
+        fresh = SpellIndex()
+        for word, count in rows:
+            if self._eligible(word):
+                fresh._add_word(word, count)
+        return fresh
+
+    def _adopt(self, fresh: "SpellIndex"):
+        self.words, self.counts, self.ids, self.postings = fresh.words, fresh.counts, fresh.ids, fresh.postings
+
+    def build(self, rows: Iterable[Tuple[str, int]]):
+        """Replace the vocabulary with (word, file count) rows"""
+        self._adopt(self._built(rows))
+
+    async def rebuild(self, rows: Iterable[Tuple[str, int]]):
+        """build() in a worker thread; the result is swapped in on the loop"""
+        rows = list(rows)
+        fresh = await asyncio.get_running_loop().run_in_executor(None, self._built, rows)
+        self._adopt(fresh)
+
+    def candidates(self, word: str, limit: int = CANDIDATES_PER_WORD) -> List[Tuple[str, int]]:
+        """
+        Known words close to word, as (word, distance), best first
+
+        An edit changes at most three trigrams, a swap of neighbours four,
+        so a word within d edits shares all but 4*d of them; only words
+        with enough shared trigrams are compared in full.
+        """
+        limit_distance = max_distance(word)
+        grams = trigrams(word)
+        shared = Counter()
+        for gram in set(grams):
+            postings = self.postings.get(gram)
+            if postings:
+                shared.update(postings)
+
+        needed = max(1, len(grams) - 4 * limit_distance)
+        scored = []
+        # Most shared trigrams first; short words share one with thousands of others
+        for word_id, count in shared.most_common(MAX_COMPARISONS):
+            if count < needed:
+                break
+            candidate = self.words[word_id]
+            if candidate == word or abs(len(candidate) - len(word)) > limit_distance:
+                continue
+            distance = edit_distance(word, candidate, limit_distance)
+            if distance <= limit_distance:
+                scored.append((distance, -self.counts[word_id], candidate))
+        scored.sort()
+        return [(candidate, distance) for distance, _, candidate in scored[:limit]]
+
+    def corrections(self, query: str, limit: int = 3) -> List[str]:
+        """
+        Corrected versions of a query, most likely first
+
+        Known words, numbers and short words are kept; the first
+        MAX_CORRECTED_WORDS unknown words are replaced by their nearest
+        known words. Corrections are built word by word, keeping the
+        BEAM_WIDTH best so far (fewest edits, then the rarest corrected
+        word most common). Empty if nothing needs fixing.
+        """
+        # (edits, -count of the rarest corrected word, words)
+        beams: List[Tuple[int, float, Tuple[str, ...]]] = [(0, -float("inf"), ())]
+        looked_up = 0
+        for word in tokenize(query):
+            found = []
+            if word not in self.ids and self._eligible(word) and looked_up < MAX_CORRECTED_WORDS:
+                looked_up += 1
+                found = self.candidates(word)
+            if not found:
+                beams = [(distance, popularity, words + (word,)) for distance, popularity, words in beams]
+                continue
+            expanded = []
+            for distance, popularity, words in beams:
+                for candidate, edits in found:
+                    count = self.counts[self.ids[candidate]]
+                    expanded.append((distance + edits, max(popularity, -count), words + (candidate,)))
+            expanded.sort()
+            beams = expanded[:BEAM_WIDTH]
+
+        suggestions = []
+        for distance, _, words in beams:
+            if not distance:
+                break
+            text = " ".join(words)
+            if text not in suggestions:
+                suggestions.append(text)
+            if len(suggestions) >= limit:
+                break
+        return suggestions
+
+    async def suggest(self, query: str, limit: int = 3) -> List[str]:
+        """corrections() in a worker thread, against the vocabulary as it is now"""
+        # A rebuild swaps in new structures; the snapshot keeps using the old ones
+        snapshot = SpellIndex()
+        snapshot._adopt(self)
+        return await asyncio.get_running_loop().run_in_executor(None, snapshot.corrections, query, limit)
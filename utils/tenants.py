@@ -0,0 +1,66 @@
+"""
+Tenant contexts for Phoenix Filter Bot
+The main bot and every running clone share one set of handlers, database
+connections and caches; the tenant attached to each client tells the
+handlers which bot an update arrived on.
+"""
+
+import inspect
+from dataclasses import dataclass, field
+from typing import Callable, Optional, Set
+from pyrogram import Client
+
+MAIN_TENANT_ID = "main"
+
+
+@dataclass
+class TenantContext:
+    """Per-bot settings seen by shared handlers"""
+    tenant_id: str
+    owner_id: Optional[int] = None
+    features: dict = field(default_factory=dict)
+    settings: dict = field(default_factory=dict)
+
+    @property
+    def is_clone(self) -> bool:
+        return self.tenant_id != MAIN_TENANT_ID
+
+    def has_feature(self, name: str) -> bool:
+        """Whether the owner left a feature enabled (everything is on for the main bot)"""
+        return self.features.get(name, True)
+
+    @classmethod
+    def from_clone(cls, clone_doc: dict) -> "TenantContext":
+        return cls(
+            tenant_id=clone_doc["clone_id"],
+            owner_id=clone_doc.get("owner_id"),
+            features=clone_doc.get("features", {}),
+            settings=clone_doc.get("settings", {}),
+        )
+
+
+MAIN_TENANT = TenantContext(MAIN_TENANT_ID)
+
+# Callbacks that must only run on the main bot
+_main_only: Set[Callable] = set()
+
+
+def get_tenant(client: Client) -> TenantContext:
+    """Get the tenant a client serves"""
+    return getattr(client, "tenant", MAIN_TENANT)
+
+
+def main_bot_only(callback: Callable) -> Callable:
+    """
+    Keep a handler off clones
+
+    Use for handlers that track state of the main bot itself (reachability,
+    membership) or manage the clone fleet. Apply below the on_* decorator.
+    """
+    _main_only.add(callback)
+    return callback
+
+
+def is_main_only(callback: Callable) -> bool:
+    # Look through wrappers such as the metrics timing wrapper
+    return inspect.unwrap(callback) in _main_only
@@ -0,0 +1,152 @@
+"""
+Traffic recorder for Phoenix Filter Bot
+Writes anonymized metadata of incoming updates to a small rotating file,
+so the benchmark replayer can reproduce real query mixes and bursts.
+
+One JSON array per line: [time_ms, kind, user, chat_type, payload, is_admin]
+- kind: "m" message or "c" callback query
+- user: keyed hash of the user ID; the key changes every run
+- chat_type: "p" private, "g" group, "s" supergroup, "c" channel
+- payload: normalized search text, bare /command, or callback data with
+  identifiers replaced by "route#hash"; a trailing page number stays
+  readable as "route#hash_n"
+
+Lines are handed to a background thread for writing, so recording never
+blocks the event loop on disk I/O.
+"""
+
+import hashlib
+import hmac
+import json
+import logging
+import os
+import queue
+import re
+import secrets
+import time
+from logging.handlers import QueueHandler, QueueListener, RotatingFileHandler
+from pyrogram import Client
+from pyrogram.handlers import CallbackQueryHandler, MessageHandler
+from pyrogram.types import CallbackQuery, Message
+from config import ADMINS, TRAFFIC_RECORD_DIR, TRAFFIC_RECORD_FILES, TRAFFIC_RECORD_MAX_MB
+from utils.callback_router import callback_router
+
+logger = logging.getLogger(__name__)
+
+# Runs before every other group so each update is seen once
+RECORDER_GROUP = -2000
+MAX_TEXT_LENGTH = 100
+
+_URL = re.compile(r"(https?://|t\.me/|www\.)\S+", re.IGNORECASE)
+_MENTION = re.compile(r"@\w+")
+_LONG_NUMBER = re.compile(r"\d{5,}")
+_SPACES = re.compile(r"\s+")
+# Callback arguments such as plan names are kept as they are
+_WORD = re.compile(r"^[a-z_]+$")
+# Identifier followed by a page number, as in page_<token>_<n>
+_PAGED = re.compile(r"^(.+)_(\d+)$")
+
+CHAT_TYPES = {"private": "p", "bot": "p", "group": "g", "supergroup": "s", "channel": "c"}
+
+
+def normalize_text(text: str) -> str:
+    """Lowercase search text with links, mentions and long numbers masked"""
+    text = _URL.sub("url", text)
+    text = _MENTION.sub("@user", text)
+    text = _LONG_NUMBER.sub("0", text)
+    return _SPACES.sub(" ", text).strip().lower()[:MAX_TEXT_LENGTH]
+
+
+class TrafficRecorder:
+    """Record update metadata to a rotating file"""
+
+    def __init__(
+        self,
+        directory: str = TRAFFIC_RECORD_DIR,
+        name: str = "traffic",
+        max_mb: float = TRAFFIC_RECORD_MAX_MB,
+        files: int = TRAFFIC_RECORD_FILES,
+    ):
+        os.makedirs(directory, exist_ok=True)
+        self.path = os.path.join(directory, f"{name}.jsonl")
+        # Pseudonyms are stable within a run and unlinkable across runs
+        self._key = secrets.token_bytes(16)
+        self._writer = logging.getLogger(f"phoenix.traffic.{name}")
+        self._writer.propagate = False
+        self._writer.setLevel(logging.INFO)
+        handler = RotatingFileHandler(
+            self.path, maxBytes=int(max_mb * 1024 * 1024), backupCount=max(0, files - 1), encoding="utf-8"
+        )
+        handler.setFormatter(logging.Formatter("%(message)s"))
+        # The file is written from the listener's thread
+        self._queue_handler = QueueHandler(queue.SimpleQueue())
+        self._listener = QueueListener(self._queue_handler.queue, handler)
+        self._listener.start()
+        self._writer.addHandler(self._queue_handler)
+        self._handler = handler
+        self.recorded = 0
+
+    def _pseudonym(self, value) -> int:
+        digest = hmac.new(self._key, str(value).encode(), hashlib.sha256).digest()
+        return int.from_bytes(digest[:4], "big")
+
+    def _write(self, kind: str, user_id, chat_type, payload: str):
+        is_admin = 1 if user_id in ADMINS else 0
+        chat_code = CHAT_TYPES.get(getattr(chat_type, "value", chat_type), "p")
+        entry = [int(time.time() * 1000), kind, self._pseudonym(user_id), chat_code, payload, is_admin]
+        self._writer.info(json.dumps(entry, separators=(",", ":"), ensure_ascii=False))
+        self.recorded += 1
+
+    def record_message(self, message: Message):
+        text = message.text or message.caption
+        if not text or not message.from_user:
+            return
+        if text.startswith("/"):
+            # Command arguments may carry personal data; keep the command only
+            payload = text.split(maxsplit=1)[0].split("@", 1)[0].lower()
+        else:
+            payload = normalize_text(text)
+        self._write("m", message.from_user.id, message.chat.type if message.chat else None, payload)
+
+    def record_callback(self, callback_query: CallbackQuery):
+        data = callback_query.data or ""
+        if isinstance(data, bytes):
+            data = data.decode(errors="replace")
+        route, _ = callback_router.resolve(data)
+        argument = data[len(route):] if route else ""
+        paged = _PAGED.match(argument)
+        if paged:
+            # The replayer maps the hashed token onto the results it sent the user
+            payload = f"{route}#{self._pseudonym(paged.group(1))}_{paged.group(2)}"
+        elif argument and not _WORD.match(argument):
+            # Keep the route, hash identifiers (document IDs, payment IDs)
+            payload = f"{route}#{self._pseudonym(argument)}"
+        else:
+            payload = (route + argument) if route else "?"
+        chat = callback_query.message.chat if callback_query.message else None
+        self._write("c", callback_query.from_user.id, chat.type if chat else None, payload)
+
+    def attach(self, client: Client):
+        """Record every message and callback query the client receives"""
+
+        async def on_message(_client: Client, message: Message):
+            try:
+                self.record_message(message)
+            except Exception as e:
+                logger.debug(f"Traffic recorder skipped a message: {e}")
+
+        async def on_callback(_client: Client, callback_query: CallbackQuery):
+            try:
+                self.record_callback(callback_query)
+            except Exception as e:
+                logger.debug(f"Traffic recorder skipped a callback: {e}")
+
+        client.add_handler(MessageHandler(on_message), RECORDER_GROUP)
+        client.add_handler(CallbackQueryHandler(on_callback), RECORDER_GROUP)
+        logger.info(f"📼 Recording anonymized traffic to {self.path}")
+
+    def close(self):
+        """Write out queued lines and close the file"""
+        self._writer.removeHandler(self._queue_handler)
+        self._listener.stop()
+        self._handler.close()
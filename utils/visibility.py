@@ -0,0 +1,85 @@
+"""
+Per-tenant channel visibility for Phoenix Filter Bot
+The files index is shared by the main bot and every clone; each tenant
+only sees files from the channels it indexed itself.
+"""
+
+import logging
+from typing import FrozenSet, Optional
+from motor.motor_asyncio import AsyncIOMotorDatabase
+from pymongo import ASCENDING
+from config import MAIN_BOT_SEES_ALL_CHANNELS
+from utils.cache import TTLCache
+from utils.tenants import MAIN_TENANT_ID, TenantContext
+
+logger = logging.getLogger(__name__)
+
+VISIBILITY_CACHE_TTL = 300
+
+
+class ChannelVisibility:
+    """Which file channels each tenant can search and download from"""
+
+    def __init__(self, db: AsyncIOMotorDatabase):
+        self.collection = db.tenant_channels
+        self.files_collection = db.files
+        self.cache = TTLCache(maxsize=10000, ttl=VISIBILITY_CACHE_TTL)
+
+    async def ensure_indexes(self):
+        await self.collection.create_index(
+            [("tenant_id", ASCENDING), ("channel_id", ASCENDING)], unique=True
+        )
+
+    async def channels_for(self, tenant: TenantContext) -> Optional[FrozenSet[int]]:
+        """
+        Channels a tenant can see, or None for every channel
+
+        Returned as a frozenset so it can key shared caches: tenants with
+        the same channels hit the same entries. A tenant sees only the
+        channels registered for it (none at all until it indexes one),
+        except the main bot with MAIN_BOT_SEES_ALL_CHANNELS set.
+        """
+        if MAIN_BOT_SEES_ALL_CHANNELS and not tenant.is_clone:
+            return None
+        channels = self.cache.get(tenant.tenant_id)
+        if channels is None:
+            channel_ids = await self.collection.distinct("channel_id", {"tenant_id": tenant.tenant_id})
+            channels = frozenset(channel_ids)
+            self.cache.set(tenant.tenant_id, channels)
+        return channels
+
+    async def add_channel(self, tenant: TenantContext, channel_id: int):
+        """Make a channel's files visible to a tenant"""
+        await self.collection.update_one(
+            {"tenant_id": tenant.tenant_id, "channel_id": channel_id},
+            {"$setOnInsert": {"tenant_id": tenant.tenant_id, "channel_id": channel_id}},
+            upsert=True,
+        )
+        self.cache.pop(tenant.tenant_id)
+
+    async def can_see(self, tenant: TenantContext, file_doc: dict) -> bool:
+        channels = await self.channels_for(tenant)
+        return channels is None or file_doc.get("channel_id") in channels
+
+    async def backfill(self) -> int:
+        """
+        Give the main bot every channel indexed before visibility existed
+
+        Returns:
+            Number of channels assigned
+        """
+        registered = set(await self.collection.distinct("channel_id"))
+        unassigned = [
+            channel_id for channel_id in await self.files_collection.distinct("channel_id")
+            if channel_id is not None and channel_id not in registered
+        ]
+        for channel_id in unassigned:
+            await self.collection.update_one(
+                {"tenant_id": MAIN_TENANT_ID, "channel_id": channel_id},
+                {"$setOnInsert": {"tenant_id": MAIN_TENANT_ID, "channel_id": channel_id}},
+                upsert=True,
+            )
+        if unassigned:
+            self.cache.pop(MAIN_TENANT_ID)
+            logger.info(f"Assigned {len(unassigned)} existing channel(s) to the main bot")
+        return len(unassigned)
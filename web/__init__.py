@@ -0,0 +1,10 @@
+"""Web module for Phoenix Filter Bot - HTTP streaming and metrics servers"""
+
+from .metrics import MetricsServer
+from .server import StreamServer, build_stream_link
+
+__all__ = [
+    "MetricsServer",
+    "StreamServer",
+    "build_stream_link",
+]
@@ -0,0 +1,164 @@
+"""
+Disk-backed chunk cache for the streaming server
+Chunks are stored by (file_unique_id, chunk_index) and evicted LRU under a
+size budget. Concurrent requests for the same chunk share one fetch. Each
+file's chunks live in a directory of their own, removed with its last chunk.
+"""
+
+import asyncio
+import logging
+import os
+from collections import OrderedDict
+from typing import IO, Awaitable, Callable, Dict, Tuple
+
+logger = logging.getLogger(__name__)
+
+ChunkKey = Tuple[str, int]
+
+
+class ChunkCache:
+    """LRU cache of Telegram file chunks on local disk"""
+
+    def __init__(self, cache_dir: str, max_bytes: int):
+        self.cache_dir = cache_dir
+        self.max_bytes = max_bytes
+        self.size = 0
+        self.hits = 0
+        self.misses = 0
+        self._index: "OrderedDict[ChunkKey, int]" = OrderedDict()
+        # Cached chunks per file_unique_id, to know when a file's directory empties
+        self._file_chunks: Dict[str, int] = {}
+        self._inflight: Dict[ChunkKey, asyncio.Future] = {}
+
+        os.makedirs(cache_dir, exist_ok=True)
+        self._load_index()
+
+    def _path(self, key: ChunkKey) -> str:
+        file_unique_id, index = key
+        return os.path.join(self.cache_dir, file_unique_id, f"{index}.chunk")
+
+    def _load_index(self):
+        """Rebuild the LRU index from chunks left on disk, oldest first"""
+        entries = []
+        for file_dir in os.scandir(self.cache_dir):
+            if not file_dir.is_dir():
+                continue
+            chunks = 0
+            for chunk in os.scandir(file_dir.path):
+                if chunk.name.endswith(".chunk"):
+                    stat = chunk.stat()
+                    entries.append((stat.st_mtime, (file_dir.name, int(chunk.name[:-6])), stat.st_size))
+                    chunks += 1
+            if not chunks:
+                self._remove_dir(file_dir.name)
+
+        for _, key, size in sorted(entries):
+            self._add(key, size)
+        self._evict()
+
+        if entries:
+            logger.info(f"Chunk cache loaded {len(self._index)} chunks ({self.size / 1024 / 1024:.0f} MB)")
+
+    async def open_chunk(self, key: ChunkKey, fetch: Callable[[], Awaitable[bytes]]) -> IO[bytes]:
+        """
+        Open a cached chunk for reading, fetching it first on a miss
+
+        Args:
+            key: (file_unique_id, chunk_index)
+            fetch: Coroutine function downloading the chunk from Telegram
+
+        Returns:
+            Binary file object positioned at 0; the caller closes it
+        """
+        while True:
+            if key in self._index:
+                try:
+                    # Opening keeps the data readable even if it is evicted meanwhile
+                    fobj = open(self._path(key), "rb")
+                except FileNotFoundError:
+                    self._forget(key)
+                    continue
+                self._index.move_to_end(key)
+                self.hits += 1
+                return fobj
+
+            inflight = self._inflight.get(key)
+            if inflight:
+                # Another reader is already downloading this chunk. If that fails
+                # or is cancelled, the chunk is still missing and this reader
+                # fetches it itself
+                await asyncio.wait([inflight])
+                continue
+
+            self.misses += 1
+            future = asyncio.get_running_loop().create_future()
+            self._inflight[key] = future
+            try:
+                data = await fetch()
+                await asyncio.get_running_loop().run_in_executor(None, self._write, key, data)
+                self._add(key, len(data))
+                self._evict()
+            finally:
+                self._inflight.pop(key, None)
+                # Wakes the waiters whatever happened; errors stay with this reader
+                future.set_result(None)
+
+    def _write(self, key: ChunkKey, data: bytes):
+        """Write a chunk atomically (runs in an executor)"""
+        path = self._path(key)
+        tmp_path = f"{path}.{os.getpid()}.tmp"
+        try:
+            f = open(tmp_path, "wb")
+        except FileNotFoundError:
+            # First chunk of this file, or its directory was just evicted
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            f = open(tmp_path, "wb")
+        with f:
+            f.write(data)
+        os.replace(tmp_path, path)
+
+    def _add(self, key: ChunkKey, size: int):
+        self._index[key] = size
+        self.size += size
+        self._file_chunks[key[0]] = self._file_chunks.get(key[0], 0) + 1
+
+    def _forget(self, key: ChunkKey):
+        size = self._index.pop(key, None)
+        if size is not None:
+            self._removed(key, size)
+
+    def _removed(self, key: ChunkKey, size: int):
+        """Account for a chunk leaving the index; drop its file's directory with the last one"""
+        self.size -= size
+        remaining = self._file_chunks.get(key[0], 0) - 1
+        if remaining > 0:
+            self._file_chunks[key[0]] = remaining
+        else:
+            self._file_chunks.pop(key[0], None)
+            self._remove_dir(key[0])
+
+    def _remove_dir(self, file_unique_id: str):
+        try:
+            os.rmdir(os.path.join(self.cache_dir, file_unique_id))
+        except OSError:
+            # Gone already, or a chunk of it is being written
+            pass
+
+    def _evict(self):
+        """Delete least recently used chunks until under budget"""
+        while self.size > self.max_bytes and self._index:
+            key, size = self._index.popitem(last=False)
+            try:
+                os.remove(self._path(key))
+            except FileNotFoundError:
+                pass
+            self._removed(key, size)
+
+    def __len__(self) -> int:
+        return len(self._index)
+
+    @property
+    def hit_rate(self) -> float:
+        """Fraction of chunk reads served from disk"""
+        total = self.hits + self.misses
+        return self.hits / total if total else 0.0
@@ -0,0 +1,43 @@
+"""
+Metrics endpoint for Phoenix Filter Bot
+Serves the process's metrics in the Prometheus text format on /metrics
+"""
+
+import logging
+from typing import Optional
+from aiohttp import web
+from config import METRICS_BIND_ADDRESS
+from utils.metrics import metrics
+
+logger = logging.getLogger(__name__)
+
+
+class MetricsServer:
+    """Small aiohttp server for Prometheus scrapes, separate from the public streaming server"""
+
+    def __init__(self, port: int, host: str = METRICS_BIND_ADDRESS):
+        self.host = host
+        self.port = port
+        self.runner: Optional[web.AppRunner] = None
+
+        self.app = web.Application()
+        self.app.router.add_get("/metrics", self.handle_metrics)
+
+    async def start(self):
+        """Start listening"""
+        self.runner = web.AppRunner(self.app)
+        await self.runner.setup()
+        site = web.TCPSite(self.runner, self.host, self.port)
+        await site.start()
+        logger.info(f"✅ Metrics endpoint listening on {self.host}:{self.port}/metrics")
+
+    async def stop(self):
+        """Stop listening"""
+        if self.runner:
+            await self.runner.cleanup()
+
+    async def handle_metrics(self, request: web.Request) -> web.Response:
+        return web.Response(
+            body=metrics.render().encode(),
+            headers={"Content-Type": "text/plain; version=0.0.4; charset=utf-8"},
+        )
@@ -0,0 +1,193 @@
+"""
+HTTP streaming server for Phoenix Filter Bot
+Serves Telegram files over HTTP with Range support for players like VLC/MX
+"""
+
+import asyncio
+import logging
+import mimetypes
+from typing import IO, Optional
+from aiohttp import web
+from config import (
+    STREAM_BIND_ADDRESS,
+    STREAM_PORT,
+    STREAM_SERVER_URL,
+    STREAM_CACHE_DIR,
+    STREAM_CACHE_MAX_MB,
+)
+from utils.client_pool import ClientPool
+from utils.premium_benefits import PremiumBenefits
+from web.chunk_cache import ChunkCache
+from web.streamer import CHUNK_SIZE, TelegramStreamer, get_media
+from web.tokens import InvalidLinkToken, create_link_token, verify_link_token
+
+logger = logging.getLogger(__name__)
+
+
+def build_stream_link(kind: str, chat_id: int, message_id: int, user_id: int, is_premium: bool) -> str:
+    """
+    Build a signed, expiring public link to a file
+
+    Args:
+        kind: "stream" (play inline) or "download" (save as attachment)
+        chat_id: Chat holding the file message
+        message_id: ID of the file message
+        user_id: User the link is issued to
+        is_premium: User's tier, which sets the link lifetime
+    """
+    base_url = (STREAM_SERVER_URL or f"http://localhost:{STREAM_PORT}").rstrip("/")
+    token = create_link_token(chat_id, message_id, user_id, is_premium)
+    return f"{base_url}/{kind}/{token}"
+
+
+def parse_range(range_header: Optional[str], file_size: int) -> Optional[tuple]:
+    """
+    Parse a single-range "bytes=" header
+
+    Returns:
+        (start, end) inclusive, None for no/unsupported header
+
+    Raises:
+        ValueError: the range cannot be satisfied
+    """
+    if not range_header or not range_header.startswith("bytes="):
+        return None
+
+    spec = range_header[len("bytes="):].split(",")[0].strip()
+    start_text, _, end_text = spec.partition("-")
+
+    if start_text:
+        start = int(start_text)
+        end = int(end_text) if end_text else file_size - 1
+    else:
+        # Suffix range: the last N bytes
+        start = max(0, file_size - int(end_text))
+        end = file_size - 1
+
+    end = min(end, file_size - 1)
+    if start > end or start >= file_size:
+        raise ValueError("Unsatisfiable range")
+    return start, end
+
+
+class StreamServer:
+    """aiohttp server streaming files straight from Telegram"""
+
+    def __init__(self, client_pool: ClientPool):
+        self.client_pool = client_pool
+        self.streamer = TelegramStreamer(client_pool)
+        self.chunk_cache = ChunkCache(STREAM_CACHE_DIR, STREAM_CACHE_MAX_MB * 1024 * 1024) if STREAM_CACHE_MAX_MB > 0 else None
+        self.runner: Optional[web.AppRunner] = None
+
+        self.app = web.Application()
+        self.app.router.add_get("/", self.handle_root)
+        self.app.router.add_get("/stream/{token}", self.handle_stream)
+        self.app.router.add_get("/download/{token}", self.handle_download)
+
+    async def start(self):
+        """Start listening"""
+        self.runner = web.AppRunner(self.app)
+        await self.runner.setup()
+        site = web.TCPSite(self.runner, STREAM_BIND_ADDRESS, STREAM_PORT)
+        await site.start()
+        logger.info(f"✅ Streaming server listening on {STREAM_BIND_ADDRESS}:{STREAM_PORT}")
+
+    async def stop(self):
+        """Stop listening"""
+        if self.runner:
+            await self.runner.cleanup()
+
+    async def handle_root(self, request: web.Request) -> web.Response:
+        return web.Response(text="🔥 Phoenix Filter Bot streaming server")
+
+    async def handle_stream(self, request: web.Request) -> web.StreamResponse:
+        return await self._serve(request, inline=True)
+
+    async def handle_download(self, request: web.Request) -> web.StreamResponse:
+        return await self._serve(request, inline=False)
+
+    async def _serve(self, request: web.Request, inline: bool) -> web.StreamResponse:
+        """Serve a file, or the requested byte range of it"""
+        # Authorized from the token alone - players send many range requests per playback
+        try:
+            claims = verify_link_token(request.match_info["token"])
+        except InvalidLinkToken as e:
+            raise web.HTTPForbidden(text=str(e))
+        chat_id, message_id = claims.chat_id, claims.message_id
+
+        try:
+            message = await self.streamer.get_message(chat_id, message_id)
+        except Exception as e:
+            logger.error(f"Error fetching stream message {chat_id}/{message_id}: {e}")
+            message = None
+        if not message:
+            raise web.HTTPNotFound(text="File not found")
+
+        media = get_media(message)
+        file_size = media.file_size
+        max_size_mb = PremiumBenefits.get_limits(claims.is_premium)["max_file_size_mb"]
+        if file_size > max_size_mb * 1024 * 1024:
+            raise web.HTTPForbidden(text=f"File is larger than your {max_size_mb}MB limit")
+        file_name = (getattr(media, "file_name", None) or f"{message_id}").replace('"', "")
+        mime_type = getattr(media, "mime_type", None) or mimetypes.guess_type(file_name)[0] or "application/octet-stream"
+
+        try:
+            byte_range = parse_range(request.headers.get("Range"), file_size)
+        except ValueError:
+            raise web.HTTPRequestRangeNotSatisfiable(headers={"Content-Range": f"bytes */{file_size}"})
+
+        start, end = byte_range or (0, file_size - 1)
+        disposition = "inline" if inline else "attachment"
+
+        response = web.StreamResponse(status=206 if byte_range else 200)
+        response.headers["Content-Type"] = mime_type
+        response.headers["Content-Length"] = str(end - start + 1)
+        response.headers["Accept-Ranges"] = "bytes"
+        response.headers["Content-Disposition"] = f'{disposition}; filename="{file_name}"'
+        if byte_range:
+            response.headers["Content-Range"] = f"bytes {start}-{end}/{file_size}"
+
+        await response.prepare(request)
+        if request.method == "HEAD":
+            return response
+
+        try:
+            if self.chunk_cache:
+                await self._write_cached_range(request, chat_id, message_id, media.file_unique_id, start, end)
+            else:
+                async for chunk in self.streamer.yield_range(chat_id, message_id, start, end):
+                    await response.write(chunk)
+        except (ConnectionResetError, ConnectionError):
+            # Players drop connections all the time when seeking
+            logger.debug(f"Client disconnected from {chat_id}/{message_id}")
+
+        return response
+
+    async def _write_cached_range(self, request: web.Request, chat_id: int, message_id: int,
+                                  file_unique_id: str, start: int, end: int):
+        """Write a byte range chunk by chunk from the disk cache"""
+        first_chunk, last_chunk = start // CHUNK_SIZE, end // CHUNK_SIZE
+
+        for index in range(first_chunk, last_chunk + 1):
+            fobj = await self.chunk_cache.open_chunk(
+                (file_unique_id, index),
+                lambda index=index: self.streamer.fetch_chunk(chat_id, message_id, index),
+            )
+            with fobj:
+                offset = start % CHUNK_SIZE if index == first_chunk else 0
+                stop = end % CHUNK_SIZE + 1 if index == last_chunk else CHUNK_SIZE
+                await self._sendfile(request, fobj, offset, stop - offset)
+
+    @staticmethod
+    async def _sendfile(request: web.Request, fobj: IO[bytes], offset: int, count: int):
+        """
+        Send part of a file with sendfile(2)
+
+        Where sendfile isn't available (TLS transports, some event loops)
+        loop.sendfile falls back to reading and writing the range itself.
+        """
+        transport = request.transport
+        if transport is None or transport.is_closing():
+            raise ConnectionResetError("Connection lost")
+
+        await asyncio.get_running_loop().sendfile(transport, fobj, offset, count)
@@ -0,0 +1,168 @@
+"""
+Telegram media streamer for Phoenix Filter Bot
+Reads arbitrary byte ranges of a Telegram file chunk by chunk
+"""
+
+import logging
+from typing import AsyncGenerator, Optional
+from pyrogram import Client, raw
+from pyrogram.errors import AuthBytesInvalid, FloodWait
+from pyrogram.file_id import FileId, FileType
+from pyrogram.session import Auth, Session
+from pyrogram.types import Message
+from utils.cache import TTLCache
+from utils.client_pool import ClientPool, client_name
+
+logger = logging.getLogger(__name__)
+
+CHUNK_SIZE = 1024 * 1024
+"""Size of the chunks Pyrogram's stream_media (and upload.GetFile below) yields"""
+
+MEDIA_TYPES = ("document", "video", "audio", "animation", "voice", "video_note", "photo", "sticker")
+
+
+def get_media(message: Message):
+    """Get the media object (Document, Video, ...) attached to a message"""
+    for media_type in MEDIA_TYPES:
+        media = getattr(message, media_type, None)
+        if media:
+            return media
+    return None
+
+
+async def _get_media_session(client: Client, dc_id: int) -> Session:
+    """Get (or open) the client's media session for a DC, as Client.get_file does"""
+    async with client.media_sessions_lock:
+        session = client.media_sessions.get(dc_id)
+        if session is not None:
+            return session
+
+        test_mode = await client.storage.test_mode()
+        if dc_id != await client.storage.dc_id():
+            session = Session(client, dc_id, await Auth(client, dc_id, test_mode).create(), test_mode, is_media=True)
+            await session.start()
+
+            for _ in range(3):
+                exported_auth = await client.send(raw.functions.auth.ExportAuthorization(dc_id=dc_id))
+                try:
+                    await session.send(raw.functions.auth.ImportAuthorization(id=exported_auth.id, bytes=exported_auth.bytes))
+                    break
+                except AuthBytesInvalid:
+                    continue
+            else:
+                await session.stop()
+                raise AuthBytesInvalid
+        else:
+            session = Session(client, dc_id, await client.storage.auth_key(), test_mode, is_media=True)
+            await session.start()
+
+        client.media_sessions[dc_id] = session
+        return session
+
+
+async def iter_chunks(client: Client, message: Message, offset: int, limit: int) -> AsyncGenerator[bytes, None]:
+    """
+    Yield `limit` CHUNK_SIZE chunks of a message's file starting at chunk `offset`
+
+    Uses stream_media where Pyrogram has it (2.x); on the pinned 1.x it
+    requests the chunks with upload.GetFile directly.
+    """
+    if hasattr(client, "stream_media"):
+        async for chunk in client.stream_media(message, offset=offset, limit=limit):
+            yield chunk
+        return
+
+    file_id = FileId.decode(get_media(message).file_id)
+    session = await _get_media_session(client, file_id.dc_id)
+
+    if file_id.file_type == FileType.PHOTO:
+        location = raw.types.InputPhotoFileLocation(
+            id=file_id.media_id,
+            access_hash=file_id.access_hash,
+            file_reference=file_id.file_reference,
+            thumb_size=file_id.thumbnail_size,
+        )
+    else:
+        location = raw.types.InputDocumentFileLocation(
+            id=file_id.media_id,
+            access_hash=file_id.access_hash,
+            file_reference=file_id.file_reference,
+            thumb_size=file_id.thumbnail_size,
+        )
+
+    for index in range(offset, offset + limit):
+        result = await session.send(
+            raw.functions.upload.GetFile(location=location, offset=index * CHUNK_SIZE, limit=CHUNK_SIZE),
+            sleep_threshold=30,
+        )
+        if not result.bytes:
+            return
+        yield result.bytes
+        if len(result.bytes) < CHUNK_SIZE:
+            return
+
+
+class TelegramStreamer:
+    """Serve byte ranges of files stored in Telegram messages"""
+
+    def __init__(self, client_pool: ClientPool):
+        self.client_pool = client_pool
+        self.message_cache = TTLCache(maxsize=1000, ttl=600)
+
+    async def get_message(self, chat_id: int, message_id: int, client: Optional[Client] = None) -> Optional[Message]:
+        """
+        Get a media message, cached so each range request doesn't refetch it
+
+        Messages are cached per session because file references are only
+        valid for the client that fetched them.
+        """
+        client = client or self.client_pool.pick()
+        key = (client_name(client), chat_id, message_id)
+        message = self.message_cache.get(key)
+        if message is None:
+            message = await client.get_messages(chat_id, message_id)
+            if not message or message.empty or not get_media(message):
+                return None
+            self.message_cache.set(key, message)
+        return message
+
+    async def yield_range(self, chat_id: int, message_id: int, start: int, end: int) -> AsyncGenerator[bytes, None]:
+        """
+        Yield the bytes of a file between start and end (inclusive)
+
+        Only the chunks covering the range are downloaded, so seeking into
+        a multi-GB file starts streaming immediately.
+        """
+        first_chunk = start // CHUNK_SIZE
+        last_chunk = end // CHUNK_SIZE
+        first_cut = start % CHUNK_SIZE
+        last_cut = end % CHUNK_SIZE + 1
+
+        async with self.client_pool.acquire() as client:
+            message = await self.get_message(chat_id, message_id, client)
+            index = first_chunk
+            async for chunk in iter_chunks(client, message, first_chunk, last_chunk - first_chunk + 1):
+                if index == first_chunk == last_chunk:
+                    yield chunk[first_cut:last_cut]
+                elif index == first_chunk:
+                    yield chunk[first_cut:]
+                elif index == last_chunk:
+                    yield chunk[:last_cut]
+                else:
+                    yield chunk
+                index += 1
+
+    async def fetch_chunk(self, chat_id: int, message_id: int, index: int) -> bytes:
+        """Download a single CHUNK_SIZE chunk of a file on the least busy session"""
+        attempts = len(self.client_pool.workers) + 1
+        for attempt in range(attempts):
+            try:
+                async with self.client_pool.acquire() as client:
+                    message = await self.get_message(chat_id, message_id, client)
+                    async for chunk in iter_chunks(client, message, index, 1):
+                        return chunk
+                    raise ValueError(f"Chunk {index} is past the end of the file")
+            except FloodWait:
+                # The pool now routes around that session; try another
+                if attempt == attempts - 1:
+                    raise
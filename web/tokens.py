@@ -0,0 +1,166 @@
+"""
+Signed stream/download link tokens for Phoenix Filter Bot
+A token carries the file reference, user, expiry and tier, signed with
+HMAC-SHA256, so the streaming server authorizes requests without MongoDB.
+"""
+
+import base64
+import hashlib
+import hmac
+import struct
+import time
+from dataclasses import dataclass
+from typing import Dict, Optional
+from config import BOT_TOKEN, LINK_SECRET, LINK_TTL_HOURS, PREMIUM_LINK_TTL_HOURS
+
+# chat_id, message_id, user_id, expires_at, is_premium
+_PAYLOAD = struct.Struct(">qiqI?")
+_SIGNATURE_SIZE = 16
+
+_KEY = (LINK_SECRET or hashlib.sha256(f"phoenix-links:{BOT_TOKEN}".encode()).hexdigest()).encode()
+
+
+class InvalidLinkToken(Exception):
+    """Raised when a link token is malformed, forged, expired or revoked"""
+
+
+@dataclass(frozen=True)
+class LinkClaims:
+    """Contents of a verified link token"""
+    chat_id: int
+    message_id: int
+    user_id: int
+    expires_at: int
+    is_premium: bool
+
+
+def _sign(payload: bytes) -> bytes:
+    return hmac.new(_KEY, payload, hashlib.sha256).digest()[:_SIGNATURE_SIZE]
+
+
+def _b64encode(raw: bytes) -> str:
+    return base64.urlsafe_b64encode(raw).rstrip(b"=").decode()
+
+
+def _b64decode(text: str) -> bytes:
+    return base64.urlsafe_b64decode(text + "=" * (-len(text) % 4))
+
+
+def link_ttl(is_premium: bool) -> int:
+    """Link lifetime in seconds for a tier"""
+    return (PREMIUM_LINK_TTL_HOURS if is_premium else LINK_TTL_HOURS) * 3600
+
+
+def create_link_token(chat_id: int, message_id: int, user_id: int, is_premium: bool,
+                      ttl: Optional[int] = None) -> str:
+    """
+    Create a signed token for a file message
+
+    Args:
+        chat_id: Chat holding the file message
+        message_id: ID of the file message
+        user_id: User the link is issued to
+        is_premium: User's tier when the link was issued
+        ttl: Lifetime in seconds (defaults to the tier's link TTL)
+    """
+    expires_at = int(time.time()) + (ttl if ttl is not None else link_ttl(is_premium))
+    payload = _PAYLOAD.pack(chat_id, message_id, user_id, expires_at, is_premium)
+    return _b64encode(payload + _sign(payload))
+
+
+def verify_link_token(token: str) -> LinkClaims:
+    """
+    Check a token's signature, expiry and revocation
+
+    Raises:
+        InvalidLinkToken: the token must not be served
+    """
+    try:
+        raw = _b64decode(token)
+    except (ValueError, TypeError):
+        raise InvalidLinkToken("Malformed link")
+
+    # Other spellings of the same bytes (spare bits, stray characters) would
+    # slip past a deny list keyed on the text
+    if len(raw) != _PAYLOAD.size + _SIGNATURE_SIZE or _b64encode(raw) != token:
+        raise InvalidLinkToken("Malformed link")
+
+    payload, signature = raw[:_PAYLOAD.size], raw[_PAYLOAD.size:]
+    if not hmac.compare_digest(signature, _sign(payload)):
+        raise InvalidLinkToken("Invalid signature")
+
+    claims = LinkClaims(*_PAYLOAD.unpack(payload))
+    if claims.expires_at < time.time():
+        raise InvalidLinkToken("Link expired")
+    if link_deny_list.is_denied(signature, claims):
+        raise InvalidLinkToken("Link revoked")
+    return claims
+
+
+class LinkDenyList:
+    """
+    In-memory revocation list for link tokens
+    Entries only need to live until the tokens they cover expire. Links are
+    keyed by signature, which no re-spelling of the token changes. User
+    revocations are also stored on the user document by /ban and loaded
+    back with revoke_user on startup.
+    """
+
+    def __init__(self):
+        self._tokens: Dict[bytes, float] = {}
+        self._users: Dict[int, float] = {}
+
+    def revoke(self, token: str) -> bool:
+        """
+        Revoke a single link
+
+        Returns:
+            False if the token isn't a link token
+        """
+        try:
+            raw = _b64decode(token)
+            expires_at = _PAYLOAD.unpack(raw[:_PAYLOAD.size])[3]
+        except (ValueError, TypeError, struct.error):
+            return False
+        if len(raw) != _PAYLOAD.size + _SIGNATURE_SIZE:
+            return False
+        self._prune()
+        self._tokens[raw[_PAYLOAD.size:]] = expires_at
+        return True
+
+    def revoke_user(self, user_id: int, until: Optional[float] = None) -> float:
+        """
+        Revoke every link currently issued to a user
+
+        Args:
+            until: When the revocation lapses (defaults to once every
+                link issued so far has expired)
+
+        Returns:
+            The time the revocation lapses
+        """
+        self._prune()
+        until = until if until is not None else time.time() + link_ttl(True)
+        self._users[user_id] = until
+        return until
+
+    def restore_user(self, user_id: int):
+        """Allow a user's links again"""
+        self._users.pop(user_id, None)
+
+    def is_denied(self, signature: bytes, claims: LinkClaims) -> bool:
+        return signature in self._tokens or claims.user_id in self._users
+
+    def _prune(self):
+        """Drop entries whose tokens have expired anyway"""
+        now = time.time()
+        for entries in (self._tokens, self._users):
+            for key in [key for key, until in entries.items() if until < now]:
+                del entries[key]
+
+    def __len__(self) -> int:
+        return len(self._tokens) + len(self._users)
+
+
+# Global deny list shared by the bot handlers and the streaming server
+link_deny_list = LinkDenyList()